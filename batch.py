@@ -0,0 +1,233 @@
+"""
+batch.py
+
+Batch runner : exécute une série de requêtes sur le graphe et affiche
+- la latence totale et par nœud,
+- pour chaque nœud LLM : backend / modèle (registre de config.py),
+  latences p50 / p95, taux de sorties valides, tokens de prompt évalués
+  et temps de prompt-eval (réutilisation du cache KV),
+- avec --baseline : la même série rejouée avec le modèle principal sur tous
+  les nœuds, pour comparer latence et accord des décisions (routage, grading).
+
+    python batch.py
+    python batch.py --queries mes_requetes.txt --baseline
+    LLM_SCHEDULER=1 python batch.py --concurrency 8   # + attente en file / débit
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from rich import print as rprint
+from rich.panel import Panel
+from rich.table import Table
+
+from langchain_core.messages import HumanMessage
+from langgraph.errors import GraphRecursionError
+
+from recipes import instrumentation
+from recipes.config import NODE_MODEL_TIERS, get_node_llm
+from recipes.graph_builder import build_graph_async
+from recipes.llm_scheduler import SchedulerOverloaded, get_scheduler, scheduler_enabled
+from recipes.schema import RecipeState
+
+
+DEFAULT_QUERIES = [
+    "Salade d'été fraîche pour 6 personnes ce soir, préparation rapide",
+    "Sauce bolognaise en grande quantité d'après mes livres PDF",
+    "Menu de saison entrée / plat / dessert pour 4 personnes en 1h30",
+    "J'ai du quinoa, des tomates cerises, un concombre, de la feta et des œufs",
+]
+
+
+async def _run_query(graph: Any, query: str, thread_id: str) -> Dict[str, Any]:
+    state: RecipeState = {"query": query, "messages": [HumanMessage(content=query)]}
+    config = {"configurable": {"thread_id": thread_id}, "recursion_limit": 40}
+
+    node_times: Dict[str, float] = {}
+    error = None
+    start = last = time.perf_counter()
+    try:
+        async for chunk in graph.astream(state, config=config, stream_mode="updates"):
+            now = time.perf_counter()
+            for node in chunk:
+                node_times[node] = node_times.get(node, 0.0) + (now - last)
+            last = now
+    except (GraphRecursionError, SchedulerOverloaded) as exc:
+        error = str(exc)
+
+    return {
+        "query": query,
+        "latency_s": time.perf_counter() - start,
+        "node_times": node_times,
+        "calls": [],
+        "error": error,
+    }
+
+
+async def run_batch(
+    queries: List[str], label: str = "run", concurrency: int = 1
+) -> List[Dict[str, Any]]:
+    """
+    Exécute chaque requête et retourne latences + appels LLM par requête.
+
+    Avec `concurrency` > 1, les requêtes tournent en parallèle (workers) :
+    les appels LLM ne sont alors plus attribuables à une requête, ils sont
+    regroupés sur le premier résultat.
+    """
+    graph = await build_graph_async()
+    instrumentation.reset()
+    if scheduler_enabled():
+        get_scheduler().reset_stats()
+
+    if concurrency <= 1:
+        results: List[Dict[str, Any]] = []
+        for idx, query in enumerate(queries, start=1):
+            instrumentation.reset()
+            result = await _run_query(graph, query, f"batch-{label}-{idx}")
+            result["calls"] = instrumentation.llm_calls()
+            result["counters"] = instrumentation.counters()
+            results.append(result)
+            rprint(f"[green]{label}[/green] {idx}/{len(queries)} "
+                   f"({result['latency_s']:.2f}s) {query[:60]}")
+        return results
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _bounded(idx: int, query: str) -> Dict[str, Any]:
+        async with sem:
+            return await _run_query(graph, query, f"batch-{label}-{idx}")
+
+    results = await asyncio.gather(*(_bounded(i, q) for i, q in enumerate(queries, start=1)))
+    if results:
+        results[0]["calls"] = instrumentation.llm_calls()
+        results[0]["counters"] = instrumentation.counters()
+    return list(results)
+
+
+def _decisions(result: Dict[str, Any]) -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {}
+    for c in result["calls"]:
+        if c.get("decision") is not None:
+            out.setdefault(c["node"], []).append(c["decision"])
+    return out
+
+
+def _sum_counters(results: List[Dict[str, Any]]) -> Dict[str, float]:
+    total: Dict[str, float] = {}
+    for r in results:
+        for name, value in (r.get("counters") or {}).items():
+            total[name] = total.get(name, 0.0) + value
+    return total
+
+
+def print_report(results: List[Dict[str, Any]], title: str) -> None:
+    latencies = [r["latency_s"] for r in results]
+    rprint(Panel.fit(
+        f"[bold cyan]{title}[/bold cyan]\n"
+        f"{len(results)} requêtes, latence moyenne {statistics.fmean(latencies):.2f}s, "
+        f"p95 {instrumentation.percentile(latencies, 0.95):.2f}s, "
+        f"max {max(latencies):.2f}s, erreurs {sum(1 for r in results if r['error'])}"
+    ))
+
+    calls = [c for r in results for c in r["calls"]]
+    table = Table(title="Appels LLM par nœud", show_lines=True)
+    for col in (
+        "Nœud", "Backend", "Modèle", "Appels", "p50 (s)", "p95 (s)",
+        "Sorties valides", "Tokens prompt évalués", "Prompt-eval (ms)", "Attente file (s)",
+    ):
+        table.add_column(col)
+    for node, s in sorted(instrumentation.summarize_llm_calls(calls).items()):
+        valid = "–" if s["valid_rate"] is None else f"{s['valid_rate']:.0%}"
+        table.add_row(
+            node, s["backend"], s["model"], str(s["calls"]),
+            f"{s['p50_s']:.3f}", f"{s['p95_s']:.3f}", valid,
+            "–" if s["prompt_tokens"] is None else f"{s['prompt_tokens']:.0f}",
+            "–" if s["prompt_eval_ms"] is None else f"{s['prompt_eval_ms']:.1f}",
+            f"{s['queue_wait_mean_s']:.3f}",
+        )
+    rprint(table)
+
+    hit_rates = instrumentation.cache_hit_rates(_sum_counters(results))
+    if hit_rates:
+        cache_table = Table(title="Cache de recherche", show_lines=True)
+        for col in ("Collection", "Hits", "Misses", "Taux de hit"):
+            cache_table.add_column(col)
+        for collection, st in sorted(hit_rates.items()):
+            cache_table.add_row(collection, f"{st['hit']:.0f}", f"{st['miss']:.0f}", f"{st['hit_rate']:.0%}")
+        rprint(cache_table)
+
+    if scheduler_enabled():
+        st = get_scheduler().stats()
+        rprint(Panel.fit(
+            "[bold cyan]Ordonnanceur LLM[/bold cyan]\n"
+            f"slots {st['slots']}, appels {st['completed']}, rejets {st['rejected']}, "
+            f"débit {st['throughput_rps']:.2f} req/s\n"
+            f"attente file p50 {st['wait_p50_s']:.3f}s / p95 {st['wait_p95_s']:.3f}s, "
+            f"profondeur max {st['max_queue_depth']}"
+        ))
+
+
+def print_comparison(tiered: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> None:
+    """Compare la série tiered à la baseline (modèle principal partout)."""
+    table = Table(title="Tiering vs baseline", show_lines=True)
+    for col in ("Nœud", "Latence tiered (s)", "Latence baseline (s)", "Accord décisions"):
+        table.add_column(col)
+
+    s_tiered = instrumentation.summarize_llm_calls([c for r in tiered for c in r["calls"]])
+    s_base = instrumentation.summarize_llm_calls([c for r in baseline for c in r["calls"]])
+
+    for node in sorted(set(s_tiered) | set(s_base)):
+        agree = total = 0
+        for rt, rb in zip(tiered, baseline):
+            dt, db = _decisions(rt).get(node), _decisions(rb).get(node)
+            if dt and db:
+                total += 1
+                agree += dt[0] == db[0]
+        table.add_row(
+            node,
+            f"{s_tiered.get(node, {}).get('mean_s', 0.0):.3f}",
+            f"{s_base.get(node, {}).get('mean_s', 0.0):.3f}",
+            f"{agree}/{total}" if total else "–",
+        )
+    rprint(table)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch runner du graphe recettes")
+    parser.add_argument("--queries", type=Path, help="fichier texte, une requête par ligne")
+    parser.add_argument(
+        "--baseline", action="store_true",
+        help="rejoue la série avec le modèle principal sur tous les nœuds",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=1,
+        help="nombre de requêtes exécutées en parallèle (workers)",
+    )
+    args = parser.parse_args()
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        queries = [l.strip() for l in args.queries.read_text(encoding="utf-8").splitlines() if l.strip()]
+
+    tiered = await run_batch(queries, label="tiered", concurrency=args.concurrency)
+    print_report(tiered, "Registre de modèles courant")
+
+    if args.baseline:
+        large = os.getenv("MISTRAL_LOCAL_MODEL", "ministral-3:3b")
+        for node in NODE_MODEL_TIERS:
+            os.environ[f"LLM_MODEL_{node}"] = large
+        get_node_llm.cache_clear()
+        baseline = await run_batch(queries, label="baseline", concurrency=args.concurrency)
+        print_report(baseline, f"Baseline : {large} sur tous les nœuds")
+        print_comparison(tiered, baseline)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
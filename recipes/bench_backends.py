@@ -0,0 +1,150 @@
+"""
+recipes/bench_backends.py
+
+Compare les backends vectoriels de vector_backends.py (chroma, sqlite-vec,
+duckdb, qdrant) sur un même corpus synthétique :
+
+- ingestion : documents / s (`add_documents`, embeddings pré-calculés),
+- requêtes  : latences p50 / p95 (`similarity_search_by_vector`),
+- rappel@k face à la recherche exacte,
+- mémoire   : RSS max ajouté par le backend, taille sur disque.
+
+Chaque backend tourne dans un process neuf (RSS comparable). Les backends
+dont la dépendance manque sont signalés et ignorés.
+
+    python -m recipes.bench_backends --docs 20000 --queries 200
+    python -m recipes.bench_backends --backends duckdb,qdrant --dim 768
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+from rich import print as rprint
+from rich.table import Table
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .bench_chroma import _synthetic_corpus, exact_top_k
+from .vector_backends import BACKENDS, open_backend
+
+
+class _LookupEmbeddings(Embeddings):
+    """Embeddings pré-calculés (texte → vecteur) : le coût du modèle est exclu."""
+
+    def __init__(self, vectors: Dict[str, List[float]]) -> None:
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[t] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _dir_size_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 2**20
+
+
+def run_worker(kind: str, n_docs: int, dim: int, n_queries: int, k: int, batch: int) -> Dict[str, Any]:
+    corpus = _synthetic_corpus(n_docs, dim)
+    rng = np.random.default_rng(1)
+    queries = corpus[rng.integers(0, n_docs, size=n_queries)] + 0.5 * corpus.std(axis=0) * rng.normal(
+        size=(n_queries, dim)
+    )
+    truth = exact_top_k(corpus, queries.astype(np.float32), k)
+
+    texts = [f"doc-{i}" for i in range(n_docs)]
+    embeddings = _LookupEmbeddings({t: v.tolist() for t, v in zip(texts, corpus)})
+    data_dir = Path(tempfile.mkdtemp(prefix=f"bench-{kind}-"))
+    rss_before = _rss_mb()
+
+    try:
+        backend = open_backend(kind, "bench", embeddings, data_dir)
+        start = time.perf_counter()
+        for offset in range(0, n_docs, batch):
+            backend.add_documents(
+                [Document(id=t, page_content=t, metadata={"i": offset + j})
+                 for j, t in enumerate(texts[offset:offset + batch])]
+            )
+        ingest_s = time.perf_counter() - start
+
+        latencies: List[float] = []
+        hits = 0
+        for q, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            docs = backend.similarity_search_by_vector(q.tolist(), k=k)
+            latencies.append(time.perf_counter() - t0)
+            hits += len({int(d.metadata["i"]) for d in docs} & set(expected.tolist()))
+
+        return {
+            "backend": kind,
+            "ingest_docs_s": n_docs / ingest_s,
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "recall": hits / (k * n_queries),
+            "rss_mb": _rss_mb() - rss_before,
+            "disk_mb": _dir_size_mb(data_dir),
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark des backends vectoriels")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=1000, help="documents par add_documents")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.docs, args.dim, args.queries, args.k, args.batch)))
+        return
+
+    table = Table(title=f"Backends vectoriels : {args.docs} docs, dim {args.dim}, {args.queries} requêtes")
+    for col in ("Backend", "Ingestion (docs/s)", "p50 (ms)", "p95 (ms)", f"Rappel@{args.k}", "RSS (Mo)", "Disque (Mo)"):
+        table.add_column(col)
+
+    unavailable: List[str] = []
+    for kind in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        proc = subprocess.run(
+            [sys.executable, "-m", "recipes.bench_backends", "--worker", kind,
+             "--docs", str(args.docs), "--dim", str(args.dim), "--queries", str(args.queries),
+             "--k", str(args.k), "--batch", str(args.batch)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            reason = (proc.stderr.strip().splitlines() or ["?"])[-1]
+            unavailable.append(f"{kind} : {reason}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        table.add_row(
+            kind, f"{r['ingest_docs_s']:.0f}", f"{r['p50_ms']:.2f}", f"{r['p95_ms']:.2f}",
+            f"{r['recall']:.3f}", f"{r['rss_mb']:.0f}", f"{r['disk_mb']:.1f}",
+        )
+    rprint(table)
+    for line in unavailable:
+        rprint(f"[yellow]indisponible[/yellow] {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,498 @@
+"""
+recipes/bench_chroma.py
+
+Benchmarks des vector stores Chroma.
+
+startup : temps d'ouverture et RSS des trois collections, dans un process
+neuf par layout :
+- "legacy" : un `Chroma(persist_directory=...)` par collection (3 clients,
+  3 bases SQLite, 3 caches HNSW),
+- "shared" : un seul client (config.get_chroma_client) pour les trois.
+
+Les embeddings sont factices (pas de chargement de modèle) : seul le coût
+des stores est mesuré.
+
+recall : rappel@k face à une recherche exacte (force brute NumPy) et
+latences p50 / p99 par requête, sur une grille de paramètres HNSW
+(max_neighbors × ef_construction × ef_search). Corpus : vecteurs d'une
+collection réelle, éventuellement agrandie (--scale, copies bruitées), ou
+corpus synthétique en clusters (--synthetic).
+
+exact : latence Chroma (HNSW) vs index exact NumPy en mémoire
+(vector_backends.NumpyExactIndex) sur les collections réelles.
+
+quant : index quantifié (int8 / binaire, avec ou sans reclassement float32)
+vs float32 exact : rappel@k, latences p50 / p95, mémoire des vecteurs.
+
+diversity : recettes uniques dans le top-k selon RETRIEVAL_MODE
+(similarity, dedup, mmr ; diversity.py) sur un corpus de recettes avec
+doublons exacts et quasi exacts (ré-ingestions, pages répétées), et
+rappel des k recettes uniques les plus proches.
+
+    python -m recipes.bench_chroma startup --runs 3
+    python -m recipes.bench_chroma quant --collection cookbooks --scale 50000
+    python -m recipes.bench_chroma exact --queries 500
+    python -m recipes.bench_chroma diversity --recipes 2000 --fetch 2,4,8
+    python -m recipes.bench_chroma recall --collection cookbooks --scale 50000
+    python -m recipes.bench_chroma recall --synthetic 100000 --ef-search 16,64,256 --m 16,32
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from rich import print as rprint
+from rich.table import Table
+
+
+# exécuté dans un process neuf : import + ouverture + requête, puis mesures
+_STARTUP_SNIPPET = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+import chromadb
+from chromadb.config import Settings
+from langchain_chroma import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+t_import = time.perf_counter()
+
+layout, chroma_dir, store_dir = sys.argv[1], sys.argv[2], sys.argv[3]
+emb = DeterministicFakeEmbedding(size=384)
+legacy = {"recipes": "pdfs", "cookbooks": "cookbooks", "ustensils": "ustensils"}
+if layout == "legacy":
+    stores = [
+        Chroma(collection_name=name, embedding_function=emb, persist_directory=f"{chroma_dir}/{folder}")
+        for folder, name in legacy.items()
+    ]
+else:
+    client = chromadb.PersistentClient(path=store_dir, settings=Settings(anonymized_telemetry=False))
+    stores = [Chroma(collection_name=key, embedding_function=emb, client=client) for key in legacy]
+t_open = time.perf_counter()
+for vs in stores:
+    vs.similarity_search("salade de quinoa", k=3)
+t_query = time.perf_counter()
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "import_s": t_import - t0,
+    "open_s": t_open - t_import,
+    "first_query_s": t_query - t_open,
+    "rss_mb": rss_kb / 1024,
+}))
+"""
+
+
+def _startup_once(layout: str) -> Dict[str, float]:
+    from .config import CHROMA_DIR, CHROMA_STORE_DIR
+
+    out = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SNIPPET, layout, str(CHROMA_DIR), str(CHROMA_STORE_DIR)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(runs: int = 3) -> None:
+    table = Table(title=f"Ouverture des 3 collections (médiane sur {runs} process)")
+    for col in ("Layout", "Import (s)", "Ouverture (s)", "1re requête (s)", "RSS max (Mo)"):
+        table.add_column(col)
+    for layout in ("legacy", "shared"):
+        samples: List[Dict[str, float]] = [_startup_once(layout) for _ in range(runs)]
+        med = {k: statistics.median(s[k] for s in samples) for k in samples[0]}
+        table.add_row(
+            layout,
+            f"{med['import_s']:.3f}", f"{med['open_s']:.3f}",
+            f"{med['first_query_s']:.3f}", f"{med['rss_mb']:.0f}",
+        )
+    rprint(table)
+
+
+# --- recall vs latence ---
+
+
+def _synthetic_corpus(n: int, dim: int, clusters: int = 64, seed: int = 0) -> np.ndarray:
+    """Vecteurs normalisés groupés en clusters (plus réaliste qu'un bruit uniforme)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    points = centers[rng.integers(0, clusters, size=n)] + 0.35 * rng.normal(size=(n, dim))
+    return (points / np.linalg.norm(points, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _collection_vectors(key: str) -> np.ndarray:
+    from .config import COLLECTIONS, get_chroma_client
+
+    collection = get_chroma_client().get_collection(COLLECTIONS[key])
+    page = collection.get(include=["embeddings"])
+    return np.asarray(page["embeddings"], dtype=np.float32)
+
+
+def _scale_up(vectors: np.ndarray, n: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Agrandit un corpus réel à n vecteurs par copies bruitées."""
+    if len(vectors) >= n:
+        return vectors
+    rng = np.random.default_rng(seed)
+    extra = vectors[rng.integers(0, len(vectors), size=n - len(vectors))]
+    extra = extra + noise * rng.normal(size=extra.shape) * np.abs(vectors).mean()
+    return np.vstack([vectors, extra.astype(np.float32)])
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, space: str = "l2") -> np.ndarray:
+    """Indices des k plus proches voisins exacts (force brute)."""
+    if space == "cosine":
+        corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    if space == "l2":
+        dist = (corpus ** 2).sum(1)[None, :] - 2 * queries @ corpus.T
+    else:
+        dist = -(queries @ corpus.T)
+    idx = np.argpartition(dist, k, axis=1)[:, :k]
+    order = np.take_along_axis(dist, idx, axis=1).argsort(axis=1)
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def _build(client: object, corpus: np.ndarray, space: str, m: int, ef_construction: int) -> Tuple[object, float]:
+    start = time.perf_counter()
+    collection = client.create_collection(  # type: ignore[attr-defined]
+        f"bench-{uuid.uuid4().hex[:8]}",
+        configuration={"hnsw": {"space": space, "max_neighbors": m, "ef_construction": ef_construction}},
+    )
+    step = client.get_max_batch_size()  # type: ignore[attr-defined]
+    for offset in range(0, len(corpus), step):
+        chunk = corpus[offset:offset + step]
+        collection.add(ids=[str(i) for i in range(offset, offset + len(chunk))], embeddings=chunk)
+    return collection, time.perf_counter() - start
+
+
+def bench_recall(
+    corpus: np.ndarray,
+    n_queries: int = 200,
+    k: int = 5,
+    space: str = "l2",
+    m_values: Sequence[int] = (16, 32),
+    ef_construction_values: Sequence[int] = (100, 200),
+    ef_search_values: Sequence[int] = (16, 32, 64, 128, 256),
+    title: str = "",
+    query_noise: float = 1.0,
+) -> None:
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+    from chromadb.config import Settings
+
+    # requêtes = points du corpus fortement bruités (sinon chaque requête
+    # retrouve trivialement son point d'origine et le rappel sature à 1)
+    rng = np.random.default_rng(1)
+    base = corpus[rng.integers(0, len(corpus), size=n_queries)]
+    queries = (base + query_noise * corpus.std(axis=0) * rng.normal(size=base.shape)).astype(np.float32)
+    truth = exact_top_k(corpus, queries, k, space)
+
+    # ef_search n'est lu qu'au chargement de l'index : store persistant
+    # temporaire, rouvert (cache de clients vidé) à chaque valeur testée
+    tmp_dir = tempfile.mkdtemp(prefix="bench-hnsw-")
+    settings = Settings(anonymized_telemetry=False)
+    client = chromadb.PersistentClient(path=tmp_dir, settings=settings)
+    table = Table(title=f"HNSW {title} : {len(corpus)} vecteurs, {n_queries} requêtes, rappel@{k}")
+    for col in ("M", "ef_construction", "ef_search", f"Rappel@{k}", "p50 (ms)", "p99 (ms)", "Build (s)"):
+        table.add_column(col)
+
+    for m in m_values:
+        for ef_construction in ef_construction_values:
+            collection, build_s = _build(client, corpus, space, m, ef_construction)
+            for ef_search in ef_search_values:
+                collection.modify(configuration={"hnsw": {"ef_search": ef_search}})  # type: ignore[attr-defined]
+                SharedSystemClient.clear_system_cache()
+                client = chromadb.PersistentClient(path=tmp_dir, settings=settings)
+                collection = client.get_collection(collection.name)  # type: ignore[attr-defined]
+                latencies: List[float] = []
+                hits = 0
+                for q, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    res = collection.query(query_embeddings=[q], n_results=k, include=[])  # type: ignore[attr-defined]
+                    latencies.append(time.perf_counter() - start)
+                    hits += len({int(i) for i in res["ids"][0]} & set(expected.tolist()))
+                table.add_row(
+                    str(m), str(ef_construction), str(ef_search),
+                    f"{hits / (k * n_queries):.3f}",
+                    f"{np.percentile(latencies, 50) * 1000:.2f}",
+                    f"{np.percentile(latencies, 99) * 1000:.2f}",
+                    f"{build_s:.1f}",
+                )
+            client.delete_collection(collection.name)  # type: ignore[attr-defined]
+    SharedSystemClient.clear_system_cache()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    rprint(table)
+
+
+# --- Chroma vs index exact NumPy ---
+
+
+def bench_exact(n_queries: int = 500, k: int = 5) -> None:
+    from langchain_chroma import Chroma
+
+    from .config import COLLECTIONS, get_chroma_client, get_embeddings, get_hnsw_config
+    from .vector_backends import NumpyExactIndex
+
+    embeddings = get_embeddings()
+    table = Table(title=f"Chroma vs index exact NumPy ({n_queries} requêtes, k={k}, embedding exclu)")
+    for col in ("Collection", "Docs", "Chroma p50 (ms)", "NumPy p50 (ms)", "NumPy p99 (ms)", "Chargement (ms)", "Accord top-k"):
+        table.add_column(col)
+
+    rng = np.random.default_rng(0)
+    for key, name in COLLECTIONS.items():
+        chroma = Chroma(collection_name=name, embedding_function=embeddings, client=get_chroma_client())
+        count = chroma._collection.count()
+        if not count:
+            table.add_row(key, "0", "–", "–", "–", "–", "–")
+            continue
+        start = time.perf_counter()
+        exact = NumpyExactIndex(chroma, space=get_hnsw_config(key).get("space", "l2"))
+        load_ms = (time.perf_counter() - start) * 1000
+
+        vectors = exact._snapshot[0]
+        queries = vectors[rng.integers(0, count, size=n_queries)] + 0.5 * vectors.std(axis=0) * rng.normal(
+            size=(n_queries, vectors.shape[1])
+        )
+        timings: Dict[str, List[float]] = {"chroma": [], "numpy": []}
+        agree = 0
+        for q in queries.tolist():
+            t0 = time.perf_counter()
+            a = chroma.similarity_search_by_vector(q, k=k)
+            t1 = time.perf_counter()
+            b = exact.similarity_search_by_vector(q, k=k)
+            t2 = time.perf_counter()
+            timings["chroma"].append(t1 - t0)
+            timings["numpy"].append(t2 - t1)
+            agree += len({d.id for d in a} & {d.id for d in b})
+        table.add_row(
+            key, str(count),
+            f"{np.percentile(timings['chroma'], 50) * 1000:.3f}",
+            f"{np.percentile(timings['numpy'], 50) * 1000:.3f}",
+            f"{np.percentile(timings['numpy'], 99) * 1000:.3f}",
+            f"{load_ms:.0f}",
+            f"{agree / (k * n_queries):.3f}",
+        )
+    rprint(table)
+
+
+# --- quantification ---
+
+
+def bench_quant(corpus: np.ndarray, n_queries: int = 200, k: int = 5, title: str = "") -> None:
+    import chromadb
+    from chromadb.config import Settings
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from .vector_backends import NumpyExactIndex, QuantizedIndex
+
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    collection, _ = _build(client, corpus, "l2", 16, 100)
+    source = Chroma(
+        collection_name=collection.name,  # type: ignore[attr-defined]
+        client=client,
+        embedding_function=DeterministicFakeEmbedding(size=corpus.shape[1]),
+    )
+
+    rng = np.random.default_rng(1)
+    base = corpus[rng.integers(0, len(corpus), size=n_queries)]
+    queries = (base + corpus.std(axis=0) * rng.normal(size=base.shape)).astype(np.float32)
+    truth = exact_top_k(corpus, queries, k)
+
+    variants = [
+        ("float32 (exact)", NumpyExactIndex(source)),
+        ("int8", QuantizedIndex(source, "int8", rescore=0)),
+        ("int8 + rescore ×4", QuantizedIndex(source, "int8", rescore=4)),
+        ("binaire", QuantizedIndex(source, "binary", rescore=0)),
+        ("binaire + rescore ×10", QuantizedIndex(source, "binary", rescore=10)),
+    ]
+    table = Table(title=f"Quantification {title} : {len(corpus)} vecteurs dim {corpus.shape[1]}, rappel@{k}")
+    for col in ("Index", f"Rappel@{k}", "p50 (ms)", "p95 (ms)", "Vecteurs en mémoire (Mo)"):
+        table.add_column(col)
+
+    for label, index in variants:
+        latencies: List[float] = []
+        hits = 0
+        for q, expected in zip(queries.tolist(), truth):
+            start = time.perf_counter()
+            docs = index.similarity_search_by_vector(q, k=k)
+            latencies.append(time.perf_counter() - start)
+            hits += len({int(d.id) for d in docs} & set(expected.tolist()))
+        nbytes = index.nbytes() if isinstance(index, QuantizedIndex) else index._snapshot[0].nbytes
+        table.add_row(
+            label, f"{hits / (k * n_queries):.3f}",
+            f"{np.percentile(latencies, 50) * 1000:.2f}", f"{np.percentile(latencies, 95) * 1000:.2f}",
+            f"{nbytes / 2**20:.1f}",
+        )
+    rprint(table)
+
+
+# --- diversité (MMR / doublons) ---
+
+
+def _duplicated_corpus(n_recipes: int, dim: int, max_copies: int = 3, seed: int = 0) -> Tuple[np.ndarray, List[str], List[int]]:
+    """
+    Recettes + copies : exactes (même texte, même vecteur, comme une
+    ré-ingestion) ou quasi exactes (casse / espaces, vecteur légèrement bruité).
+    """
+    rng = np.random.default_rng(seed)
+    base = _synthetic_corpus(n_recipes, dim, seed=seed)
+    noise = 0.02 * base.std(axis=0)
+    vectors: List[np.ndarray] = []
+    texts: List[str] = []
+    owners: List[int] = []
+    for r in range(n_recipes):
+        text = f"Recette {r} : ingrédients, préparation, cuisson."
+        for copy in range(1 + int(rng.integers(0, max_copies + 1))):
+            if copy and rng.random() < 0.5:
+                vectors.append(base[r] + noise * rng.normal(size=dim))
+                texts.append(f"  RECETTE {r} :  ingrédients , préparation, cuisson ")
+            else:
+                vectors.append(base[r])
+                texts.append(text)
+            owners.append(r)
+    return np.asarray(vectors, dtype=np.float32), texts, owners
+
+
+def bench_diversity(
+    n_recipes: int = 2000, dim: int = 384, n_queries: int = 200, k: int = 5,
+    fetches: Sequence[int] = (2, 4, 8), lambdas: Sequence[float] = (0.7, 0.5),
+) -> None:
+    import chromadb
+    from chromadb.config import Settings
+    from langchain_chroma import Chroma
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from .diversity import diverse_search
+
+    corpus, texts, owners = _duplicated_corpus(n_recipes, dim)
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection(f"bench-{uuid.uuid4().hex[:8]}")
+    step = client.get_max_batch_size()
+    for offset in range(0, len(corpus), step):
+        end = min(offset + step, len(corpus))
+        collection.add(
+            ids=[str(i) for i in range(offset, end)], embeddings=corpus[offset:end],
+            documents=texts[offset:end], metadatas=[{"recipe": r} for r in owners[offset:end]],
+        )
+    store = Chroma(
+        collection_name=collection.name,  # type: ignore[attr-defined]
+        client=client,
+        embedding_function=DeterministicFakeEmbedding(size=dim),
+    )
+
+    rng = np.random.default_rng(1)
+    recipes = _synthetic_corpus(n_recipes, dim)
+    queries = (recipes[rng.integers(0, n_recipes, size=n_queries)]
+               + recipes.std(axis=0) * rng.normal(size=(n_queries, dim))).astype(np.float32)
+    truth = exact_top_k(recipes, queries, k)
+
+    variants: List[Tuple[str, Dict[str, object]]] = [("similarity", {"mode": "similarity"})]
+    variants += [(f"dedup, fetch ×{f}", {"mode": "dedup", "fetch": f}) for f in fetches]
+    variants += [
+        (f"mmr λ={lam}, fetch ×{f}", {"mode": "mmr", "fetch": f, "lambda_": lam})
+        for lam in lambdas for f in fetches
+    ]
+    table = Table(title=f"Diversité : {n_recipes} recettes, {len(corpus)} documents (doublons), k={k}")
+    for col in ("Mode", "Recettes uniques / k", "Rappel recettes", "p50 (ms)", "p95 (ms)"):
+        table.add_column(col)
+    for label, params in variants:
+        unique = recall = 0
+        latencies: List[float] = []
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            docs = diverse_search(store, "", k=k, query_vector=q.tolist(), **params)  # type: ignore[arg-type]
+            latencies.append(time.perf_counter() - start)
+            found = {int(d.metadata["recipe"]) for d in docs}
+            unique += len(found)
+            recall += len(found & set(expected.tolist()))
+        table.add_row(
+            label, f"{unique / n_queries:.2f}", f"{recall / (k * n_queries):.3f}",
+            f"{np.percentile(latencies, 50) * 1000:.2f}", f"{np.percentile(latencies, 95) * 1000:.2f}",
+        )
+    rprint(table)
+
+
+def _corpus_from_args(args: argparse.Namespace) -> Tuple[np.ndarray, str]:
+    if args.synthetic:
+        return _synthetic_corpus(args.synthetic, args.dim), "synthétique"
+    corpus = _collection_vectors(args.collection)
+    if args.scale:
+        return _scale_up(corpus, args.scale), f"{args.collection} ×{args.scale}"
+    return corpus, args.collection
+
+
+def _ints(raw: str) -> List[int]:
+    return [int(v) for v in raw.split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks des vector stores Chroma")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_startup = sub.add_parser("startup", help="temps d'ouverture et RSS, legacy vs client partagé")
+    p_startup.add_argument("--runs", type=int, default=3)
+
+    p_recall = sub.add_parser("recall", help="rappel@k vs latence sur une grille HNSW")
+    p_recall.add_argument("--collection", default="cookbooks", help="collection réelle (recipes, cookbooks, ustensils)")
+    p_recall.add_argument("--scale", type=int, default=0, help="agrandit le corpus réel à N vecteurs")
+    p_recall.add_argument("--synthetic", type=int, default=0, help="corpus synthétique de N vecteurs")
+    p_recall.add_argument("--dim", type=int, default=384)
+    p_recall.add_argument("--queries", type=int, default=200)
+    p_recall.add_argument("--k", type=int, default=5)
+    p_recall.add_argument("--space", default="l2", choices=("l2", "cosine", "ip"))
+    p_recall.add_argument("--m", default="16,32", help="valeurs de max_neighbors")
+    p_recall.add_argument("--ef-construction", default="100,200")
+    p_recall.add_argument("--ef-search", default="16,32,64,128,256")
+
+    p_quant = sub.add_parser("quant", help="index quantifié (int8 / binaire) vs float32")
+    p_quant.add_argument("--collection", default="cookbooks")
+    p_quant.add_argument("--scale", type=int, default=0)
+    p_quant.add_argument("--synthetic", type=int, default=0)
+    p_quant.add_argument("--dim", type=int, default=384)
+    p_quant.add_argument("--queries", type=int, default=200)
+    p_quant.add_argument("--k", type=int, default=5)
+
+    p_div = sub.add_parser("diversity", help="recettes uniques par k : similarity vs dedup vs MMR")
+    p_div.add_argument("--recipes", type=int, default=2000)
+    p_div.add_argument("--dim", type=int, default=384)
+    p_div.add_argument("--queries", type=int, default=200)
+    p_div.add_argument("--k", type=int, default=5)
+    p_div.add_argument("--fetch", default="2,4,8", help="sur-échantillonnage (× k)")
+    p_div.add_argument("--lambdas", default="0.7,0.5")
+
+    p_exact = sub.add_parser("exact", help="Chroma vs index exact NumPy sur les collections réelles")
+    p_exact.add_argument("--queries", type=int, default=500)
+    p_exact.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cmd == "startup":
+        bench_startup(args.runs)
+    elif args.cmd == "exact":
+        bench_exact(args.queries, args.k)
+    elif args.cmd == "diversity":
+        bench_diversity(
+            args.recipes, args.dim, args.queries, args.k, _ints(args.fetch),
+            [float(v) for v in args.lambdas.split(",") if v.strip()],
+        )
+    elif args.cmd == "quant":
+        corpus, title = _corpus_from_args(args)
+        bench_quant(corpus, args.queries, args.k, title)
+    elif args.cmd == "recall":
+        corpus, title = _corpus_from_args(args)
+        if len(corpus) <= args.k:
+            rprint(f"[red]Corpus trop petit ({len(corpus)} vecteurs)[/red]")
+            return
+        bench_recall(
+            corpus, args.queries, args.k, args.space,
+            _ints(args.m), _ints(args.ef_construction), _ints(args.ef_search), title,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+recipes/bench_embeddings.py
+
+Compare les backends d'embeddings de embeddings.get_embeddings, chacun dans un
+process neuf :
+
+- hf   : HuggingFaceEmbeddings (sentence-transformers + torch),
+- onnx : OnnxEmbeddings (onnxruntime, sans torch),
+- http : EmbeddingClient du serveur partagé (embedding_server.py, lancé
+  par le benchmark sur un socket Unix temporaire avec --server-backend),
+
+mesures : import + chargement du modèle (démarrage à froid), RSS après
+chargement et après encodage, débit d'encodage (textes / s), et écart
+cosinus entre backends sur les mêmes textes.
+
+    python -m recipes.bench_embeddings --texts 512
+    python -m recipes.bench_embeddings --backends onnx --threads 4 --batch-size 64
+    python -m recipes.bench_embeddings --backends onnx,http --server-backend onnx --clients 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from rich import print as rprint
+from rich.table import Table
+
+
+_DISHES = ["salade de quinoa", "gratin dauphinois", "sauce bolognaise", "tarte aux poireaux", "soupe de potimarron"]
+_DETAILS = [
+    "pour 4 personnes", "prête en 20 minutes", "avec des légumes de saison",
+    "à préparer la veille", "sans gluten", "en grande quantité pour congeler",
+]
+
+
+def _sample_texts(n: int) -> List[str]:
+    rng = np.random.default_rng(0)
+    return [
+        " ".join(
+            [_DISHES[rng.integers(len(_DISHES))]]
+            + [_DETAILS[j] for j in rng.choice(len(_DETAILS), size=rng.integers(1, 5), replace=False)]
+        ) * int(rng.integers(1, 6))
+        for _ in range(n)
+    ]
+
+
+def _rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(backend: str, n_texts: int, out: Path) -> Dict[str, float]:
+    os.environ["EMBEDDINGS_BACKEND"] = backend
+    texts = _sample_texts(n_texts)
+
+    start = time.perf_counter()
+    # embeddings.py seul : importer config ouvrirait aussi LLM / stores / Tavily
+    from .embeddings import get_embeddings
+
+    embeddings = get_embeddings()
+    embeddings.embed_query("échauffement")
+    load_s = time.perf_counter() - start
+    rss_loaded = _rss_mb()
+
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    encode_s = time.perf_counter() - start
+    np.save(out, vectors)
+
+    return {
+        "load_s": load_s,
+        "rss_loaded_mb": rss_loaded,
+        "rss_mb": _rss_mb(),
+        "texts_s": n_texts / encode_s,
+        "torch": float("torch" in sys.modules),
+    }
+
+
+def _start_server(backend: str, socket_path: Path, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    url = f"unix:{socket_path}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "recipes.embedding_server", "--url", url, "--backend", backend],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env,
+    )
+    while not socket_path.exists():
+        if server.poll() is not None:
+            raise SystemExit(f"serveur d'embeddings : {server.stderr.read().strip()}")
+        time.sleep(0.05)
+    return server, url
+
+
+def _server_health(url: str) -> Dict[str, float]:
+    from .embedding_server import EmbeddingClient
+
+    return EmbeddingClient(url).health()
+
+
+def _add_row(table: Table, label: str, r: Dict[str, float], vectors: np.ndarray, reference: Optional[np.ndarray]) -> None:
+    if reference is None:
+        agreement = "–"
+    elif vectors.shape == reference.shape:
+        cos = (vectors * reference).sum(1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1) + 1e-12
+        )
+        agreement = f"min {cos.min():.4f}"
+    else:
+        agreement = f"dim {vectors.shape[1]} ≠ {reference.shape[1]}"
+    table.add_row(
+        label, f"{r['load_s']:.2f}", f"{r['rss_loaded_mb']:.0f}", f"{r['rss_mb']:.0f}",
+        f"{r['texts_s']:.0f}", "oui" if r["torch"] else "non", agreement,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark des backends d'embeddings")
+    parser.add_argument("--backends", default="hf,onnx")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--server-backend", default="hf", help="modèle chargé par le serveur (backend http)")
+    parser.add_argument("--clients", type=int, default=1, help="process clients concurrents (backend http)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.texts, args.out)))
+        return
+
+    env = dict(os.environ, EMBEDDINGS_BATCH_SIZE=str(args.batch_size))
+    if args.threads:
+        env["ONNX_THREADS"] = str(args.threads)
+
+    table = Table(title=f"Embeddings : {args.texts} textes")
+    for col in ("Backend", "Import + chargement (s)", "RSS chargé (Mo)", "RSS max (Mo)", "Textes / s", "torch importé", "Cosinus vs 1er"):
+        table.add_column(col)
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench-emb-"))
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    server = None
+    if "http" in backends:
+        server, env["EMBEDDINGS_URL"] = _start_server(args.server_backend, tmp / "embeddings.sock", env)
+
+    reference = None
+    try:
+        for backend in backends:
+            clients = args.clients if backend == "http" else 1
+            procs = [
+                subprocess.Popen(
+                    [sys.executable, "-m", "recipes.bench_embeddings", "--worker", backend,
+                     "--texts", str(args.texts), "--out", str(tmp / f"{backend}-{i}.npy")],
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env,
+                )
+                for i in range(clients)
+            ]
+            results = [(p, *p.communicate()) for p in procs]
+            failed = [err for p, _, err in results if p.returncode != 0]
+            if failed:
+                reason = (failed[0].strip().splitlines() or ["?"])[-1]
+                rprint(f"[yellow]indisponible[/yellow] {backend} : {reason}")
+                continue
+            runs = [json.loads(out.strip().splitlines()[-1]) for _, out, _ in results]
+            r = {key: max(run[key] for run in runs) for key in runs[0]}
+            r["texts_s"] = sum(run["texts_s"] for run in runs)
+            _add_row(table, backend if clients == 1 else f"{backend} ×{clients}", r, np.load(tmp / f"{backend}-0.npy"), reference)
+            if reference is None:
+                reference = np.load(tmp / f"{backend}-0.npy")
+    finally:
+        if server is not None:
+            health = _server_health(env["EMBEDDINGS_URL"])
+            server.terminate()
+            server.wait()
+    rprint(table)
+    if server is not None:
+        rprint(
+            f"Serveur ({args.server_backend}) : {health['requests']} requêtes en {health['batches']} lots, "
+            f"{health['texts_per_batch']:.1f} textes / lot"
+        )
+
+
+if __name__ == "__main__":
+    main()
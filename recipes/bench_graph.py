@@ -0,0 +1,176 @@
+"""
+recipes/bench_graph.py
+
+Benchmark hors-ligne des points d'entrée du graphe (`build_graph`,
+`build_graph_async`, `main.run_stream`) contre les doublures de fakes.py :
+aucun Ollama, aucun modèle d'embeddings, aucune clé Tavily.
+
+    python -m recipes.bench_graph                       # FakeLLM in-process
+    python -m recipes.bench_graph --http                # via le serveur fake_ollama
+    python -m recipes.bench_graph --latency uniform:0.01,0.05 -n 20
+
+Rapporte par point d'entrée : temps total, temps passé dans le LLM factice
+et overhead du graphe (total - LLM).
+
+Le routage est scripté par requête (QUERIES) : sans règle, le Responder
+répondrait la première valeur de l'enum (NO_RAG) et aucune recherche ne
+serait mesurée. `--route` impose la même stratégie à toutes les requêtes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from rich import print as rprint
+from rich.table import Table
+
+
+# (requête, stratégie RAG renvoyée par le routeur factice)
+QUERIES: List[Tuple[str, str]] = [
+    ("Salade de quinoa, feta et concombre pour 2 personnes", "LOCAL_RECIPES"),
+    ("La tarte tatin du livret PDF de ma grand-mère", "COOKBOOKS"),
+    ("Quelles recettes de ramen sont tendance cette année ?", "WEB"),
+    ("Comment faire une vinaigrette ?", "NO_RAG"),
+]
+
+
+def route_rules(queries: List[Tuple[str, str]], route: Optional[str] = None) -> List[Dict[str, str]]:
+    """Règles Responder : le prompt de routage de chaque requête → sa stratégie (ou `route`)."""
+    return [
+        {
+            "match": r"routage RAG.*Question :\s*" + re.escape(query),
+            "response": json.dumps({"answer": route or strategy}),
+        }
+        for query, strategy in queries
+    ]
+
+
+def _setup_env(args: argparse.Namespace) -> None:
+    """Doit tourner AVANT l'import de recipes.config (objets créés au chargement)."""
+    os.environ["RECIPES_OFFLINE"] = "1"
+    # chaque run part d'un thread vide, comme avant le checkpointer persistant
+    os.environ.setdefault("CHECKPOINTER", "memory")
+    os.environ["FAKE_LLM_LATENCY"] = args.latency
+    os.environ["FAKE_LLM_TOKEN_LATENCY"] = str(args.token_latency)
+    # règles de l'utilisateur d'abord (prioritaires), puis le routage par requête
+    rules = json.loads(Path(args.script).read_text(encoding="utf-8")) if args.script else []
+    rules += route_rules(QUERIES, args.route)
+    script = tempfile.NamedTemporaryFile("w", suffix=".json", prefix="bench-graph-", delete=False)
+    with script:
+        json.dump(rules, script, ensure_ascii=False)
+    atexit.register(os.unlink, script.name)
+    os.environ["FAKE_LLM_SCRIPT"] = script.name
+    if args.cassette:
+        os.environ["FAKE_LLM_CASSETTE"] = args.cassette
+
+    if args.http:
+        from .fake_ollama import serve
+
+        server = serve(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        os.environ["LLM_BACKEND"] = "ollama"
+        os.environ["OLLAMA_BASE_URL"] = f"http://{host}:{port}"
+        rprint(f"[cyan]Fake Ollama HTTP sur {os.environ['OLLAMA_BASE_URL']}[/cyan]")
+
+
+def _measure(name: str, fn: Callable[[str], Any], n: int) -> Dict[str, Any]:
+    """`n` exécutions de `fn`, en parcourant les requêtes de QUERIES à tour de rôle."""
+    from . import instrumentation
+
+    totals: List[float] = []
+    llm_times: List[float] = []
+    calls = 0
+    for i in range(n):
+        instrumentation.reset()
+        start = time.perf_counter()
+        fn(QUERIES[i % len(QUERIES)][0])
+        totals.append(time.perf_counter() - start)
+        records = instrumentation.llm_calls()
+        calls += len(records)
+        llm_times.append(sum(r.get("latency_s", 0.0) for r in records))
+    return {
+        "name": name,
+        "total_s": statistics.fmean(totals),
+        "llm_s": statistics.fmean(llm_times),
+        "calls": calls / n,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hors-ligne du graphe recettes")
+    parser.add_argument("-n", type=int, default=8, help="itérations par point d'entrée (requêtes à tour de rôle)")
+    parser.add_argument("--http", action="store_true", help="passe par le serveur HTTP fake_ollama")
+    parser.add_argument("--latency", default="fixed:0")
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--script", help="règles JSON pour le Responder")
+    parser.add_argument(
+        "--route", choices=("NO_RAG", "LOCAL_RECIPES", "COOKBOOKS", "WEB"),
+        help="stratégie imposée à toutes les requêtes (défaut : celle de chaque requête)",
+    )
+    parser.add_argument("--cassette", help="cassette JSONL à rejouer")
+    args = parser.parse_args()
+
+    _setup_env(args)
+
+    from langchain_core.messages import HumanMessage
+    from langgraph.errors import GraphRecursionError
+
+    from .graph_builder import build_graph, build_graph_async
+
+    def _sync(query: str) -> None:
+        graph = build_graph()
+        state = {"query": query, "messages": [HumanMessage(content=query)]}
+        try:
+            # build_graph boucle GRADE → REWRITE → CLASSIFY : on borne la récursion
+            graph.invoke(state, config={"recursion_limit": 25})
+        except GraphRecursionError:
+            pass
+
+    def _async(query: str) -> None:
+        async def _run() -> None:
+            graph = await build_graph_async()
+            state = {"query": query, "messages": [HumanMessage(content=query)]}
+            await graph.ainvoke(state, config={"configurable": {"thread_id": "bench"}})
+
+        asyncio.run(_run())
+
+    def _stream(query: str) -> None:
+        from main import run_stream
+
+        asyncio.run(run_stream(query))
+
+    rows = [
+        _measure("build_graph", _sync, args.n),
+        _measure("build_graph_async", _async, args.n),
+        _measure("run_stream", _stream, args.n),
+    ]
+
+    routes = args.route or ", ".join(strategy for _, strategy in QUERIES)
+    table = Table(title=f"Graphe hors-ligne ({'HTTP' if args.http else 'in-process'}, n={args.n}, routes : {routes})")
+    for col in ("Point d'entrée", "Total (s)", "LLM factice (s)", "Overhead graphe (s)", "Appels LLM"):
+        table.add_column(col)
+    for r in rows:
+        table.add_row(
+            r["name"],
+            f"{r['total_s']:.4f}",
+            f"{r['llm_s']:.4f}",
+            f"{r['total_s'] - r['llm_s']:.4f}",
+            f"{r['calls']:.1f}",
+        )
+    rprint(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+recipes/bench_prompts.py
+
+Mesure la réutilisation du cache KV d'Ollama par nœud (prompt-eval).
+
+Pour chaque nœud de prompt_builder.NODE_PROMPTS et chaque layout
+("prefix" = préfixe système stable, "variable_first" = témoin), on envoie
+deux requêtes consécutives avec un contenu variable différent et on compare
+les `prompt_eval_count` / `prompt_eval_duration` renvoyés par Ollama :
+avec un préfixe stable, le 2e appel ne ré-évalue que la partie variable.
+
+    python -m recipes.bench_prompts
+    RECIPES_OFFLINE=1 FAKE_LLM_PROMPT_TOKEN_LATENCY=0.0005 python -m recipes.bench_prompts
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from rich import print as rprint
+from rich.table import Table
+
+from .config import get_node_llm
+from .instrumentation import OllamaStatsHandler
+from .prompt_builder import NODE_PROMPTS, build_messages
+
+
+SAMPLES: List[Dict[str, str]] = [
+    {
+        "query": "Salade de quinoa et feta pour 4 personnes en été",
+        "docs": "Salade de quinoa aux asperges vertes et citron. Printemps, 4 pers.",
+        "context": "Salade de lentilles vertes feta et herbes. Printemps, 2 pers.",
+        "plan": "1. Salade de quinoa, feta et concombre (20 min)",
+        "candidates": "1. Salade de quinoa, feta et concombre",
+    },
+    {
+        "query": "Sauce bolognaise pour 10 portions à congeler",
+        "docs": "Ragù alla bolognese : bœuf, porc, carotte, céleri, 3 h de mijotage.",
+        "context": "Sauce tomate de base, oignon, ail, basilic.",
+        "plan": "1. Bolognaise en grande cocotte (3 h)",
+        "candidates": "1. Bolognaise traditionnelle",
+    },
+]
+
+
+def _call(node: str, layout: str, values: Dict[str, str]) -> Dict[str, Any]:
+    stats = OllamaStatsHandler()
+    get_node_llm(node).invoke(
+        build_messages(node, layout=layout, **values),
+        config={"callbacks": [stats]},
+    )
+    return stats.stats
+
+
+def main() -> None:
+    table = Table(title="Prompt-eval par nœud : 1er appel → 2e appel (contenu variable différent)")
+    for col in ("Nœud", "Layout", "Tokens évalués", "Prompt-eval (ms)", "Réutilisation"):
+        table.add_column(col)
+
+    for node in NODE_PROMPTS:
+        for layout in ("prefix", "variable_first"):
+            first = _call(node, layout, SAMPLES[0])
+            second = _call(node, layout, SAMPLES[1])
+            t1, t2 = first.get("prompt_tokens", 0), second.get("prompt_tokens", 0)
+            ms1 = first.get("prompt_eval_s", 0.0) * 1000
+            ms2 = second.get("prompt_eval_s", 0.0) * 1000
+            reuse = f"{1 - t2 / t1:.0%}" if t1 else "–"
+            table.add_row(node, layout, f"{t1} → {t2}", f"{ms1:.1f} → {ms2:.1f}", reuse)
+
+    rprint(table)
+
+
+if __name__ == "__main__":
+    main()
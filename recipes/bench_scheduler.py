@@ -0,0 +1,105 @@
+"""
+recipes/bench_scheduler.py
+
+Compare appels LLM directs et ordonnanceur (llm_scheduler) sous charge :
+N sessions concurrentes enchaînent des appels courts (CLASSIFY_RAG,
+GRADE_RETRIEVAL) et longs (AGENT_NODE, GENERATE_STEPS).
+
+Rapporte par mode : débit (req/s), latence p50 / p95 des appels courts et
+longs, attente en file (mode ordonnanceur).
+
+    python -m recipes.bench_scheduler --sessions 8
+    RECIPES_OFFLINE=1 FAKE_LLM_PARALLEL=2 FAKE_LLM_TOKEN_LATENCY=0.005 \\
+        python -m recipes.bench_scheduler --sessions 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+from rich import print as rprint
+from rich.table import Table
+
+from .config import get_node_llm
+from .instrumentation import percentile
+from .llm_scheduler import LLMScheduler
+from .prompt_builder import build_messages
+from .schema import AGENT, CLASSIFY_RAG, GRADE_RETRIEVAL, STEPS
+
+
+# séquence d'une session type : routage, grading, génération, étapes
+SESSION: List[Tuple[str, Dict[str, str]]] = [
+    (CLASSIFY_RAG, {"query": "Salade de quinoa pour 4 personnes"}),
+    (GRADE_RETRIEVAL, {"query": "Salade de quinoa pour 4 personnes", "docs": "Salade de quinoa aux asperges."}),
+    (AGENT, {"query": "Salade de quinoa pour 4 personnes", "context": "Salade de quinoa aux asperges."}),
+    (STEPS, {"query": "Salade de quinoa pour 4 personnes", "plan": "1. Salade de quinoa"}),
+]
+SHORT_NODES = {CLASSIFY_RAG, GRADE_RETRIEVAL}
+
+
+def _run(sessions: int, scheduler: LLMScheduler | None) -> Dict[str, float]:
+    latencies: Dict[str, List[float]] = {"short": [], "long": []}
+    waits: List[float] = []
+
+    def _session(_: int) -> None:
+        for node, values in SESSION:
+            llm = get_node_llm(node)
+            messages = build_messages(node, **values)
+            start = time.perf_counter()
+            if scheduler is None:
+                llm.invoke(messages)
+            else:
+                _, wait = scheduler.submit(llm, messages, node=node)
+                waits.append(wait)
+            kind = "short" if node in SHORT_NODES else "long"
+            latencies[kind].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(_session, range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": sessions * len(SESSION) / elapsed,
+        "short_p50": percentile(latencies["short"], 0.5),
+        "short_p95": percentile(latencies["short"], 0.95),
+        "long_p50": percentile(latencies["long"], 0.5),
+        "long_p95": percentile(latencies["long"], 0.95),
+        "wait_p95": percentile(waits, 0.95),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de l'ordonnanceur LLM")
+    parser.add_argument("--sessions", type=int, default=8, help="sessions concurrentes")
+    parser.add_argument("--slots", type=int, default=None, help="slots de l'ordonnanceur")
+    args = parser.parse_args()
+
+    scheduler = LLMScheduler.from_env()
+    if args.slots:
+        scheduler = LLMScheduler(slots=args.slots)
+
+    rows = {
+        "direct": _run(args.sessions, None),
+        f"ordonnanceur ({scheduler.slots} slots)": _run(args.sessions, scheduler),
+    }
+
+    table = Table(title=f"Appels LLM concurrents ({args.sessions} sessions)")
+    for col in ("Mode", "Débit (req/s)", "Courts p50/p95 (s)", "Longs p50/p95 (s)", "Attente file p95 (s)"):
+        table.add_column(col)
+    for name, r in rows.items():
+        table.add_row(
+            name,
+            f"{r['throughput']:.2f}",
+            f"{r['short_p50']:.3f} / {r['short_p95']:.3f}",
+            f"{r['long_p50']:.3f} / {r['long_p95']:.3f}",
+            f"{r['wait_p95']:.3f}",
+        )
+    rprint(table)
+
+
+if __name__ == "__main__":
+    main()
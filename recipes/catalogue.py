@@ -0,0 +1,398 @@
+"""
+recipes/catalogue.py
+
+Catalogue colonnaire des recettes (Parquet) interrogé en SQL (DuckDB) :
+les contraintes structurées (« ≤30 min, 4 pers., été, végétarien ») sont
+des filtres exacts, pas une question à poser au LLM sur des hits vectoriels.
+
+- une ligne par recette : id, titre, saison, personnes, temps total (min),
+  ingrédients normalisés (`normalize_ingredient`), régimes (diet),
+- écrit par bloc à l'ingestion (`CatalogueWriter`, un fichier
+  data/catalogue/<source>.parquet par source, remplacé à chaque ingestion),
+- `structured_search` : filtres SQL sur read_parquet('data/catalogue/*.parquet'),
+  puis candidats reclassés par similarité avec la requête (vecteurs déjà
+  stockés dans 'recipes', cf. diversity.candidate_vectors).
+
+Régimes : colonne du CSV si présente, complétée par ceux déduits des
+ingrédients ; sans ingrédients (files/recipes_salades.csv), seuls les
+régimes déclarés sont gardés, rien n'est deviné du titre.
+
+    python -m recipes.catalogue "≤30 min, 4 pers., été, végétarien" --query "salade fraîche"
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, TypedDict
+
+from .ingredient_index import _words, normalize_ingredient
+
+
+class CatalogueRow(TypedDict):
+    id: str
+    title: str
+    season: str
+    people: Optional[int]
+    total_minutes: Optional[int]
+    ingredients: List[str]      # normalisés
+    diet: List[str]
+    source: str
+
+
+class StructuredQuery(TypedDict, total=False):
+    max_minutes: int
+    people: int
+    season: str                 # printemps | ete | automne | hiver
+    diet: List[str]             # tous requis
+    include: List[str]          # ingrédients requis
+    exclude: List[str]          # ingrédients exclus (allergies)
+
+
+class CatalogueHit(CatalogueRow):
+    score: Optional[float]      # similarité cosinus avec la requête (None sans requête)
+
+
+# Candidats SQL reclassés par similarité avant de garder les k premiers.
+CANDIDATES = 200
+
+
+# --- temps, personnes, régimes ---
+
+
+def parse_minutes(text: Any) -> Optional[int]:
+    """« 45 », « 45 min », « 1 h 30 », « 1h30 », « PT1H30M » (JSON-LD) → minutes."""
+    if text is None:
+        return None
+    s = str(text).strip().lower()
+    iso = re.fullmatch(r"p(?:\d+d)?t(?:(\d+)h)?(?:(\d+)m)?(?:\d+s)?", s)
+    if iso and (iso.group(1) or iso.group(2)):
+        return int(iso.group(1) or 0) * 60 + int(iso.group(2) or 0)
+    hours = re.search(r"(\d+)\s*h(?:eures?)?\s*(\d+)?", s)
+    if hours:
+        return int(hours.group(1)) * 60 + int(hours.group(2) or 0)
+    minutes = re.search(r"(\d+)", s)
+    return int(minutes.group(1)) if minutes else None
+
+
+def parse_people(text: Any) -> Optional[int]:
+    match = re.search(r"\d+", str(text or ""))
+    return int(match.group()) if match else None
+
+
+DIETS = ("végétarien", "végétalien", "pescétarien", "sans gluten")
+_DIET_ALIASES = {
+    "vegetarien": "végétarien", "vegetarienne": "végétarien", "veggie": "végétarien",
+    "vegetalien": "végétalien", "vegetalienne": "végétalien", "vegan": "végétalien",
+    "pescetarien": "pescétarien", "sans gluten": "sans gluten", "gluten free": "sans gluten",
+}
+# mêmes alias sous la forme de _words (« sans gluten » → « san gluten »)
+_DIET_KEYS = {" ".join(_words(alias)): diet for alias, diet in _DIET_ALIASES.items()}
+_MEAT = {
+    "poulet", "boeuf", "porc", "veau", "agneau", "canard", "dinde", "jambon", "lardon",
+    "bacon", "chorizo", "saucisse", "viande", "steak", "merguez", "magret", "volaille",
+}
+_FISH = {
+    "poisson", "saumon", "thon", "cabillaud", "crevette", "anchoi", "sardine", "moule",
+    "maquereau", "truite", "colin", "calamar", "crabe", "hareng",
+}
+_ANIMAL = {
+    "oeuf", "lait", "feta", "fromage", "chevre", "beurre", "creme", "yaourt", "miel",
+    "parmesan", "mozzarella", "ricotta", "comte", "burrata", "gruyere", "mascarpone",
+}
+_GLUTEN = {"ble", "farine", "pain", "pate", "semoule", "boulgour", "couscous", "orge", "seigle", "chapelure", "crouton"}
+
+
+def normalize_diet(raw: str) -> Optional[str]:
+    return _DIET_KEYS.get(" ".join(_words(raw)))
+
+
+def diet_tags(ingredients: Sequence[str], declared: Sequence[str] = ()) -> List[str]:
+    """Régimes déclarés (colonne du CSV), complétés par ceux déduits des ingrédients.
+
+    Sans liste d'ingrédients, rien n'est déduit : le titre ne dit pas qu'une
+    quiche contient des lardons.
+    """
+    tags = {d for d in (normalize_diet(x) for x in declared) if d}
+    if not ingredients:
+        return sorted(tags)
+    words = {w for i in ingredients for w in _words(i)}
+    if not words & _MEAT:
+        tags.add("végétarien" if not words & _FISH else "pescétarien")
+        if not words & (_FISH | _ANIMAL):
+            tags.add("végétalien")
+    if not words & _GLUTEN:
+        tags.add("sans gluten")
+    return sorted(tags)
+
+
+def catalogue_row(
+    id: str,
+    title: str,
+    season: str,
+    people: Any,
+    total_time: Any,
+    ingredients: Sequence[str],
+    diet: Sequence[str],
+    source: str,
+) -> CatalogueRow:
+    return {
+        "id": id,
+        "title": title,
+        "season": season,
+        "people": parse_people(people),
+        "total_minutes": parse_minutes(total_time) if total_time else None,
+        "ingredients": sorted({t for t in (normalize_ingredient(i) for i in ingredients) if t}),
+        "diet": diet_tags(ingredients, diet),
+        "source": source,
+    }
+
+
+# --- écriture Parquet ---
+
+
+def _arrow_schema() -> Any:
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("season", pa.string()),
+        ("people", pa.int32()),
+        ("total_minutes", pa.int32()),
+        ("ingredients", pa.list_(pa.string())),
+        ("diet", pa.list_(pa.string())),
+        ("source", pa.string()),
+    ])
+
+
+def catalogue_dir() -> Path:
+    from .config import CATALOGUE_DIR
+
+    return CATALOGUE_DIR
+
+
+class CatalogueWriter:
+    """
+    Fichier Parquet d'une source écrit bloc par bloc (un row group par bloc) ;
+    remplace l'ancien fichier à la fermeture seulement (lecteurs jamais
+    exposés à un fichier partiel).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.tmp = path.with_suffix(".parquet.tmp")
+        self.rows = 0
+        self._writer: Any = None
+
+    def write(self, rows: Sequence[CatalogueRow]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(str(self.tmp), _arrow_schema(), compression="zstd")
+        self._writer.write_table(pa.Table.from_pylist(list(rows), schema=_arrow_schema()))
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        if self._writer is None:
+            self.write([])
+        self._writer.close()
+        self.tmp.replace(self.path)
+
+    def __enter__(self) -> "CatalogueWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *_: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            if self._writer is not None:
+                self._writer.close()
+            self.tmp.unlink(missing_ok=True)
+
+
+# --- requêtes ---
+
+
+# clés issues de _words (pluriel retiré : « printemps » → « printemp »)
+_SEASONS = {
+    "printemps": "printemps", "printemp": "printemps", "ete": "ete", "estival": "ete",
+    "automne": "automne", "hiver": "hiver", "hivernal": "hiver",
+}
+
+
+def parse_constraints(text: str) -> StructuredQuery:
+    """« ≤30 min, 4 pers., été, végétarien » → {max_minutes, people, season, diet}."""
+    plain = " ".join(_words(text.replace("≤", " ").replace("<=", " ")))
+    raw = (text or "").lower()
+    query: StructuredQuery = {}
+
+    hours = re.search(r"(\d+)\s*h(?:eures?)?\s*(\d+)?(?![a-z])", raw)
+    minutes = re.search(r"(\d+)\s*(?:min|mn|minutes?)\b", raw)
+    if hours:
+        query["max_minutes"] = int(hours.group(1)) * 60 + int(hours.group(2) or 0)
+    elif minutes:
+        query["max_minutes"] = int(minutes.group(1))
+    people = re.search(r"(\d+)\s*(?:pers|personnes?|couverts?|parts?|convives?)\b", raw)
+    if people:
+        query["people"] = int(people.group(1))
+
+    for word in plain.split():
+        if word in _SEASONS:
+            query["season"] = _SEASONS[word]
+            break
+    diets = []
+    for alias, diet in _DIET_KEYS.items():
+        if re.search(rf"\b{alias}\b", plain) and diet not in diets:
+            diets.append(diet)
+    if diets:
+        query["diet"] = diets
+    return query
+
+
+_CONN: Any = None
+_CONN_LOCK = threading.Lock()
+
+
+def _cursor() -> Any:
+    """Curseur DuckDB (une connexion en mémoire par process, un curseur par appel)."""
+    global _CONN
+    import duckdb
+
+    with _CONN_LOCK:
+        if _CONN is None:
+            _CONN = duckdb.connect()
+        return _CONN.cursor()
+
+
+def sql_search(query: StructuredQuery, limit: int = CANDIDATES, directory: Optional[Path] = None) -> List[CatalogueHit]:
+    """Recettes qui respectent toutes les contraintes, les plus rapides d'abord."""
+    directory = directory or catalogue_dir()
+    if not any(directory.glob("*.parquet")):
+        return []
+    where, params = [], []
+    if "max_minutes" in query:
+        where.append("total_minutes <= ?")
+        params.append(query["max_minutes"])
+    if "people" in query:
+        where.append("people = ?")
+        params.append(query["people"])
+    if "season" in query:
+        where.append("strip_accents(lower(season)) = ?")
+        params.append(query["season"])
+    if query.get("diet"):
+        where.append("list_has_all(diet, ?::VARCHAR[])")
+        params.append(list(query["diet"]))
+    if query.get("include"):
+        where.append("list_has_all(ingredients, ?::VARCHAR[])")
+        params.append([normalize_ingredient(i) for i in query["include"]])
+    if query.get("exclude"):
+        where.append("NOT list_has_any(ingredients, ?::VARCHAR[])")
+        params.append([normalize_ingredient(i) for i in query["exclude"]])
+
+    sql = (
+        "SELECT id, title, season, people, total_minutes, ingredients, diet, source "
+        f"FROM read_parquet('{(directory / '*.parquet').as_posix()}') "
+        + (f"WHERE {' AND '.join(where)} " if where else "")
+        + "ORDER BY total_minutes NULLS LAST, title LIMIT ?"
+    )
+    cursor = _cursor()
+    rows = cursor.execute(sql, [*params, limit]).fetchall()
+    columns = [c[0] for c in cursor.description]
+    return [{**dict(zip(columns, row)), "score": None} for row in rows]  # type: ignore[misc]
+
+
+def structured_search(
+    query: StructuredQuery,
+    text: str = "",
+    k: int = 5,
+    store: Any = None,
+    directory: Optional[Path] = None,
+) -> List[CatalogueHit]:
+    """
+    Filtres SQL puis, si `text`, reclassement des candidats par similarité
+    cosinus avec la requête (vecteurs de la collection 'recipes').
+    """
+    hits = sql_search(query, directory=directory)
+    if not text or len(hits) <= 1:
+        return hits[:k]
+
+    import numpy as np
+    from langchain_core.documents import Document
+
+    from .diversity import candidate_vectors
+
+    if store is None:
+        from .config import RECIPES_VS as store
+    docs = [Document(id=h["id"], page_content=h["title"]) for h in hits]
+    vectors = candidate_vectors(store, docs)
+    q = np.asarray(store.embeddings.embed_query(text), dtype=np.float32)
+    scores = (vectors @ q) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(q) + 1e-12)
+    for hit, score in zip(hits, scores):
+        hit["score"] = round(float(score), 4)
+    return sorted(hits, key=lambda h: h["score"] or 0.0, reverse=True)[:k]
+
+
+def describe(hit: CatalogueRow) -> str:
+    """« Titre — 25 min, 4 pers., Été, végétarien »."""
+    parts = [
+        f"{hit['total_minutes']} min" if hit.get("total_minutes") else "",
+        f"{hit['people']} pers." if hit.get("people") else "",
+        hit.get("season") or "",
+        ", ".join(hit.get("diet") or []),
+    ]
+    return f"{hit['title']} — " + ", ".join(p for p in parts if p and p != "?")
+
+
+def as_retrieved_doc(hit: CatalogueHit) -> Dict[str, Any]:
+    return {
+        "id": hit["id"],
+        "source": "recipes",
+        "content": describe(hit),
+        "metadata": {
+            "id": hit["id"],
+            "title": hit["title"],
+            "season": hit["season"],
+            "people": hit["people"] or "?",
+            "total_minutes": hit["total_minutes"] or "?",
+            "diet": ", ".join(hit["diet"]),
+            "catalogue_score": hit["score"] if hit["score"] is not None else "",
+        },
+    }
+
+
+def main() -> None:
+    from rich import print as rprint
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Recherche structurée dans le catalogue Parquet (DuckDB)")
+    parser.add_argument("constraints", help="ex : « ≤30 min, 4 pers., été, végétarien »")
+    parser.add_argument("--query", default="", help="texte libre pour reclasser par similarité")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    query = parse_constraints(args.constraints)
+    start = time.perf_counter()
+    hits = sql_search(query)
+    sql_ms = (time.perf_counter() - start) * 1000
+    if args.query:
+        hits = structured_search(query, args.query, k=args.k)
+
+    table = Table(title=f"{query} — SQL {sql_ms:.1f} ms")
+    for col in ("ID", "Recette", "Min", "Pers.", "Saison", "Régimes", "Score"):
+        table.add_column(col)
+    for h in hits[:args.k]:
+        table.add_row(
+            h["id"], h["title"], str(h["total_minutes"] or "–"), str(h["people"] or "–"), h["season"],
+            ", ".join(h["diet"]), "" if h["score"] is None else f"{h['score']:.3f}",
+        )
+    rprint(table)
+
+
+if __name__ == "__main__":
+    main()
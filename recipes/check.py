@@ -1,14 +1,20 @@
 from rich import print as rprint
 
-try:
-    import torch
-except ImportError:
-    torch = None
-    
+
 # --- Check CUDA / GPU ---
 
 def _log_cuda_status() -> None:
-    """Affiche l'état CUDA/GPU dans la console (rich)."""
+    """
+    Affiche l'état CUDA/GPU dans la console (rich).
+
+    torch est importé ici seulement : l'import coûte plusieurs secondes et
+    des centaines de Mo, le check ne tourne que sur demande (CHECK_CUDA=1).
+    """
+    try:
+        import torch
+    except ImportError:
+        torch = None
+
     if torch is None:
         rprint("[bold yellow][CUDA][/bold yellow] [yellow]PyTorch non installé dans cette venv, impossible de tester le GPU.[/yellow]")
         return
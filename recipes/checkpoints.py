@@ -0,0 +1,491 @@
+"""
+recipes/checkpoints.py
+
+Checkpointer LangGraph persistant (SQLite async) pour `build_graph_async` :
+les sessions (thread_id) survivent au redémarrage, la base ne grossit pas
+sans borne dans les process longs.
+
+- une connexion partagée par boucle asyncio (toutes les compilations du
+  graphe de la boucle utilisent le même saver), réglée pour WAL :
+  synchronous=NORMAL, busy_timeout, auto_vacuum=INCREMENTAL (bases neuves),
+- écritures groupées : les commits d'AsyncSqliteSaver (un par checkpoint et
+  par lot de writes) sont regroupés, au plus CHECKPOINT_COMMIT_EVERY écritures
+  ou CHECKPOINT_COMMIT_MS ms non committées (perte max en cas de crash),
+- rétention : toutes les CHECKPOINT_PRUNE_EVERY écritures, on ne garde que
+  les CHECKPOINT_KEEP derniers checkpoints de chaque thread touché et on
+  supprime les threads inactifs depuis CHECKPOINT_MAX_AGE_DAYS jours,
+- vacuum quand les pages libres dépassent CHECKPOINT_VACUUM_RATIO du fichier
+  (incrémental si possible, sinon VACUUM complet) + troncature du WAL,
+- fermeture : `config.close_async_checkpointer()`, ou automatique en fin
+  d'`asyncio.run` (tâche gardienne annulée par la boucle).
+
+    python -m recipes.checkpoints stats
+    python -m recipes.checkpoints prune [--keep 10] [--max-age-days 7] [--vacuum]
+    python -m recipes.checkpoints bench --threads 20 --turns 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import operator
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Annotated, Any, Dict, Iterable, List, Optional, Sequence, Tuple, TypedDict
+
+import aiosqlite  # type: ignore
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from rich import print as rprint
+from rich.panel import Panel
+from rich.table import Table
+
+from . import instrumentation
+
+
+KEEP = int(os.getenv("CHECKPOINT_KEEP", "32"))                  # checkpoints gardés par thread
+MAX_AGE_DAYS = float(os.getenv("CHECKPOINT_MAX_AGE_DAYS", "30"))  # 0 = threads jamais expirés
+PRUNE_EVERY = int(os.getenv("CHECKPOINT_PRUNE_EVERY", "200"))   # écritures entre deux purges (0 = jamais)
+COMMIT_EVERY = int(os.getenv("CHECKPOINT_COMMIT_EVERY", "8"))   # 1 = commit à chaque écriture
+COMMIT_MS = float(os.getenv("CHECKPOINT_COMMIT_MS", "50"))
+VACUUM_RATIO = float(os.getenv("CHECKPOINT_VACUUM_RATIO", "0.25"))
+
+
+class PruneReport(TypedDict):
+    threads: int            # threads examinés
+    expired: int            # threads supprimés (inactifs)
+    checkpoints: int        # checkpoints supprimés
+    writes: int             # writes supprimés
+    vacuumed: bool
+    seconds: float
+
+
+# --- connexion ---
+
+
+class _BatchedCommits:
+    """
+    Connexion aiosqlite dont `commit()` est différé : AsyncSqliteSaver committe
+    après chaque écriture, on ne le fait qu'une fois toutes les `every`
+    écritures ou après `interval_s` (minuterie). Le reste est délégué.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, every: int = COMMIT_EVERY, interval_s: float = COMMIT_MS / 1000) -> None:
+        self._conn = conn
+        self.every = max(every, 1)
+        self.interval_s = interval_s
+        self.pending = 0
+        self.commits = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def __await__(self) -> Any:
+        return self._conn.__await__()
+
+    async def commit(self) -> None:
+        self.pending += 1
+        if self.pending >= self.every:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.interval_s, lambda: loop.create_task(self.flush()))
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # purge / activité : écritures hors AsyncSqliteSaver, transaction ouverte sans commit() en attente
+        if self.pending or self._conn.in_transaction:
+            self.pending = 0
+            self.commits += 1
+            await self._conn.commit()
+
+    async def close(self) -> None:
+        await self.flush()
+        await self._conn.close()
+
+
+async def connect(path: Path, every: int = COMMIT_EVERY, interval_s: float = COMMIT_MS / 1000) -> _BatchedCommits:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = await aiosqlite.connect(str(path))
+    # auto_vacuum n'a d'effet que sur une base vide (sinon après un VACUUM complet)
+    await conn.executescript(
+        """
+        PRAGMA auto_vacuum=INCREMENTAL;
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA busy_timeout=5000;
+        """
+    )
+    return _BatchedCommits(conn, every, interval_s)
+
+
+# --- saver ---
+
+
+class PersistentSqliteSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver + activité par thread, purge des anciens checkpoints et vacuum."""
+
+    def __init__(
+        self,
+        conn: Any,
+        *,
+        keep: int = KEEP,
+        max_age_days: float = MAX_AGE_DAYS,
+        prune_every: int = PRUNE_EVERY,
+        vacuum_ratio: float = VACUUM_RATIO,
+    ) -> None:
+        super().__init__(conn)
+        self.keep = max(keep, 1)
+        self.max_age_days = max_age_days
+        self.prune_every = prune_every
+        self.vacuum_ratio = vacuum_ratio
+        self.puts = 0
+        self._touched: Dict[str, float] = {}   # thread_id → dernière écriture (pas encore en base)
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        async with self.lock:
+            await self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS thread_activity (
+                    thread_id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL
+                );
+                INSERT OR IGNORE INTO thread_activity (thread_id, updated_at)
+                    SELECT DISTINCT thread_id, CAST(strftime('%s', 'now') AS REAL) FROM checkpoints;
+                """
+            )
+            await self.flush()
+
+    async def aput(self, config: Any, checkpoint: Any, metadata: Any, new_versions: Any) -> Any:
+        result = await super().aput(config, checkpoint, metadata, new_versions)
+        self._touched[str(config["configurable"]["thread_id"])] = time.time()
+        self.puts += 1
+        if self.prune_every and self.puts % self.prune_every == 0:
+            await self.prune(list(self._touched))
+        return result
+
+    async def flush(self) -> None:
+        """Committe les écritures en attente."""
+        if isinstance(self.conn, _BatchedCommits):
+            await self.conn.flush()
+        else:
+            await self.conn.commit()
+
+    async def _record_activity(self) -> None:
+        touched, self._touched = self._touched, {}
+        if touched:
+            await self.conn.executemany(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)", list(touched.items())
+            )
+
+    async def prune(self, thread_ids: Optional[Sequence[str]] = None, vacuum: Optional[bool] = None) -> PruneReport:
+        """
+        Garde les `keep` derniers checkpoints (et leurs writes) de chaque thread
+        de `thread_ids` (tous si None) et supprime les threads inactifs depuis
+        `max_age_days`. vacuum : None = selon les pages libres, True = forcé.
+        """
+        await self.setup()
+        start = time.perf_counter()
+        report: PruneReport = {"threads": 0, "expired": 0, "checkpoints": 0, "writes": 0, "vacuumed": False, "seconds": 0.0}
+        async with self.lock:
+            await self._record_activity()
+            if self.max_age_days > 0:
+                cutoff = time.time() - self.max_age_days * 86400
+                async with self.conn.execute("SELECT thread_id FROM thread_activity WHERE updated_at < ?", (cutoff,)) as cur:
+                    expired = [row[0] for row in await cur.fetchall()]
+                for table in ("checkpoints", "writes", "thread_activity"):
+                    await self.conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in expired])
+                report["expired"] = len(expired)
+            if thread_ids is None:
+                async with self.conn.execute("SELECT thread_id FROM thread_activity") as cur:
+                    thread_ids = [row[0] for row in await cur.fetchall()]
+            for thread_id in thread_ids:
+                removed = await self._prune_thread(str(thread_id))
+                report["checkpoints"] += removed[0]
+                report["writes"] += removed[1]
+            report["threads"] = len(thread_ids)
+            await self.flush()
+        if vacuum or (vacuum is None and (report["checkpoints"] or report["expired"])):
+            report["vacuumed"] = await self.vacuum(force=bool(vacuum))
+        report["seconds"] = time.perf_counter() - start
+        instrumentation.increment("checkpoints.pruned", report["checkpoints"])
+        return report
+
+    async def _prune_thread(self, thread_id: str) -> Tuple[int, int]:
+        removed = [0, 0]
+        async with self.conn.execute("SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)) as cur:
+            namespaces = [row[0] for row in await cur.fetchall()]
+        for ns in namespaces:
+            # ids uuid6 : l'ordre lexicographique est l'ordre chronologique
+            async with self.conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                (thread_id, ns, self.keep - 1),
+            ) as cur:
+                row = await cur.fetchone()
+            if row is None:
+                continue
+            for i, table in enumerate(("checkpoints", "writes")):
+                async with self.conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                    (thread_id, ns, row[0]),
+                ) as cur:
+                    removed[i] += cur.rowcount
+        return removed[0], removed[1]
+
+    async def vacuum(self, force: bool = False) -> bool:
+        """Rend les pages libres au système si elles dépassent `vacuum_ratio` (ou si forcé)."""
+        async with self.lock:
+            await self.flush()
+            pages, free, mode = [await self._pragma(p) for p in ("page_count", "freelist_count", "auto_vacuum")]
+            if not force and (not pages or free / pages < self.vacuum_ratio):
+                return False
+            # executescript va au bout des pragmas (un cursor ne libère qu'une page par pas) ;
+            # base créée avant auto_vacuum : le VACUUM complet la convertit aussi
+            vacuum = "PRAGMA incremental_vacuum;" if mode == 2 else "VACUUM;"
+            await self.conn.executescript(vacuum + " PRAGMA wal_checkpoint(TRUNCATE);")
+        instrumentation.increment("checkpoints.vacuums")
+        return True
+
+    async def _pragma(self, name: str) -> int:
+        async with self.conn.execute(f"PRAGMA {name}") as cur:
+            row = await cur.fetchone()
+        return int(row[0]) if row else 0
+
+    async def stats(self) -> Dict[str, Any]:
+        await self.setup()
+        async with self.lock:
+            await self._record_activity()
+            await self.flush()
+            counts = {}
+            for table in ("checkpoints", "writes", "thread_activity"):
+                async with self.conn.execute(f"SELECT count(*) FROM {table}") as cur:
+                    counts[table] = (await cur.fetchone())[0]
+            page_size = await self._pragma("page_size")
+            free = await self._pragma("freelist_count")
+        return {
+            "threads": counts["thread_activity"],
+            "checkpoints": counts["checkpoints"],
+            "writes": counts["writes"],
+            "free_mb": free * page_size / 1e6,
+            "commits": getattr(self.conn, "commits", None),
+        }
+
+    async def aclose(self) -> None:
+        if self.is_setup:
+            async with self.lock:
+                await self._record_activity()
+        await self.conn.close()
+
+
+# --- saver partagé (une connexion par boucle) ---
+
+
+# boucle → (saver, tâche de fermeture) ; la boucle ne garde qu'une référence
+# faible sur ses tâches : sans celle-ci, le GC détruirait la tâche en attente
+# et les commits groupés ne seraient jamais écrits
+_SAVERS: Dict[asyncio.AbstractEventLoop, Tuple[PersistentSqliteSaver, "asyncio.Task[None]"]] = {}
+
+
+async def _close_on_shutdown(loop: asyncio.AbstractEventLoop, saver: PersistentSqliteSaver) -> None:
+    # asyncio.run annule les tâches restantes puis attend leur fin : on ferme ici
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if _SAVERS.get(loop, (None,))[0] is saver:
+            del _SAVERS[loop]
+        await saver.aclose()
+
+
+async def get_saver(path: Optional[Path] = None) -> PersistentSqliteSaver:
+    """Saver partagé de la boucle courante (créé et préparé au premier appel)."""
+    loop = asyncio.get_running_loop()
+    if loop in _SAVERS:
+        return _SAVERS[loop][0]
+    if path is None:
+        from .config import CHECKPOINT_DB
+
+        path = CHECKPOINT_DB
+    saver = PersistentSqliteSaver(await connect(path))
+    await saver.setup()
+    if loop in _SAVERS:  # créé entre-temps par une autre tâche
+        await saver.aclose()
+        return _SAVERS[loop][0]
+    _SAVERS[loop] = (saver, loop.create_task(_close_on_shutdown(loop, saver)))
+    return saver
+
+
+async def close_saver() -> None:
+    """Flush et fermeture du saver de la boucle courante (sinon fait en fin d'asyncio.run)."""
+    entry = _SAVERS.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        entry[1].cancel()          # la tâche ferme le saver dans son finally
+        await asyncio.wait([entry[1]])
+
+
+# --- benchmark ---
+
+
+class _BenchState(TypedDict, total=False):
+    query: str
+    messages: Annotated[List[str], operator.add]
+    docs: List[str]
+    step: int
+
+
+def _bench_graph(saver: Any, nodes: int = 12) -> Any:
+    from langgraph.graph import END, StateGraph
+
+    builder = StateGraph(_BenchState)
+    names = [f"n{i}" for i in range(nodes)]
+
+    def node(state: _BenchState) -> Dict[str, Any]:
+        step = state.get("step", 0) + 1
+        # état proche de RecipeState : quelques documents récupérés + un message par nœud
+        return {"step": step, "docs": [f"doc {step}-{j} " + "tomate basilic " * 60 for j in range(4)], "messages": [f"étape {step}"]}
+
+    for name in names:
+        builder.add_node(name, node)
+    builder.set_entry_point(names[0])
+    for a, b in zip(names, names[1:]):
+        builder.add_edge(a, b)
+    builder.add_edge(names[-1], END)
+    return builder.compile(checkpointer=saver)
+
+
+def _timed(saver: Any, latencies: List[float]) -> None:
+    for name in ("aput", "aput_writes"):
+        method = getattr(saver, name)
+
+        async def wrapper(*args: Any, _method: Any = method, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return await _method(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        setattr(saver, name, wrapper)
+
+
+def _db_mb(path: Path) -> float:
+    return sum(p.stat().st_size for p in path.parent.glob(path.name + "*")) / 1e6
+
+
+async def _bench_variant(label: str, path: Path, threads: int, turns: int, concurrency: int) -> Dict[str, Any]:
+    if label == "stock":
+        saver: Any = AsyncSqliteSaver(await aiosqlite.connect(str(path)))
+    else:
+        saver = PersistentSqliteSaver(
+            await connect(path, every=1 if label == "wal" else COMMIT_EVERY),
+            prune_every=PRUNE_EVERY if label == "batch+prune" else 0,
+        )
+    await saver.setup()
+    latencies: List[float] = []
+    _timed(saver, latencies)
+    graph = _bench_graph(saver)
+    sem = asyncio.Semaphore(concurrency)
+
+    async def conversation(t: int) -> None:
+        for turn in range(turns):
+            async with sem:
+                await graph.ainvoke({"query": f"tour {turn}", "messages": [f"question {turn}"]}, {"configurable": {"thread_id": f"bench-{t}"}})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(t) for t in range(threads)))
+    elapsed = time.perf_counter() - start
+    if isinstance(saver, PersistentSqliteSaver):
+        await saver.flush()
+    size = _db_mb(path)
+    # reprise : le dernier état d'un thread est relu depuis la base
+    state = await graph.aget_state({"configurable": {"thread_id": "bench-0"}})
+    assert len(state.values["messages"]) == turns * 13, "état du thread incomplet"
+    if isinstance(saver, PersistentSqliteSaver):
+        await saver.aclose()
+    else:
+        await saver.conn.close()
+    return {
+        "label": label,
+        "writes": len(latencies),
+        "p50_ms": instrumentation.percentile(latencies, 0.5) * 1000,
+        "p95_ms": instrumentation.percentile(latencies, 0.95) * 1000,
+        "runs_s": threads * turns / elapsed,
+        "mb": size,
+    }
+
+
+async def bench(threads: int, turns: int, concurrency: int) -> List[Dict[str, Any]]:
+    tmp = Path(tempfile.mkdtemp(prefix="checkpoints-bench-"))
+    try:
+        return [
+            await _bench_variant(label, tmp / f"{label.replace('+', '_')}.sqlite", threads, turns, concurrency)
+            for label in ("stock", "wal", "batch", "batch+prune")
+        ]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _print_bench(rows: Iterable[Dict[str, Any]], threads: int, turns: int) -> None:
+    table = Table(title=f"Checkpointer SQLite : {threads} threads × {turns} tours, graphe de 12 nœuds")
+    for col in ("Variante", "Écritures", "p50 (ms)", "p95 (ms)", "runs/s", "Base + WAL (Mo)"):
+        table.add_column(col, justify="left" if col == "Variante" else "right")
+    for r in rows:
+        table.add_row(r["label"], str(r["writes"]), f"{r['p50_ms']:.2f}", f"{r['p95_ms']:.2f}", f"{r['runs_s']:.1f}", f"{r['mb']:.1f}")
+    rprint(table)
+    rprint(
+        "stock = AsyncSqliteSaver (commit par écriture, synchronous=FULL) ; wal = synchronous=NORMAL ; "
+        f"batch = commits groupés (CHECKPOINT_COMMIT_EVERY={COMMIT_EVERY}) ; "
+        f"batch+prune = + purge (CHECKPOINT_KEEP={KEEP}, toutes les {PRUNE_EVERY} écritures)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Checkpoints LangGraph (SQLite) : état, purge, benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    prune = sub.add_parser("prune")
+    prune.add_argument("--keep", type=int, default=KEEP)
+    prune.add_argument("--max-age-days", type=float, default=MAX_AGE_DAYS)
+    prune.add_argument("--vacuum", action="store_true", help="VACUUM même sous le seuil de pages libres")
+    b = sub.add_parser("bench")
+    b.add_argument("--threads", type=int, default=20)
+    b.add_argument("--turns", type=int, default=10)
+    b.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        _print_bench(asyncio.run(bench(args.threads, args.turns, args.concurrency)), args.threads, args.turns)
+        return
+
+    async def _run() -> None:
+        from .config import CHECKPOINT_DB
+
+        saver = await get_saver()
+        if args.command == "prune":
+            saver.keep, saver.max_age_days = max(args.keep, 1), args.max_age_days
+            report = await saver.prune(vacuum=True if args.vacuum else None)
+            rprint(
+                f"[green]Purge[/green] : {report['threads']} threads, {report['expired']} expirés, "
+                f"{report['checkpoints']} checkpoints et {report['writes']} writes supprimés"
+                f"{', vacuum' if report['vacuumed'] else ''} ({report['seconds']:.2f} s)"
+            )
+        stats = await saver.stats()
+        rprint(Panel.fit(
+            f"[bold cyan]{CHECKPOINT_DB}[/bold cyan] ({_db_mb(CHECKPOINT_DB):.1f} Mo avec le WAL)\n"
+            f"{stats['threads']} threads, {stats['checkpoints']} checkpoints, {stats['writes']} writes, "
+            f"{stats['free_mb']:.1f} Mo de pages libres"
+        ))
+        await close_saver()
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
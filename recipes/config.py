@@ -8,14 +8,21 @@ Tavily, checkpointer SQLite (async) pour LangGraph.
 from __future__ import annotations
 
 import os
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypedDict
 
 from dotenv import load_dotenv
-
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.llms import Ollama
-from langchain_chroma import Chroma
+from rich import print as rprint
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.runnables import Runnable
+from langchain_ollama import OllamaLLM
+import chromadb
+from chromadb.api import ClientAPI
+from chromadb.config import Settings
 from langchain_tavily import TavilySearch
 
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
@@ -23,101 +30,445 @@ import aiosqlite  # type: ignore
 from langgraph.checkpoint.memory import MemorySaver
 
 from .check import _log_cuda_status
+from .embeddings import get_embeddings
+from .vector_backends import NumpyExactIndex, QuantizedIndex, VectorBackend, open_backend
+from .schema import (
+    ANALYZE,
+    CLASSIFY_RAG,
+    GRADE_RETRIEVAL,
+    REWRITE_QUERY,
+    CLARIFY_USER,
+    AGENT,
+    STEPS,
+    RAG_STRATEGIES,
+    RETRIEVAL_QUALITIES,
+)
 
 
 # --- chemins & .env ---
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.getenv("RECIPES_DATA_DIR") or BASE_DIR / "data")  # tests : répertoire temporaire
 CHROMA_DIR = DATA_DIR / "chroma"
+# store Chroma unique (un seul PersistentClient pour toutes les collections)
+CHROMA_STORE_DIR = CHROMA_DIR / "store"
 CHECKPOINT_DB = DATA_DIR / "recipes_checkpoints.sqlite"
+INGREDIENT_INDEX_PATH = DATA_DIR / "ingredient_index.json"  # ingredient_index.py
+RETRIEVAL_CACHE_DB = DATA_DIR / "retrieval_cache.sqlite"    # retrieval_cache.py
+CATALOGUE_DIR = DATA_DIR / "catalogue"                      # catalogue.py (un .parquet par source)
+PDF_CACHE_DIR = DATA_DIR / "pdf_cache"                      # pdf_cache.py (texte extrait des PDFs)
+INGEST_DAEMON_METRICS = DATA_DIR / "ingest_daemon.json"     # ingest_daemon.py (métriques)
+INGEST_JOURNAL_DB = DATA_DIR / "ingest_jobs.sqlite"         # ingest_jobs.py (reprise des ingestions)
+NEAR_DUP_DB = DATA_DIR / "near_dup.sqlite"                  # near_duplicates.py (signatures MinHash)
 
 DATA_DIR.mkdir(exist_ok=True)
 CHROMA_DIR.mkdir(exist_ok=True)
 
 load_dotenv()
 
+# RECIPES_OFFLINE=1 → doublures de fakes.py (LLM, embeddings, Tavily) par défaut,
+# pour exécuter / benchmarker le graphe sans Ollama ni réseau.
+OFFLINE = os.getenv("RECIPES_OFFLINE", "0") == "1"
+
 
+def _backend(var: str) -> str:
+    return os.getenv(var) or ("fake" if OFFLINE else "")
 
-    
-# appeler le check au chargement du module
-_log_cuda_status()
+
+# check CUDA à la demande seulement (CHECK_CUDA=1 ou `python -m recipes.check`) :
+# il importe torch, qui domine le démarrage à froid et la RSS.
+if os.getenv("CHECK_CUDA", "0") == "1":
+    _log_cuda_status()
 
 # --- LLM principal : Mistral 3B local via Ollama ---
 
 
-def get_llm() -> Ollama:
+class GenerationProfile(TypedDict, total=False):
+    """Paramètres de génération Ollama appliqués à un nœud."""
+
+    temperature: float
+    num_predict: int           # nombre max de tokens générés
+    stop: List[str]            # séquences d'arrêt
+    format: Any                # "json" ou schéma JSON (décodage contraint)
+
+
+def _choice_schema(choices: Sequence[str]) -> Dict[str, Any]:
+    """Schéma JSON qui force la réponse à un seul token parmi `choices`."""
+    return {
+        "type": "object",
+        "properties": {"answer": {"type": "string", "enum": list(choices)}},
+        "required": ["answer"],
+    }
+
+
+# Profils par nœud : les nœuds "réponse courte" (routage, grading) sortent un
+# token d'un ensemble fixe, inutile de laisser le 3B générer des paragraphes.
+GENERATION_PROFILES: Dict[str, GenerationProfile] = {
+    ANALYZE: {"temperature": 0.0, "num_predict": 256, "format": "json"},
+    CLASSIFY_RAG: {
+        "temperature": 0.0,
+        "num_predict": 24,
+        "format": _choice_schema(RAG_STRATEGIES),
+    },
+    GRADE_RETRIEVAL: {
+        "temperature": 0.0,
+        "num_predict": 24,
+        "format": _choice_schema(RETRIEVAL_QUALITIES),
+    },
+    REWRITE_QUERY: {"temperature": 0.0, "num_predict": 96, "stop": ["\n\n"]},
+    CLARIFY_USER: {"temperature": 0.2, "num_predict": 64, "stop": ["\n"]},
+}
+
+
+# --- registre de modèles par nœud (tiering) ---
+
+
+class ModelProfile(TypedDict, total=False):
+    """Modèle / backend qui sert un nœud."""
+
+    backend: str               # "ollama" ou "heuristic"
+    model: str                 # nom du modèle Ollama
+    base_url: Optional[str]    # serveur Ollama (None → défaut)
+    tier: str                  # "small" / "large"
+
+
+# Nœuds de contrôle (routage, grading, réécriture) → petit modèle,
+# nœuds de génération longue → modèle principal.
+NODE_MODEL_TIERS: Dict[str, str] = {
+    ANALYZE: "small",
+    CLASSIFY_RAG: "small",
+    GRADE_RETRIEVAL: "small",
+    REWRITE_QUERY: "small",
+    CLARIFY_USER: "small",
+    AGENT: "large",
+    STEPS: "large",
+}
+
+# Nœuds pour lesquels nodes.py sait répondre sans LLM (backend "heuristic").
+HEURISTIC_NODES = {CLASSIFY_RAG, GRADE_RETRIEVAL, REWRITE_QUERY}
+
+
+def get_model_profile(node: Optional[str] = None) -> ModelProfile:
+    """
+    Résout le modèle qui sert `node`, depuis l'environnement :
+
+    - LLM_MODEL_<NODE>      : "heuristic", "ollama:<modèle>" ou "<modèle>"
+    - LLM_BASE_URL_<NODE>   : serveur Ollama dédié au nœud
+    - LLM_SMALL_MODEL       : modèle du tier "small" (défaut : modèle principal)
+    - MISTRAL_LOCAL_MODEL   : modèle du tier "large"
+    - OLLAMA_BASE_URL       : serveur Ollama par défaut
+
+    ex : LLM_MODEL_CLASSIFY_RAG=heuristic, LLM_SMALL_MODEL=qwen2.5:0.5b
+    """
+    large = os.getenv("MISTRAL_LOCAL_MODEL", "ministral-3:3b")
+    tier = NODE_MODEL_TIERS.get(node or "", "large")
+    default_model = (os.getenv("LLM_SMALL_MODEL") or large) if tier == "small" else large
+
+    spec = (os.getenv(f"LLM_MODEL_{node}") or "").strip() if node else ""
+    backend, _, model = spec.partition(":") if spec.startswith("ollama:") else ("", "", spec)
+    if spec == "heuristic":
+        if node in HEURISTIC_NODES:
+            backend, model = "heuristic", ""
+        else:
+            rprint(f"[yellow]Pas d'heuristique pour {node}, fallback sur Ollama[/yellow]")
+            model = ""
+
+    return {
+        "backend": backend or "ollama",
+        "model": model or default_model,
+        "base_url": (
+            (os.getenv(f"LLM_BASE_URL_{node}") if node else None)
+            or os.getenv("OLLAMA_BASE_URL")
+        ),
+        "tier": tier,
+    }
+
+
+def get_llm(
+    profile: Optional[GenerationProfile] = None,
+    model: Optional[ModelProfile] = None,
+) -> Runnable:
     """
     Retourne le LLM principal (Mistral 3B local via Ollama).
 
+    `profile` permet de surcharger température, max tokens, stop et `format`
+    (sortie JSON / enum contrainte). LLM_CONSTRAINED_DECODING=0 désactive
+    `format` pour les versions d'Ollama qui ne le supportent pas.
+    `model` (registre par nœud) choisit le modèle / serveur Ollama.
+    LLM_BACKEND=fake → `FakeLLM` in-process (voir fakes.py).
+
     Assure-toi que le modèle 'ministral-3:3b' est présent côté Ollama :
         ollama pull ministral-3:3b
     """
-    model_name = os.getenv("MISTRAL_LOCAL_MODEL", "ministral-3:3b")
-    temperature = float(os.getenv("LLM_TEMPERATURE", "0.3"))
-
-    return Ollama(
-        model=model_name,
-        temperature=temperature,
-    )
+    model = model or get_model_profile()
+    params: Dict[str, Any] = {
+        "temperature": float(os.getenv("LLM_TEMPERATURE", "0.3")),
+    }
+    params.update(profile or {})
+    fmt = params.pop("format", None)
+    if os.getenv("LLM_CONSTRAINED_DECODING", "1") == "0":
+        fmt = None
+    if model.get("base_url"):
+        params["base_url"] = model["base_url"]
+
+    if _backend("LLM_BACKEND") == "fake":
+        from .fakes import FakeLLM
+
+        llm: BaseLLM = FakeLLM(model=model["model"], **params)
+    else:
+        llm = OllamaLLM(model=model["model"], **params)
+
+    # OllamaLLM n'accepte un schéma JSON pour `format` qu'à l'appel
+    return llm.bind(format=fmt) if fmt else llm
+
+
+@lru_cache(maxsize=None)
+def get_node_llm(node: str) -> Runnable:
+    """
+    LLM configuré pour le nœud `node` (constantes de schema.py) :
+    modèle du registre + profil de génération. Sans profil dédié →
+    réglages par défaut.
+    """
+    return get_llm(GENERATION_PROFILES.get(node), get_model_profile(node))
 
 
 # --- embeddings & vector stores ---
 
 
-def get_embeddings() -> HuggingFaceEmbeddings:
+# Collections du store partagé. Avant, chaque collection avait son propre
+# persist_directory (CHROMA_DIR/<dossier>) ; LEGACY_STORES sert à la migration
+# (recipes/migrate_chroma.py) : clé → (dossier, nom de collection historique).
+COLLECTIONS: Dict[str, str] = {
+    "recipes": "recipes",
+    "cookbooks": "cookbooks",
+    "ustensils": "ustensils",
+    "recipe_fields": "recipe_fields",  # multi-vecteur : un vecteur par champ de recette
+}
+LEGACY_STORES: Dict[str, Tuple[str, str]] = {
+    "recipes": ("recipes", "pdfs"),
+    "cookbooks": ("cookbooks", "cookbooks"),
+    "ustensils": ("ustensils", "ustensils"),
+}
+
+
+class HNSWConfig(TypedDict, total=False):
+    """Paramètres de l'index HNSW d'une collection Chroma."""
+
+    space: str                 # "l2" | "cosine" | "ip"       (à la création)
+    max_neighbors: int         # M : liens par nœud             (à la création)
+    ef_construction: int       # largeur de recherche au build  (à la création)
+    ef_search: int             # largeur de recherche à la requête (modifiable)
+    num_threads: int
+    batch_size: int
+    sync_threshold: int
+
+
+# Paramètres modifiables sur une collection existante ; les autres imposent
+# de reconstruire l'index (python -m recipes.migrate_chroma --reindex).
+HNSW_UPDATABLE = ("ef_search", "num_threads", "batch_size", "sync_threshold")
+
+# Réglages par collection, à ajuster avec `python -m recipes.bench_chroma recall`.
+# recipes / ustensils restent petites ; cookbooks grossit avec la bibliothèque
+# de PDFs → graphe plus dense et ef_search plus large pour garder le rappel.
+HNSW_CONFIGS: Dict[str, HNSWConfig] = {
+    "recipes": {"space": "l2", "max_neighbors": 16, "ef_construction": 100, "ef_search": 64},
+    "cookbooks": {"space": "l2", "max_neighbors": 32, "ef_construction": 200, "ef_search": 128},
+    "ustensils": {"space": "l2", "max_neighbors": 16, "ef_construction": 100, "ef_search": 64},
+    "recipe_fields": {"space": "l2", "max_neighbors": 16, "ef_construction": 100, "ef_search": 64},
+}
+
+
+def get_hnsw_config(key: str) -> HNSWConfig:
     """
-    Embeddings pour les vector stores (recettes, PDFs, ustensiles).
+    Paramètres HNSW de la collection `key`, surchargeables par variable
+    d'environnement : HNSW_<COLLECTION>_<PARAM> (ex: HNSW_COOKBOOKS_EF_SEARCH=256).
+    """
+    config: HNSWConfig = dict(HNSW_CONFIGS.get(key, {}))  # type: ignore[assignment]
+    for param in HNSWConfig.__annotations__:
+        raw = os.getenv(f"HNSW_{key.upper()}_{param.upper()}")
+        if raw:
+            config[param] = raw if param == "space" else int(raw)  # type: ignore[literal-required]
+    return config
+
 
-    Ici HuggingFaceEmbeddings, 100 % local.
+def sync_hnsw_config(collection: Any, key: str) -> None:
+    """
+    Aligne l'index d'une collection existante sur get_hnsw_config(key) :
+    applique les paramètres modifiables, signale ceux qui demandent un rebuild.
+    ef_search n'est lu qu'au chargement de l'index : à appeler avant la
+    première requête du process (cf. get_vectorstores).
     """
-    model_name = os.getenv(
-        "EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+    wanted = get_hnsw_config(key)
+    current = (collection.configuration or {}).get("hnsw") or {}
+    update = {p: wanted[p] for p in HNSW_UPDATABLE if p in wanted and current.get(p) != wanted[p]}
+    if update:
+        collection.modify(configuration={"hnsw": update})
+    stale = [p for p in wanted if p not in HNSW_UPDATABLE and current.get(p) != wanted[p]]
+    if stale and collection.count():
+        rprint(
+            f"[yellow][Chroma] {collection.name} : {', '.join(stale)} diffère(nt) de la config "
+            "→ python -m recipes.migrate_chroma --reindex[/yellow]"
+        )
+
+
+@lru_cache(maxsize=None)
+def get_chroma_client() -> ClientAPI:
+    """
+    Client Chroma unique du processus, partagé par toutes les collections
+    (une seule base SQLite, un seul cache HNSW).
+
+    CHROMA_CLIENT :
+    - persistent (défaut) : PersistentClient sur CHROMA_STORE_DIR (ou CHROMA_PATH)
+    - http      : serveur Chroma (CHROMA_HOST / CHROMA_PORT)
+    - ephemeral : en mémoire (tests, benchmarks)
+    """
+    settings = Settings(anonymized_telemetry=False)
+    kind = os.getenv("CHROMA_CLIENT", "persistent")
+    if kind == "http":
+        return chromadb.HttpClient(
+            host=os.getenv("CHROMA_HOST", "localhost"),
+            port=int(os.getenv("CHROMA_PORT", "8000")),
+            settings=settings,
+        )
+    if kind == "ephemeral":
+        return chromadb.EphemeralClient(settings=settings)
+    return chromadb.PersistentClient(
+        path=os.getenv("CHROMA_PATH") or str(CHROMA_STORE_DIR),
+        settings=settings,
     )
-    return HuggingFaceEmbeddings(model_name=model_name,  model_kwargs={"device": "cpu"}, )
 
 
-def get_vectorstores() -> Tuple[Chroma, Chroma, Chroma]:
+def legacy_stores_pending(client: Optional[ClientAPI] = None) -> List[str]:
     """
-    Initialise / ouvre les vector stores :
-    - recipes   : recettes scrapées / JSON-LD
-    - cookbooks : PDFs de cuisine
-    - ustensils : catalogue d'ustensiles
+    Anciens stores (un dossier par collection) pas encore migrés : collection
+    cible absente ou vide. get_vectorstores crée les collections au premier
+    lancement, leur simple existence ne prouve pas la migration.
+    """
+    client = client or get_chroma_client()
+    existing = {c.name for c in client.list_collections()}
+    return [
+        key
+        for key, (folder, _) in LEGACY_STORES.items()
+        if (CHROMA_DIR / folder / "chroma.sqlite3").exists()
+        and (COLLECTIONS[key] not in existing or client.get_collection(COLLECTIONS[key]).count() == 0)
+    ]
+
+
+# Collections Chroma sous ce seuil (ustensiles, salades…) servies par un index
+# exact NumPy en mémoire (vector_backends.NumpyExactIndex), seuil revérifié à
+# chaque rechargement de l'index. 0 → désactivé.
+NUMPY_INDEX_MAX_DOCS = int(os.getenv("NUMPY_INDEX_MAX_DOCS", "2000"))
+NUMPY_INDEX_REFRESH_S = float(os.getenv("NUMPY_INDEX_REFRESH_S", "30"))
+
+# Quantification des vecteurs servis en mémoire (vector_backends.QuantizedIndex) :
+# none | int8 | binary, surchargeable par QUANTIZE_<COLLECTION>. Les candidats
+# (QUANTIZE_RESCORE × k, défaut 4 en int8 / 10 en binaire) sont reclassés
+# avec les float32 de Chroma.
+QUANTIZATION: Dict[str, str] = {"recipes": "none", "cookbooks": "none", "ustensils": "none", "recipe_fields": "none"}
+QUANTIZE_RESCORE: Optional[int] = int(os.environ["QUANTIZE_RESCORE"]) if os.getenv("QUANTIZE_RESCORE") else None
 
-    Chaque store est dans un sous-dossier de CHROMA_DIR.
+
+def get_quantization(key: str) -> str:
+    return os.getenv(f"QUANTIZE_{key.upper()}") or QUANTIZATION.get(key, "none")
+
+
+def get_vector_backend_kind(key: str) -> str:
+    """Backend de la collection `key` : VECTOR_BACKEND_<COLLECTION>, sinon VECTOR_BACKEND (chroma)."""
+    return os.getenv(f"VECTOR_BACKEND_{key.upper()}") or os.getenv("VECTOR_BACKEND", "chroma")
+
+
+def get_store_embeddings() -> Embeddings:
+    """
+    Embeddings des vector stores. EMBEDDINGS_BATCHER=1 (posé par ingest.py) :
+    derrière un DynamicBatcher partagé, les sources ingérées en parallèle
+    regroupent leurs textes dans un seul worker d'embeddings.
     """
     embeddings = get_embeddings()
+    if os.getenv("EMBEDDINGS_BATCHER", "0") == "1":
+        from .embedding_server import BatchedEmbeddings
 
-    recipes_vs = Chroma(
-        collection_name="pdfs",
-        embedding_function=embeddings,
-        persist_directory=str(CHROMA_DIR / "recipes"),
-    )
+        return BatchedEmbeddings(
+            embeddings,
+            max_batch=int(os.getenv("EMBEDDINGS_BATCHER_MAX", "256")),
+            max_wait_s=float(os.getenv("EMBEDDINGS_BATCHER_WAIT_MS", "10")) / 1000,
+        )
+    return embeddings
 
-    cookbooks_vs = Chroma(
-        collection_name="cookbooks",
-        embedding_function=embeddings,
-        persist_directory=str(CHROMA_DIR / "cookbooks"),
-    )
-
-    ustensils_vs = Chroma(
-        collection_name="ustensils",
-        embedding_function=embeddings,
-        persist_directory=str(CHROMA_DIR / "ustensils"),
-    )
 
-    return recipes_vs, cookbooks_vs, ustensils_vs
+def get_vectorstores(
+    embeddings: Optional[Embeddings] = None,
+) -> Tuple[VectorBackend, VectorBackend, VectorBackend, VectorBackend]:
+    """
+    Initialise / ouvre les vector stores :
+    - recipes       : recettes scrapées / JSON-LD
+    - cookbooks     : PDFs de cuisine
+    - ustensils     : catalogue d'ustensiles
+    - recipe_fields : un vecteur par champ de recette (titre, ingrédients,
+      préparation), relié à la recette par `parent_id` (multivector.py)
+
+    Backend par collection (vector_backends.py) : Chroma par défaut, avec
+    un client partagé (`get_chroma_client`) et un index HNSW réglé par
+    collection (HNSW_CONFIGS) ; sinon sqlite-vec, DuckDB ou Qdrant local.
+    Les petites collections Chroma (<= NUMPY_INDEX_MAX_DOCS) sont servies
+    par un index exact NumPy en mémoire, celles avec QUANTIZE_<COLLECTION>
+    par un index quantifié (int8 / binaire).
+    """
+    embeddings = embeddings or get_embeddings()
+    kinds = {key: get_vector_backend_kind(key) for key in COLLECTIONS}
+
+    if "chroma" in kinds.values():
+        pending = legacy_stores_pending()
+        if pending:
+            rprint(
+                f"[yellow][Chroma] anciens stores non migrés : {', '.join(pending)} "
+                "→ python -m recipes.migrate_chroma[/yellow]"
+            )
+
+    stores: List[VectorBackend] = []
+    for key, kind in kinds.items():
+        hnsw = get_hnsw_config(key)
+        if kind == "chroma":
+            vs = open_backend(
+                kind, COLLECTIONS[key], embeddings, DATA_DIR,
+                chroma_client=get_chroma_client(),
+                chroma_configuration={"hnsw": hnsw},
+            )
+            sync_hnsw_config(vs._collection, key)  # type: ignore[attr-defined]
+            space = hnsw.get("space", "l2")
+            quantization = get_quantization(key)
+            if quantization != "none":
+                vs = QuantizedIndex(
+                    vs, mode=quantization, space=space,
+                    rescore=QUANTIZE_RESCORE, refresh_s=NUMPY_INDEX_REFRESH_S, version_key=key,
+                )
+            elif NUMPY_INDEX_MAX_DOCS > 0:
+                vs = NumpyExactIndex(
+                    vs, space=space, refresh_s=NUMPY_INDEX_REFRESH_S,
+                    max_docs=NUMPY_INDEX_MAX_DOCS, version_key=key,
+                )
+        else:
+            vs = open_backend(kind, COLLECTIONS[key], embeddings, DATA_DIR, space=hnsw.get("space", "l2"))
+        stores.append(vs)
+
+    recipes_vs, cookbooks_vs, ustensils_vs, recipe_fields_vs = stores
+    return recipes_vs, cookbooks_vs, ustensils_vs, recipe_fields_vs
 
 
 # --- Tavily (web search) ---
 
 
-def get_tavily_tool() -> TavilySearch:
+def get_tavily_tool() -> Any:
     """
     Tool Tavily pour la recherche web (Adaptive / Agentic RAG).
 
     Nécessite TAVILY_API_KEY dans l'environnement.
+    TAVILY_BACKEND=fake → `FakeTavily` (résultats factices, sans réseau).
     """
+    if _backend("TAVILY_BACKEND") == "fake":
+        from .fakes import FakeTavily
+
+        return FakeTavily()
+
     tavily_key = os.getenv("TAVILY_API_KEY")
     if not tavily_key:
         raise RuntimeError("TAVILY_API_KEY manquant pour Tavily.")
@@ -134,14 +485,28 @@ def get_tavily_tool() -> TavilySearch:
 # --- checkpointer SQLite async pour LangGraph ---
 
 
+# CHECKPOINTER=sqlite (défaut, sessions persistantes) | memory (MemorySaver, perdu au redémarrage)
+CHECKPOINTER = os.getenv("CHECKPOINTER", "sqlite").lower()
+
+
 async def get_async_checkpointer() -> AsyncSqliteSaver:
     """
     Checkpointer async pour LangGraph (obligatoire pour .astream / .ainvoke).
 
-    Le fichier est créé dans data/recipes_checkpoints.sqlite.
+    Le fichier est créé dans data/recipes_checkpoints.sqlite. Une connexion
+    partagée par boucle asyncio (WAL, commits groupés, purge des anciens
+    checkpoints) : voir checkpoints.py.
     """
-    conn = await aiosqlite.connect(str(CHECKPOINT_DB))
-    return AsyncSqliteSaver(conn)
+    from .checkpoints import get_saver
+
+    return await get_saver(CHECKPOINT_DB)
+
+
+async def close_async_checkpointer() -> None:
+    """Committe et ferme la connexion de la boucle courante (automatique en fin d'asyncio.run)."""
+    from .checkpoints import close_saver
+
+    await close_saver()
 
 
 
@@ -153,6 +518,20 @@ def get_memory_checkpointer() -> MemorySaver:
 # --- helpers globaux (sync) ---
 
 # Ces objets sont utilisables directement dans nodes/tools.
-LLM = get_llm()
-RECIPES_VS, COOKBOOKS_VS, USTENSILS_VS = get_vectorstores()
-TAVILY_TOOL = get_tavily_tool()
+EMBEDDINGS = get_store_embeddings()
+RECIPES_VS, COOKBOOKS_VS, USTENSILS_VS, RECIPE_FIELDS_VS = get_vectorstores(EMBEDDINGS)
+
+# LLM et Tavily construits au premier accès (`from .config import LLM`) :
+# les scripts d'ingestion n'en ont pas besoin, ni de TAVILY_API_KEY.
+_LAZY: Dict[str, Callable[[], Any]] = {"LLM": get_llm, "TAVILY_TOOL": get_tavily_tool}
+_LAZY_LOCK = threading.Lock()
+
+
+def __getattr__(name: str) -> Any:
+    factory = _LAZY.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _LAZY_LOCK:
+        if name not in globals():
+            globals()[name] = factory()
+    return globals()[name]
@@ -0,0 +1,155 @@
+"""
+recipes/diversity.py
+
+Recherche « diversifiée » pour les nœuds retrieve_* : le top-k brut de
+similarity_search contient souvent plusieurs fois la même recette (scripts
+d'ingestion relancés, pages de livres répétées) et gaspille le budget de
+contexte de l'agent.
+
+- sur-échantillonnage : fetch_k = k × RETRIEVAL_FETCH candidats,
+- regroupement des doublons exacts / quasi exacts : empreinte du contenu
+  normalisé (casse, ponctuation, espaces) ou même recette (`parent_id` / `id`),
+- MMR (maximal marginal relevance) sur les vecteurs des candidats :
+  snapshot de NumpyExactIndex, sinon relus dans Chroma, sinon ré-embarqués
+  (cache LRU par empreinte).
+
+RETRIEVAL_MODE = dedup (défaut : doublons regroupés) | mmr | similarity.
+MMR_LAMBDA : 1 → pertinence seule, 0 → diversité seule. Sur le corpus de
+`python -m recipes.bench_chroma diversity`, dedup ×4 donne déjà 5 recettes
+uniques sur 5 avec le meilleur rappel ; mmr sert quand des quasi-doublons
+ont des textes différents (pages voisines d'un même livre).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+RETRIEVAL_MODES = ("mmr", "dedup", "similarity")
+
+
+def retrieval_mode() -> str:
+    return os.getenv("RETRIEVAL_MODE", "dedup")
+
+
+def normalized_words(text: str) -> List[str]:
+    """Mots du texte sans casse, accents ni ponctuation."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return re.findall(r"\w+", text)
+
+
+def content_hash(text: str) -> str:
+    """Empreinte insensible à la casse, aux accents, à la ponctuation et aux espaces."""
+    return hashlib.blake2b(" ".join(normalized_words(text)).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _identity(doc: Document) -> str:
+    meta = doc.metadata or {}
+    return str(meta.get("parent_id") or meta.get("id") or "")
+
+
+def dedupe(docs: Sequence[Document]) -> List[Document]:
+    """Garde la première occurrence (la plus proche) de chaque contenu / recette."""
+    seen: set = set()
+    out: List[Document] = []
+    for d in docs:
+        keys = {content_hash(d.page_content)}
+        if _identity(d):
+            keys.add("id:" + _identity(d))
+        if keys & seen:
+            continue
+        seen |= keys
+        out.append(d)
+    return out
+
+
+def mmr(query: np.ndarray, vectors: np.ndarray, k: int, lambda_: float) -> List[int]:
+    """Indices choisis par MMR : argmax λ·sim(q, d) − (1−λ)·max sim(d, choisis), en cosinus."""
+    if not len(vectors):
+        return []
+    x = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    q = query / (np.linalg.norm(query) + 1e-12)
+    relevance = x @ q
+    chosen = [int(np.argmax(relevance))]
+    redundancy = x @ x[chosen[0]]
+    while len(chosen) < min(k, len(x)):
+        score = lambda_ * relevance - (1 - lambda_) * redundancy
+        score[chosen] = -np.inf
+        best = int(np.argmax(score))
+        chosen.append(best)
+        redundancy = np.maximum(redundancy, x @ x[best])
+    return chosen
+
+
+# --- vecteurs des candidats ---
+
+_EMBED_CACHE: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_EMBED_CACHE_MAX = int(os.getenv("MMR_EMBED_CACHE", "4096"))
+_EMBED_LOCK = threading.Lock()
+
+
+def _embed_cached(store: Any, docs: Sequence[Document]) -> np.ndarray:
+    keys = [content_hash(d.page_content) for d in docs]
+    with _EMBED_LOCK:
+        missing = [i for i, key in enumerate(keys) if key not in _EMBED_CACHE]
+    if missing:
+        vectors = store.embeddings.embed_documents([docs[i].page_content for i in missing])
+        with _EMBED_LOCK:
+            for i, v in zip(missing, vectors):
+                _EMBED_CACHE[keys[i]] = np.asarray(v, dtype=np.float32)
+            while len(_EMBED_CACHE) > _EMBED_CACHE_MAX:
+                _EMBED_CACHE.popitem(last=False)
+    with _EMBED_LOCK:
+        return np.stack([_EMBED_CACHE[key] for key in keys])
+
+
+def candidate_vectors(store: Any, docs: Sequence[Document]) -> np.ndarray:
+    """Vecteurs des candidats sans repasser par le modèle quand le store les a déjà."""
+    ids = [d.id for d in docs]
+    if all(ids):
+        if hasattr(store, "vectors_for"):  # NumpyExactIndex : snapshot en mémoire
+            vectors = store.vectors_for(ids)
+            if vectors is not None:
+                return vectors
+        collection = getattr(store, "_collection", None)
+        if collection is not None:  # Chroma
+            page = collection.get(ids=ids, include=["embeddings"])
+            by_id = dict(zip(page["ids"], page["embeddings"]))
+            if all(i in by_id for i in ids):
+                return np.asarray([by_id[i] for i in ids], dtype=np.float32)
+    return _embed_cached(store, docs)
+
+
+def diverse_search(
+    store: Any,
+    query: str,
+    k: int = 5,
+    mode: Optional[str] = None,
+    fetch: Optional[int] = None,
+    lambda_: Optional[float] = None,
+    query_vector: Optional[Sequence[float]] = None,
+) -> List[Document]:
+    """Top-k de `store` selon RETRIEVAL_MODE (similarity | dedup | mmr)."""
+    mode = mode or retrieval_mode()
+    if mode == "similarity":
+        if query_vector is not None:
+            return store.similarity_search_by_vector(list(query_vector), k=k)
+        return store.similarity_search(query, k=k)
+
+    fetch = fetch if fetch is not None else int(os.getenv("RETRIEVAL_FETCH", "4"))
+    lambda_ = lambda_ if lambda_ is not None else float(os.getenv("MMR_LAMBDA", "0.7"))
+    q = np.asarray(query_vector if query_vector is not None else store.embeddings.embed_query(query), dtype=np.float32)
+    candidates = dedupe(store.similarity_search_by_vector(q.tolist(), k=k * max(fetch, 1)))
+    if mode == "dedup" or len(candidates) <= k:
+        return candidates[:k]
+    return [candidates[i] for i in mmr(q, candidate_vectors(store, candidates), k, lambda_)]
@@ -0,0 +1,336 @@
+"""
+recipes/embedding_server.py
+
+Serveur d'embeddings partagé : un seul modèle chargé (hf ou onnx) pour
+toutes les sessions Streamlit, scripts d'ingestion et CLI de la machine,
+au lieu d'une copie du modèle (plusieurs centaines de Mo) par process.
+
+- HTTP local (`http://127.0.0.1:8765`) ou socket Unix (`unix:/chemin.sock`),
+- POST /embed {"texts": [...]} → vecteurs float32 bruts (en-tête
+  X-Embedding-Dim), pas de JSON à sérialiser pour les vecteurs,
+- batching dynamique : les requêtes concurrentes sont regroupées dans un
+  même appel au modèle (jusqu'à EMBEDDINGS_SERVER_BATCH textes, attente
+  max EMBEDDINGS_MAX_WAIT_MS après la première),
+- GET /health : modèle, dimension, compteurs (requêtes, lots, textes / lot).
+
+Côté client, `EmbeddingClient` est un `Embeddings` LangChain ; il est
+retourné par get_embeddings() avec EMBEDDINGS_BACKEND=http (EMBEDDINGS_URL).
+
+    python -m recipes.embedding_server --backend onnx --url unix:data/embeddings.sock
+    EMBEDDINGS_BACKEND=http EMBEDDINGS_URL=unix:data/embeddings.sock streamlit run stream.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+def _parse_url(url: str) -> Tuple[Optional[str], Optional[int], Optional[str]]:
+    """(host, port, None) pour http://, (None, None, chemin) pour unix:."""
+    if url.startswith("unix:"):
+        return None, None, url[len("unix:"):].removeprefix("//")
+    host_port = url.removeprefix("http://").rstrip("/")
+    host, _, port = host_port.partition(":")
+    return host or "127.0.0.1", int(port or 80), None
+
+
+# --- batching dynamique ---
+
+
+class DynamicBatcher:
+    """
+    File de requêtes d'embeddings servie par un thread unique : chaque lot
+    regroupe les requêtes arrivées pendant `max_wait_s` (ou jusqu'à
+    `max_batch` textes) en un seul appel `embed_documents`.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = 64, max_wait_s: float = 0.005) -> None:
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_s
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._texts = 0
+        self._busy_s = 0.0
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> np.ndarray:
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future.result()
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.perf_counter() + self.max_wait_s
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self) -> None:
+        while True:
+            pending = self._collect()
+            texts = [t for batch, _ in pending for t in batch]
+            start = time.perf_counter()
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            except Exception as exc:  # remonté à chaque requête du lot
+                for _, future in pending:
+                    future.set_exception(exc)
+                continue
+            with self._lock:
+                self._requests += len(pending)
+                self._batches += 1
+                self._texts += len(texts)
+                self._busy_s += time.perf_counter() - start
+            offset = 0
+            for batch, future in pending:
+                future.set_result(vectors[offset:offset + len(batch)])
+                offset += len(batch)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "texts": self._texts,
+                "texts_per_batch": self._texts / self._batches if self._batches else 0.0,
+                "busy_s": self._busy_s,
+            }
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    `Embeddings` en process partagé par plusieurs threads (ingest.py) : les
+    embed_documents concurrents passent par un seul DynamicBatcher, donc un
+    seul appel au modèle à la fois, en lots regroupés. Le temps d'attente
+    est compté par nom de thread (une source d'ingestion = un thread).
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = 256, max_wait_s: float = 0.01) -> None:
+        self.embeddings = embeddings
+        self.batcher = DynamicBatcher(embeddings, max_batch=max_batch, max_wait_s=max_wait_s)
+        self._lock = threading.Lock()
+        self._wait_s: Dict[str, float] = {}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        start = time.perf_counter()
+        vectors = self.batcher.submit(list(texts))
+        name = threading.current_thread().name
+        with self._lock:
+            self._wait_s[name] = self._wait_s.get(name, 0.0) + time.perf_counter() - start
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def wait_s(self, thread_name: str) -> float:
+        with self._lock:
+            return self._wait_s.get(thread_name, 0.0)
+
+
+# --- serveur ---
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive : une connexion par client
+
+    def log_message(self, fmt: str, *args: Any) -> None:  # silence stdlib logs
+        return
+
+    def address_string(self) -> str:  # socket Unix : pas d'adresse client
+        return "local"
+
+    def _send(self, body: bytes, content_type: str, status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        self._send(json.dumps(payload).encode("utf-8"), "application/json", status)
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self._send_json({"error": "not found"}, 404)
+            return
+        self._send_json({"model": self.server.model_name, "dim": self.server.dim, **self.server.batcher.stats()})
+
+    def do_POST(self) -> None:
+        if self.path != "/embed":
+            self._send_json({"error": "not found"}, 404)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            texts = json.loads(self.rfile.read(length) or b"{}")["texts"]
+            vectors = self.server.batcher.submit(list(texts)) if texts else np.zeros((0, self.server.dim), np.float32)
+        except Exception as exc:
+            self._send_json({"error": str(exc)}, 500)
+            return
+        self._send(
+            np.ascontiguousarray(vectors, dtype=np.float32).tobytes(),
+            "application/octet-stream",
+            headers={"X-Embedding-Dim": str(vectors.shape[1])},
+        )
+
+
+class _ServerMixin:
+    daemon_threads = True
+    batcher: DynamicBatcher
+    model_name: str
+    dim: int
+
+
+class EmbeddingHTTPServer(_ServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class EmbeddingUnixServer(_ServerMixin, socketserver.ThreadingUnixStreamServer):
+    pass
+
+
+def serve(url: str, embeddings: Embeddings, model_name: str, max_batch: int, max_wait_s: float) -> socketserver.BaseServer:
+    """Crée le serveur (sans le lancer) ; le modèle est chauffé une fois ici."""
+    dim = len(embeddings.embed_query("échauffement"))  # avant bind : socket présent = serveur prêt
+    host, port, path = _parse_url(url)
+    if path:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).unlink(missing_ok=True)
+        server: Any = EmbeddingUnixServer(path, _Handler)
+    else:
+        server = EmbeddingHTTPServer((host, port), _Handler)
+    server.model_name = model_name
+    server.dim = dim
+    server.batcher = DynamicBatcher(embeddings, max_batch=max_batch, max_wait_s=max_wait_s)
+    return server
+
+
+# --- client ---
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class EmbeddingClient(Embeddings):
+    """
+    `Embeddings` adossé au serveur partagé : aucun modèle chargé dans le
+    process. Une connexion keep-alive par thread (sessions Streamlit).
+    """
+
+    def __init__(self, url: str = DEFAULT_URL, timeout: float = 60.0) -> None:
+        self.url = url
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            host, port, path = _parse_url(self.url)
+            conn = _UnixHTTPConnection(path, self.timeout) if path else http.client.HTTPConnection(
+                host, port, timeout=self.timeout
+            )
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> Tuple[http.client.HTTPResponse, bytes]:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):  # connexion keep-alive fermée côté serveur → on rouvre une fois
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                return response, response.read()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        response, payload = self._request("POST", "/embed", json.dumps({"texts": texts}).encode("utf-8"))
+        if response.status != 200:
+            raise RuntimeError(f"Serveur d'embeddings {self.url} : {payload.decode('utf-8', 'replace')}")
+        dim = int(response.getheader("X-Embedding-Dim") or 0)
+        return np.frombuffer(payload, dtype=np.float32).reshape(len(texts), dim)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def health(self) -> Dict[str, Any]:
+        _, payload = self._request("GET", "/health")
+        return json.loads(payload)
+
+
+def main() -> None:
+    from rich import print as rprint
+
+    from .embeddings import get_embeddings
+
+    parser = argparse.ArgumentParser(description="Serveur d'embeddings partagé")
+    parser.add_argument("--url", default=os.getenv("EMBEDDINGS_URL", DEFAULT_URL), help="http://hôte:port ou unix:/chemin.sock")
+    parser.add_argument("--backend", default=os.getenv("EMBEDDINGS_SERVER_BACKEND", "hf"), help="hf | onnx | fake")
+    parser.add_argument("--max-batch", type=int, default=int(os.getenv("EMBEDDINGS_SERVER_BATCH", "64")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("EMBEDDINGS_MAX_WAIT_MS", "5")))
+    args = parser.parse_args()
+
+    if args.backend == "http":
+        parser.error("--backend http : le serveur doit charger un modèle (hf, onnx ou fake)")
+    model_name = os.getenv("EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    server = serve(args.url, get_embeddings(args.backend), model_name, args.max_batch, args.max_wait_ms / 1000)
+    rprint(f"[green]Serveur d'embeddings[/green] {args.backend} ({model_name}, dim {server.dim}) sur {args.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+recipes/embeddings.py
+
+Choix du backend d'embeddings (EMBEDDINGS_BACKEND), sans les effets de bord
+de config.py (LLM, vector stores, Tavily créés à l'import) : utilisable
+seul par les benchmarks et le serveur d'embeddings (embedding_server.py).
+config.py le ré-exporte (`config.get_embeddings`).
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Optional
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+
+load_dotenv()
+
+
+def get_embeddings(backend: Optional[str] = None) -> Embeddings:
+    """
+    Embeddings pour les vector stores (recettes, PDFs, ustensiles).
+
+    Par défaut (ou EMBEDDINGS_BACKEND=hf) HuggingFaceEmbeddings, 100 % local.
+    EMBEDDINGS_BACKEND=onnx → même modèle sur onnxruntime, sans torch
+    (onnx_embeddings.py ; ONNX_MODEL_DIR, ONNX_THREADS, EMBEDDINGS_BATCH_SIZE).
+    EMBEDDINGS_BACKEND=http → client du serveur partagé (embedding_server.py,
+    EMBEDDINGS_URL) : aucun modèle chargé dans le process.
+    EMBEDDINGS_BACKEND=fake → embeddings déterministes (hash), sans modèle.
+
+    `backend` force le choix (le serveur charge ainsi son modèle même si
+    l'environnement partagé dit EMBEDDINGS_BACKEND=http).
+    """
+    if backend is None:
+        backend = os.getenv("EMBEDDINGS_BACKEND") or ("fake" if os.getenv("RECIPES_OFFLINE", "0") == "1" else "")
+    if backend == "fake":
+        return DeterministicFakeEmbedding(size=int(os.getenv("FAKE_EMBEDDINGS_DIM", "384")))
+    if backend == "http":
+        from .embedding_server import DEFAULT_URL, EmbeddingClient
+
+        return EmbeddingClient(
+            url=os.getenv("EMBEDDINGS_URL", DEFAULT_URL),
+            timeout=float(os.getenv("EMBEDDINGS_TIMEOUT", "60")),
+        )
+    model_name = os.getenv(
+        "EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2"
+    )
+    if backend == "onnx":
+        from .onnx_embeddings import OnnxEmbeddings
+
+        return OnnxEmbeddings(
+            model_dir=os.getenv("ONNX_MODEL_DIR") or None,
+            model_id=model_name,
+            batch_size=int(os.getenv("EMBEDDINGS_BATCH_SIZE", "32")),
+            threads=int(os.getenv("ONNX_THREADS", "0")) or None,
+        )
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name,  model_kwargs={"device": "cpu"}, )
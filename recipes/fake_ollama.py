@@ -0,0 +1,230 @@
+"""
+recipes/fake_ollama.py
+
+Serveur HTTP local compatible Ollama (sous-ensemble de l'API) pour les
+benchmarks hors-ligne :
+
+- POST /api/generate, /api/chat (stream NDJSON ou non), GET /api/tags, /api/version
+- réponses du `Responder` de fakes.py (script, cassette, défauts selon `format`)
+- latence simulée (`--latency`, `--token-latency`)
+- mode proxy `--upstream` + `--record` : relaie vers un vrai Ollama et
+  enregistre chaque échange dans une cassette JSONL rejouable (`--replay`
+  ici, ou FAKE_LLM_CASSETTE avec LLM_BACKEND=fake).
+
+    python -m recipes.fake_ollama --port 11435 --latency lognormal:-2.5,0.5
+    python -m recipes.fake_ollama --upstream http://localhost:11434 --record data/session.jsonl
+    OLLAMA_BASE_URL=http://127.0.0.1:11435 python main.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from rich import print as rprint
+
+from .fakes import Cassette, LatencyModel, PromptCacheSim, Responder, approx_tokens
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _chat_prompt(messages: Any) -> str:
+    return "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages or [])
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        responder: Responder,
+        latency: LatencyModel,
+        upstream: Optional[str] = None,
+        recorder: Optional[Cassette] = None,
+        prompt_cache: Optional[PromptCacheSim] = None,
+    ) -> None:
+        super().__init__(address, _Handler)
+        self.responder = responder
+        self.latency = latency
+        self.prompt_cache = prompt_cache or PromptCacheSim()
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.recorder = recorder
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeOllamaServer
+
+    def log_message(self, fmt: str, *args: Any) -> None:  # silence stdlib logs
+        return
+
+    # --- helpers ---
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b"{}"
+        return json.loads(raw or b"{}")
+
+    def _forward(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        payload = dict(body, stream=False)
+        req = urllib.request.Request(
+            f"{self.server.upstream}{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(req) as resp:
+            return json.loads(resp.read())
+
+    # --- routes ---
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/api/tags"):
+            self._send_json({"models": [{"name": "fake", "model": "fake"}]})
+        elif self.path.startswith("/api/version"):
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"status": "Ollama is running"})
+
+    def do_POST(self) -> None:
+        if self.path.startswith("/api/generate"):
+            self._complete(chat=False)
+        elif self.path.startswith("/api/chat"):
+            self._complete(chat=True)
+        else:
+            self._send_json({"error": f"route inconnue {self.path}"}, status=404)
+
+    def _complete(self, chat: bool) -> None:
+        body = self._read_json()
+        model = body.get("model", "fake")
+        fmt = body.get("format") or None
+        options = body.get("options") or {}
+        prompt = _chat_prompt(body.get("messages")) if chat else body.get("prompt", "")
+        stream = body.get("stream", True)
+
+        start = time.perf_counter()
+        timings: Dict[str, Any] = {}
+        prompt_tokens, prompt_s = self.server.prompt_cache.evaluate(model, prompt)
+        recorded = self.server.responder.lookup(model, prompt, fmt)
+
+        if recorded is None and self.server.upstream:
+            upstream = self._forward("/api/chat" if chat else "/api/generate", body)
+            text = (upstream.get("message") or {}).get("content", "") if chat else upstream.get("response", "")
+            timings = {k: v for k, v in upstream.items() if k.endswith(("_count", "_duration"))}
+            if self.server.recorder is not None:
+                self.server.recorder.record(model, prompt, fmt, text, timings)
+        else:
+            text = self.server.responder.respond(model, prompt, fmt, options)
+            timings = dict((recorded or {}).get("timings") or {})
+            time.sleep(prompt_s + self.server.latency.sample(approx_tokens(text)))
+
+        elapsed_ns = int((time.perf_counter() - start) * 1e9)
+        final = {
+            "model": model,
+            "created_at": _now(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": elapsed_ns,
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_s * 1e9),
+            "eval_count": approx_tokens(text),
+            "eval_duration": max(0, elapsed_ns - int(prompt_s * 1e9)),
+        }
+        final.update(timings)
+
+        def _piece(content: str) -> Dict[str, Any]:
+            if chat:
+                return {"message": {"role": "assistant", "content": content}}
+            return {"response": content}
+
+        if not stream:
+            self._send_json({**final, **_piece(text)})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            piece = word if i == len(words) - 1 else word + " "
+            line = {"model": model, "created_at": _now(), "done": False, **_piece(piece)}
+            self.wfile.write((json.dumps(line) + "\n").encode("utf-8"))
+        self.wfile.write((json.dumps({**final, **_piece("")}) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 11435,
+    responder: Optional[Responder] = None,
+    latency: Optional[LatencyModel] = None,
+    upstream: Optional[str] = None,
+    recorder: Optional[Cassette] = None,
+    prompt_cache: Optional[PromptCacheSim] = None,
+) -> FakeOllamaServer:
+    """Crée le serveur (à lancer avec `serve_forever()`, éventuellement dans un thread)."""
+    return FakeOllamaServer(
+        (host, port),
+        responder or Responder.from_env(),
+        latency or LatencyModel.from_env(),
+        upstream,
+        recorder,
+        prompt_cache or PromptCacheSim.from_env(),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur Ollama factice / proxy d'enregistrement")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--script", type=Path, help="règles JSON [{match, response}]")
+    parser.add_argument("--replay", type=Path, help="cassette JSONL à rejouer")
+    parser.add_argument("--latency", default="fixed:0", help="fixed:s | uniform:a,b | normal:mu,sigma | lognormal:mu,sigma")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="secondes par token généré")
+    parser.add_argument(
+        "--prompt-token-latency", type=float, default=0.0,
+        help="secondes par token de prompt évalué (hors préfixe en cache)",
+    )
+    parser.add_argument("--upstream", help="URL d'un vrai Ollama à relayer")
+    parser.add_argument("--record", type=Path, help="cassette JSONL où enregistrer (avec --upstream)")
+    args = parser.parse_args()
+
+    rules = json.loads(args.script.read_text(encoding="utf-8")) if args.script else None
+    responder = Responder(rules, Cassette(args.replay) if args.replay else None)
+    server = serve(
+        args.host,
+        args.port,
+        responder,
+        LatencyModel(args.latency, args.token_latency),
+        args.upstream,
+        Cassette(args.record) if args.record else None,
+        PromptCacheSim(args.prompt_token_latency),
+    )
+    mode = f"proxy → {args.upstream}" if args.upstream else "factice"
+    rprint(f"[bold cyan]Fake Ollama[/bold cyan] ({mode}) sur http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
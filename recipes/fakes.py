@@ -0,0 +1,378 @@
+"""
+recipes/fakes.py
+
+Doublures hors-ligne pour benchmarker le graphe sans Ollama, sans modèle
+d'embeddings téléchargé et sans clé Tavily :
+
+- `FakeLLM`        : LLM LangChain in-process (remplace OllamaLLM),
+- `Responder`      : réponses scriptées (regex → texte), rejeu de cassettes
+                     enregistrées, réponses par défaut qui respectent `format`,
+- `LatencyModel`   : distributions de latence configurables,
+- `Cassette`       : enregistrement / rejeu JSONL de sessions réelles,
+- `FakeTavily`     : résultats web factices.
+
+Le serveur HTTP compatible Ollama (`python -m recipes.fake_ollama`) réutilise
+le même `Responder`, donc une cassette enregistrée via le proxy se rejoue
+aussi bien en HTTP qu'in-process.
+
+Variables d'environnement (voir config.py) :
+    LLM_BACKEND=fake              FakeLLM au lieu d'OllamaLLM
+    FAKE_LLM_SCRIPT=script.json   [{"match": "routeur RAG", "response": "..."}]
+    FAKE_LLM_CASSETTE=run.jsonl   rejeu d'une session enregistrée
+    FAKE_LLM_LATENCY=lognormal:-2.5,0.5   (fixed:s | uniform:a,b | normal:mu,sigma | lognormal:mu,sigma)
+    FAKE_LLM_TOKEN_LATENCY=0.01   secondes par token généré
+    FAKE_LLM_PROMPT_TOKEN_LATENCY=0.0005  secondes par token de prompt évalué
+                                  (hors préfixe déjà en cache, voir PromptCacheSim)
+    FAKE_LLM_PARALLEL=2           slots parallèles simulés (0 = illimité), comme
+                                  OLLAMA_NUM_PARALLEL : au-delà, les requêtes attendent
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import Generation, LLMResult
+from pydantic import ConfigDict
+
+
+# --- latence ---
+
+
+class LatencyModel:
+    """
+    Latence simulée : une part fixe tirée d'une distribution
+    + un coût par token généré.
+    """
+
+    def __init__(self, spec: str = "fixed:0", per_token_s: float = 0.0, seed: Optional[int] = None) -> None:
+        kind, _, raw = (spec or "fixed:0").partition(":")
+        self.kind = kind
+        self.params = [float(x) for x in raw.split(",") if x.strip()] or [0.0]
+        self.per_token_s = per_token_s
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> "LatencyModel":
+        return cls(
+            os.getenv("FAKE_LLM_LATENCY", "fixed:0"),
+            float(os.getenv("FAKE_LLM_TOKEN_LATENCY", "0")),
+        )
+
+    def base(self) -> float:
+        p = self.params
+        if self.kind == "uniform":
+            return self._rng.uniform(p[0], p[1] if len(p) > 1 else p[0])
+        if self.kind == "normal":
+            return max(0.0, self._rng.gauss(p[0], p[1] if len(p) > 1 else 0.0))
+        if self.kind == "lognormal":
+            return self._rng.lognormvariate(p[0], p[1] if len(p) > 1 else 0.0)
+        return p[0]  # fixed
+
+    def sample(self, output_tokens: int = 0) -> float:
+        return self.base() + self.per_token_s * output_tokens
+
+
+def approx_tokens(text: str) -> int:
+    """Approximation grossière du nombre de tokens (mots)."""
+    return len((text or "").split())
+
+
+class PromptCacheSim:
+    """
+    Simule le cache KV d'Ollama : seul le suffixe du prompt qui diffère du
+    prompt précédent (même modèle) est ré-évalué. Donne des compteurs
+    `prompt_eval_count` / `prompt_eval_duration` réalistes hors-ligne.
+    """
+
+    def __init__(self, per_token_s: float = 0.0) -> None:
+        self.per_token_s = per_token_s
+        self._last: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "PromptCacheSim":
+        return cls(float(os.getenv("FAKE_LLM_PROMPT_TOKEN_LATENCY", "0")))
+
+    def evaluate(self, model: str, prompt: str) -> Tuple[int, float]:
+        """Retourne (tokens évalués, durée simulée en secondes)."""
+        with self._lock:
+            shared = len(os.path.commonprefix([self._last.get(model, ""), prompt]))
+            self._last[model] = prompt
+        count = approx_tokens(prompt[shared:])
+        return count, count * self.per_token_s
+
+
+# --- cassettes (enregistrement / rejeu) ---
+
+
+def request_key(model: str, prompt: str, fmt: Any = None) -> str:
+    """Clé stable d'une requête LLM (modèle + prompt + format)."""
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "format": fmt or None},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Fichier JSONL : une ligne par échange {key, model, prompt, format, response, timings}."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, model: str, prompt: str, fmt: Any = None) -> Optional[Dict[str, Any]]:
+        return self._entries.get(request_key(model, prompt, fmt))
+
+    def record(self, model: str, prompt: str, fmt: Any, response: str, timings: Dict[str, Any]) -> None:
+        entry = {
+            "key": request_key(model, prompt, fmt),
+            "model": model,
+            "prompt": prompt,
+            "format": fmt or None,
+            "response": response,
+            "timings": timings,
+        }
+        with self._lock:
+            self._entries[entry["key"]] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+# --- réponses ---
+
+
+_DEFAULT_TEXT = (
+    "1. Salade de quinoa, feta et concombre\n"
+    "Résumé : salade fraîche et rapide.\n"
+    "Ingrédients : quinoa, feta, concombre, tomates cerises, huile d'olive.\n"
+    "Temps total : 20 minutes.\n"
+    "2. Bowl œuf mollet et herbes\n"
+    "Résumé : bowl complet pour le soir.\n"
+    "Ingrédients : œufs, quinoa, basilic, persil, citron.\n"
+    "Temps total : 25 minutes."
+)
+
+
+class Responder:
+    """
+    Produit la réponse à une requête (model, prompt, format, options) :
+    1) cassette si la requête a été enregistrée,
+    2) première règle scriptée dont le regex `match` trouve le prompt,
+    3) réponse par défaut compatible avec `format` (enum → 1re valeur,
+       "json" → {}), sinon texte générique tronqué à `num_predict`.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[Dict[str, str]]] = None,
+        cassette: Optional[Cassette] = None,
+    ) -> None:
+        self.rules = [(re.compile(r["match"], re.IGNORECASE | re.DOTALL), r) for r in (rules or [])]
+        self.cassette = cassette
+
+    @classmethod
+    def from_env(cls) -> "Responder":
+        rules: List[Dict[str, str]] = []
+        script = os.getenv("FAKE_LLM_SCRIPT")
+        if script:
+            rules = json.loads(Path(script).read_text(encoding="utf-8"))
+        cassette_path = os.getenv("FAKE_LLM_CASSETTE")
+        cassette = Cassette(Path(cassette_path)) if cassette_path else None
+        return cls(rules, cassette)
+
+    def lookup(self, model: str, prompt: str, fmt: Any = None) -> Optional[Dict[str, Any]]:
+        """Entrée de cassette correspondant à la requête (ou None)."""
+        return self.cassette.get(model, prompt, fmt) if self.cassette else None
+
+    def respond(
+        self,
+        model: str,
+        prompt: str,
+        fmt: Any = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        options = options or {}
+        recorded = self.lookup(model, prompt, fmt)
+        if recorded is not None:
+            return recorded["response"]
+
+        text: Optional[str] = None
+        for pattern, rule in self.rules:
+            if rule.get("model") and rule["model"] != model:
+                continue
+            if pattern.search(prompt):
+                text = rule["response"]
+                break
+        if text is None:
+            text = self._default(fmt, options)
+
+        for stop in options.get("stop") or []:
+            if stop and stop in text:
+                text = text.split(stop, 1)[0]
+        return text
+
+    @staticmethod
+    def _default(fmt: Any, options: Dict[str, Any]) -> str:
+        if isinstance(fmt, dict):
+            props = fmt.get("properties") or {}
+            out = {}
+            for name, schema in props.items():
+                enum = schema.get("enum")
+                out[name] = enum[0] if enum else ""
+            return json.dumps(out)
+        if fmt == "json":
+            return "{}"
+        words = _DEFAULT_TEXT.split(" ")
+        limit = options.get("num_predict")
+        if limit and limit > 0:
+            words = words[:limit]
+        return " ".join(words)
+
+
+@lru_cache(maxsize=1)
+def default_responder() -> Responder:
+    return Responder.from_env()
+
+
+@lru_cache(maxsize=1)
+def default_latency() -> LatencyModel:
+    return LatencyModel.from_env()
+
+
+@lru_cache(maxsize=1)
+def default_prompt_cache() -> PromptCacheSim:
+    return PromptCacheSim.from_env()
+
+
+class _NoLimit:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+@lru_cache(maxsize=1)
+def default_slots() -> Any:
+    """Sémaphore des slots simulés du « serveur » (FAKE_LLM_PARALLEL)."""
+    n = int(os.getenv("FAKE_LLM_PARALLEL", "0"))
+    return threading.BoundedSemaphore(n) if n > 0 else _NoLimit()
+
+
+# --- LLM in-process ---
+
+
+class FakeLLM(LLM):
+    """
+    Remplaçant in-process d'OllamaLLM : mêmes paramètres (model, format,
+    num_predict, stop, temperature, base_url), réponse du `Responder`
+    et latence du `LatencyModel`.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: str = "fake"
+    format: Any = None
+    num_predict: Optional[int] = None
+    stop: Optional[List[str]] = None
+    temperature: Optional[float] = None
+    base_url: Optional[str] = None
+    responder: Optional[Responder] = None
+    latency: Optional[LatencyModel] = None
+    prompt_cache: Optional[PromptCacheSim] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-ollama"
+
+    def _complete(self, prompt: str, stop: Optional[List[str]], **kwargs: Any) -> Generation:
+        responder = self.responder or default_responder()
+        latency = self.latency or default_latency()
+        cache = self.prompt_cache or default_prompt_cache()
+        options = {"num_predict": self.num_predict, "stop": stop or self.stop}
+        fmt = kwargs.get("format", self.format)
+
+        start = time.perf_counter()
+        with default_slots():
+            text = responder.respond(self.model, prompt, fmt, options)
+            prompt_tokens, prompt_s = cache.evaluate(self.model, prompt)
+            eval_s = latency.sample(approx_tokens(text))
+            time.sleep(prompt_s + eval_s)
+        return Generation(
+            text=text,
+            generation_info={
+                "model": self.model,
+                "done": True,
+                "total_duration": int((time.perf_counter() - start) * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(prompt_s * 1e9),
+                "eval_count": approx_tokens(text),
+                "eval_duration": int(eval_s * 1e9),
+                "load_duration": 0,
+            },
+        )
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        return self._complete(prompt, stop, **kwargs).text
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        return LLMResult(generations=[[self._complete(p, stop, **kwargs)] for p in prompts])
+
+
+# --- Tavily ---
+
+
+class FakeTavily:
+    """Remplaçant de TavilySearch : même interface `.invoke({"query": ...})`."""
+
+    def invoke(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        query = payload.get("query", "") if isinstance(payload, dict) else str(payload)
+        return {
+            "query": query,
+            "answer": f"Réponse web factice pour : {query}",
+            "results": [
+                {
+                    "title": f"Résultat factice {i} – {query[:40]}",
+                    "url": f"https://example.com/fake-{i}",
+                    "content": "Idée de recette de saison, fraîche et rapide.",
+                    "score": 1.0 - i / 10,
+                }
+                for i in range(1, 4)
+            ],
+        }
@@ -8,7 +8,7 @@ from __future__ import annotations
 
 from langgraph.graph import StateGraph, END
 from rich import print as rprint
-from recipes.config import  get_memory_checkpointer
+from recipes.config import  CHECKPOINTER, get_async_checkpointer, get_memory_checkpointer
 
 from .schema import (
     RecipeState,
@@ -112,7 +112,8 @@ async def build_graph_async():
     builder.add_edge(STEPS, SAVE_STATE)
     builder.add_edge(SAVE_STATE, END)
     
-    checkpointer = get_memory_checkpointer()
+    # sessions persistantes (data/recipes_checkpoints.sqlite), MemorySaver si CHECKPOINTER=memory
+    checkpointer = await get_async_checkpointer() if CHECKPOINTER == "sqlite" else get_memory_checkpointer()
     return builder.compile(checkpointer=checkpointer)
     
     return graph
@@ -0,0 +1,80 @@
+"""
+recipes/heuristics.py
+
+Alternatives sans LLM pour les nœuds de contrôle (backend "heuristic"
+du registre de modèles) : routage RAG, grading, réécriture.
+
+Règles volontairement simples (mots-clés, recouvrement lexical) : elles
+coûtent quelques microsecondes et servent de plancher de qualité face au
+petit / grand modèle dans le batch runner.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import List, Set
+
+from .schema import RagStrategy, RetrievalQuality, RetrievedDoc
+
+
+_COOKBOOK_WORDS = ("pdf", "livre", "livret", "cookbook", "bouquin")
+_WEB_WORDS = ("web", "internet", "tendance", "actuel", "recent", "avis", "en ligne")
+_LOCAL_WORDS = ("salade", "base locale", "mes recettes", "catalogue", "recettes locales")
+
+_STOPWORDS = {
+    "le", "la", "les", "un", "une", "des", "de", "du", "et", "ou", "pour",
+    "avec", "sans", "en", "a", "au", "aux", "je", "j", "mes", "mon", "ma",
+    "que", "qui", "est", "sur", "dans", "par", "personnes", "recette", "recettes",
+}
+
+
+def normalize(text: str) -> str:
+    """Minuscules sans accents (« Crème brûlée » → « creme brulee »)."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.lower()
+
+
+def _terms(text: str) -> Set[str]:
+    return {
+        t for t in re.findall(r"[a-z0-9]+", normalize(text))
+        if len(t) > 2 and t not in _STOPWORDS
+    }
+
+
+def classify_rag(query: str) -> RagStrategy:
+    """Routage par mots-clés : PDF → COOKBOOKS, web → WEB, sinon LOCAL_RECIPES."""
+    q = normalize(query)
+    if any(w in q for w in _COOKBOOK_WORDS):
+        return "COOKBOOKS"
+    if any(w in q for w in _WEB_WORDS):
+        return "WEB"
+    return "LOCAL_RECIPES"
+
+
+def grade_retrieval(query: str, docs: List[RetrievedDoc]) -> RetrievalQuality:
+    """
+    GOOD si une part suffisante des termes de la question apparaît dans
+    les documents, AMBIGUOUS si recouvrement partiel, BAD sinon.
+    """
+    if not docs:
+        return "BAD"
+    q_terms = _terms(query)
+    if not q_terms:
+        return "GOOD"
+    doc_terms: Set[str] = set()
+    for d in docs:
+        doc_terms |= _terms(d.get("content", ""))
+    coverage = len(q_terms & doc_terms) / len(q_terms)
+    if coverage >= 0.5:
+        return "GOOD"
+    if coverage >= 0.2:
+        return "AMBIGUOUS"
+    return "BAD"
+
+
+def rewrite_query(query: str) -> str:
+    """Réécriture minimale : mots-clés de la question, sans mots vides."""
+    kept = [t for t in re.findall(r"\w+", query or "") if normalize(t) not in _STOPWORDS]
+    return " ".join(kept) or (query or "")
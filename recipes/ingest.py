@@ -0,0 +1,180 @@
+"""
+recipes/ingest.py
+
+Commande d'ingestion unique : recettes (CSV de files/), livres PDF (pdfs/)
+et ustensiles dans un seul process, au lieu de trois scripts qui chargent
+chacun le modèle d'embeddings et ouvrent les stores.
+
+- ressources chargées une fois : modèle d'embeddings et stores (config.py) ;
+  LLM et Tavily ne sont pas construits (accès paresseux dans config.py),
+- une source = un thread (recipes, cookbooks, ustensils), lancés ensemble,
+- embeddings partagés : EMBEDDINGS_BATCHER=1 (posé ici par défaut) → un seul
+  worker (DynamicBatcher) regroupe les textes des sources en lots
+  (EMBEDDINGS_BATCHER_MAX textes, attente EMBEDDINGS_BATCHER_WAIT_MS),
+- rapport consolidé : documents/s, pages/s et temps par source découpé en
+  parse (lecture / extraction), embed (attente du worker), write (écriture
+  dans le store hors embeddings), plus l'occupation du worker.
+
+    python -m recipes.ingest
+    python -m recipes.ingest --only recipes cookbooks --parser pymupdf
+    python -m recipes.ingest --serial          # sources l'une après l'autre (comparaison)
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypedDict
+
+from rich import print as rprint
+from rich.panel import Panel
+from rich.table import Table
+
+from . import instrumentation
+
+
+SOURCES = ("recipes", "cookbooks", "ustensils")
+
+
+class SourceReport(TypedDict):
+    source: str
+    docs: int
+    pages: int
+    wall_s: float
+    parse_s: float
+    embed_s: float
+    write_s: float
+    error: Optional[str]
+
+
+def recipe_csvs() -> List[Path]:
+    """CSV de recettes de files/ (même routage que ingest_daemon)."""
+    from .ingest_daemon import route, watched_dirs
+
+    dirs = watched_dirs()
+    return [p for p in sorted(dirs["files"].glob("*.csv")) if route(p, dirs) == "recipes"]
+
+
+def _embed_wait(source: str) -> float:
+    from .config import EMBEDDINGS
+    from .embedding_server import BatchedEmbeddings
+
+    return EMBEDDINGS.wait_s(source) if isinstance(EMBEDDINGS, BatchedEmbeddings) else 0.0
+
+
+def _run(source: str, task: Callable[[], Any], reports: Dict[str, SourceReport]) -> None:
+    start = time.perf_counter()
+    error = None
+    try:
+        task()
+    except Exception as exc:  # une source en échec n'arrête pas les autres
+        error = f"{type(exc).__name__}: {exc}"
+        rprint(f"[red]ingest : échec {source} : {error}[/red]")
+    counters = instrumentation.counters()
+    embed_s = _embed_wait(source)
+    reports[source] = {
+        "source": source,
+        "docs": int(counters.get(f"ingest.{source}.docs", 0)),
+        "pages": int(counters.get(f"ingest.{source}.pages", 0)),
+        "wall_s": time.perf_counter() - start,
+        "parse_s": counters.get(f"ingest.{source}.parse_s", 0.0),
+        "embed_s": embed_s,
+        # write_s compté autour de add_documents : on retire l'attente des embeddings
+        "write_s": max(counters.get(f"ingest.{source}.write_s", 0.0) - embed_s, 0.0),
+        "error": error,
+    }
+
+
+def run_sources(tasks: Dict[str, Callable[[], Any]], parallel: bool = True) -> Tuple[List[SourceReport], float]:
+    """Exécute les sources (un thread nommé par source) ; (rapports, durée totale)."""
+    reports: Dict[str, SourceReport] = {}
+    threads = [threading.Thread(target=_run, args=(s, t, reports), name=s) for s, t in tasks.items()]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        if not parallel:
+            thread.join()
+    for thread in threads:
+        thread.join()
+    return [reports[s] for s in tasks], time.perf_counter() - start
+
+
+def _rate(n: float, seconds: float) -> str:
+    return f"{n / seconds:.1f}" if seconds > 0 and n else "–"
+
+
+def print_report(reports: List[SourceReport], elapsed: float, startup_s: float) -> None:
+    from .config import EMBEDDINGS
+    from .embedding_server import BatchedEmbeddings
+
+    table = Table(title=f"Ingestion en {elapsed:.1f} s (démarrage modèle + stores {startup_s:.1f} s), temps en s")
+    for col in ("Source", "Docs", "Pages", "Durée", "docs/s", "pages/s", "parse", "embed", "write", "autre"):
+        table.add_column(col, justify="left" if col == "Source" else "right")
+    for r in reports:
+        other = max(r["wall_s"] - r["parse_s"] - r["embed_s"] - r["write_s"], 0.0)
+        table.add_row(
+            r["source"] + (" [red](échec)[/red]" if r["error"] else ""),
+            str(r["docs"]), str(r["pages"] or "–"), f"{r['wall_s']:.1f}",
+            _rate(r["docs"], r["wall_s"]), _rate(r["pages"], r["wall_s"]),
+            f"{r['parse_s']:.1f}", f"{r['embed_s']:.1f}", f"{r['write_s']:.1f}", f"{other:.1f}",
+        )
+    docs = sum(r["docs"] for r in reports)
+    pages = sum(r["pages"] for r in reports)
+    table.add_row(
+        "[bold]total[/bold]", str(docs), str(pages or "–"), f"{elapsed:.1f}",
+        _rate(docs, elapsed), _rate(pages, elapsed),
+        f"{sum(r['parse_s'] for r in reports):.1f}", f"{sum(r['embed_s'] for r in reports):.1f}",
+        f"{sum(r['write_s'] for r in reports):.1f}", "",
+    )
+    rprint(table)
+
+    if isinstance(EMBEDDINGS, BatchedEmbeddings):
+        stats = EMBEDDINGS.batcher.stats()
+        rprint(
+            f"[cyan]Worker d'embeddings[/cyan] : {int(stats['texts'])} textes en {int(stats['batches'])} lots "
+            f"({stats['texts_per_batch']:.0f} textes / lot), occupé {stats['busy_s']:.1f} s "
+            f"({stats['busy_s'] / max(elapsed, 1e-9):.0%} de l'ingestion)"
+        )
+    else:
+        rprint("[yellow]EMBEDDINGS_BATCHER=0 : le temps d'embedding est compté dans write[/yellow]")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingestion de toutes les sources en un seul process")
+    parser.add_argument("--only", nargs="+", choices=SOURCES, default=list(SOURCES))
+    parser.add_argument("--serial", action="store_true", help="sources l'une après l'autre")
+    parser.add_argument("--prune", action="store_true", help="supprime les documents absents des fichiers")
+    parser.add_argument("--parser", help="parseur PDF (pypdf | pymupdf)")
+    parser.add_argument("--min-tokens", type=int, help="pages PDF plus courtes ignorées")
+    parser.add_argument("--new-job", action="store_true", help="PDFs : ne pas reprendre le dernier job interrompu")
+    args = parser.parse_args()
+
+    # avant l'import de config : les stores sont créés avec le worker partagé
+    os.environ.setdefault("EMBEDDINGS_BATCHER", "1")
+    start = time.perf_counter()
+    from . import ingest_csv, ingest_pdfs, ingest_ustensils
+
+    startup_s = time.perf_counter() - start
+    min_tokens = args.min_tokens if args.min_tokens is not None else ingest_pdfs.MIN_TOKENS
+
+    def recipes() -> None:
+        for path in recipe_csvs():
+            ingest_csv.ingest_csv(path, show_table=False, prune=args.prune)
+
+    tasks: Dict[str, Callable[[], Any]] = {
+        "recipes": recipes,
+        "cookbooks": lambda: ingest_pdfs.ingest_cookbook_pdfs(args.parser, min_tokens, resume=not args.new_job),
+        "ustensils": lambda: ingest_ustensils.ingest_ustensils(prune=args.prune, show_table=False),
+    }
+    rprint(Panel.fit(
+        f"[bold cyan]Ingestion {'séquentielle' if args.serial else 'parallèle'}[/bold cyan] : {', '.join(args.only)}"
+    ))
+    reports, elapsed = run_sources({s: tasks[s] for s in SOURCES if s in args.only}, parallel=not args.serial)
+    print_report(reports, elapsed, startup_s)
+
+
+if __name__ == "__main__":
+    main()
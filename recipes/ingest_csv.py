@@ -1,10 +1,36 @@
-# recipes/ingest_csv.py
+"""
+recipes/ingest_csv.py
+
+Ingestion de catalogues de recettes CSV → Chroma 'recipes' (+ 'recipe_fields',
+index des ingrédients, catalogue Parquet des métadonnées structurées).
+
+- mapping déclaratif des colonnes par fichier source (`CSV_SCHEMAS`) : les
+  en-têtes réels (« ID, Titre, Saison, Pers. ») sont ramenés aux champs
+  canoniques (id, title, season, people, total_time, diet, ingredients,
+  instructions),
+- lecture par blocs (pyarrow, sinon pandas, sinon csv) : mémoire constante,
+  chaque bloc est embarqué et écrit (upsert par id stable) avant le suivant,
+- tableau rich ligne par ligne seulement en interactif et pour les petits
+  fichiers ; sinon une ligne de progression par bloc,
+- `prune=True` (ingest_daemon.py) : les recettes disparues du fichier
+  (métadonnée `filename`) sont supprimées après l'upsert,
+- quasi-doublons (near_duplicates.py) : une recette presque identique à une
+  recette déjà ingérée n'est pas écrite (ni ses champs, ni sa ligne de
+  catalogue) ; le canonique liste son id dans `aliases`.
+
+    python -m recipes.ingest_csv --csv files/catalogue.csv --schema generic --chunk-size 2000
+"""
 
 from __future__ import annotations
 
+import argparse
 import csv
+import itertools
+import os
+import sys
+import time
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, TypedDict
 
 from rich import print as rprint
 from rich.panel import Panel
@@ -12,77 +38,380 @@ from rich.table import Table
 
 from langchain_core.documents import Document
 
-from .config import RECIPES_VS, BASE_DIR
+from . import instrumentation
+from .catalogue import CatalogueWriter, catalogue_row
+from .config import RECIPES_VS, RECIPE_FIELDS_VS, BASE_DIR, CATALOGUE_DIR, INGREDIENT_INDEX_PATH
+from .ingredient_index import IngredientEntry, replace_source
+from .multivector import field_documents
+from .near_duplicates import filter_near_duplicates, forget_source
+from .retrieval_cache import bump_version
+from .vector_backends import delete_documents, ids_where
 
 
 CSV_PATH = BASE_DIR / "files" / "recipes_salades.csv"
 
+# Lignes lues / embarquées / écrites par bloc (CSV_CHUNK_SIZE).
+CHUNK_SIZE = int(os.getenv("CSV_CHUNK_SIZE", "1000"))
+# Documents par appel add_documents (Chroma refuse les lots > ~5000).
+WRITE_BATCH = int(os.getenv("CSV_WRITE_BATCH", "1000"))
+# Au-delà, pas de tableau ligne par ligne même en interactif.
+TABLE_MAX_ROWS = 100
 
-def ingest_salade_recipes() -> None:
-    rprint(Panel.fit("[bold cyan]Ingestion des salades de saison → Chroma 'recipes'[/bold cyan]"))
 
-    if not CSV_PATH.exists():
-        rprint(f"[red]CSV introuvable : {CSV_PATH}[/red]")
-        return
+# --- mapping des colonnes ---
+
+
+class CsvSchema(TypedDict, total=False):
+    """Correspondance en-têtes du fichier → champs canoniques d'une recette."""
+
+    columns: Dict[str, Sequence[str]]   # champ → en-têtes acceptés (1er présent gagnant)
+    required: Sequence[str]             # champs dont une colonne doit exister
+    defaults: Dict[str, str]            # valeur si colonne absente / cellule vide
+    list_sep: str                       # séparateur des ingrédients / régimes dans la cellule
+    id_prefix: str                      # id généré si pas de colonne id : <prefix>-<n° de ligne>
+    type: str                           # métadonnée `type` des documents
+
+
+_GENERIC_COLUMNS: Dict[str, Sequence[str]] = {
+    "id": ("id", "ID", "recipe_id"),
+    "title": ("title", "Titre", "titre", "name", "nom"),
+    "season": ("season", "Saison", "saison"),
+    "people": ("people", "Pers.", "personnes", "servings", "yield"),
+    "total_time": ("total_time", "Temps", "temps", "Temps total", "minutes", "totalTime"),
+    "diet": ("diet", "Régime", "régime", "regime", "tags"),
+    "ingredients": ("ingredients", "Ingrédients", "ingrédients"),
+    "instructions": ("instructions", "Préparation", "préparation", "steps"),
+}
+
+CSV_SCHEMAS: Dict[str, CsvSchema] = {
+    "salades": {
+        "columns": _GENERIC_COLUMNS,
+        "required": ("title",),
+        "defaults": {"title": "Salade", "season": "?", "people": "?"},
+        "list_sep": ";",
+        "id_prefix": "salade",
+        "type": "salade",
+    },
+    "generic": {
+        "columns": _GENERIC_COLUMNS,
+        "required": ("title",),
+        "defaults": {"title": "Recette", "season": "?", "people": "?"},
+        "list_sep": ";",
+        "id_prefix": "recette",
+        "type": "recette",
+    },
+}
+
+# fichier source → schéma (sinon --schema, défaut "generic")
+SCHEMA_BY_FILE: Dict[str, str] = {"recipes_salades.csv": "salades"}
+
+
+def resolve_columns(header: Sequence[str], schema: CsvSchema) -> Dict[str, str]:
+    """{champ canonique: en-tête du fichier} ; ValueError si un champ requis manque."""
+    present = {h.strip(): h for h in header}
+    mapping = {}
+    for field, aliases in schema["columns"].items():
+        found = next((present[a] for a in aliases if a in present), None)
+        if found is not None:
+            mapping[field] = found
+    missing = [f for f in schema.get("required", ()) if f not in mapping]
+    if missing:
+        raise ValueError(f"colonnes introuvables pour {', '.join(missing)} (en-têtes : {', '.join(header)})")
+    return mapping
 
-    docs: List[Document] = []
 
-    with CSV_PATH.open("r", encoding="utf-8") as f:
+# --- lecture par blocs ---
+
+
+def _header(path: Path) -> List[str]:
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def iter_csv_chunks(path: Path, chunk_size: int = CHUNK_SIZE, engine: str = "auto") -> Iterator[List[Dict[str, Any]]]:
+    """
+    Blocs de `chunk_size` lignes (dicts en-tête → valeur texte).
+    engine : auto (pyarrow > pandas > csv) | pyarrow | pandas | csv.
+    """
+    if engine in ("auto", "pyarrow"):
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pacsv
+        except ImportError:
+            if engine == "pyarrow":
+                raise
+        else:
+            # tout en texte : l'inférence de types par bloc varierait d'un bloc à l'autre
+            reader = pacsv.open_csv(
+                str(path),
+                read_options=pacsv.ReadOptions(block_size=1 << 20),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={h: pa.string() for h in _header(path)},
+                    strings_can_be_null=False,
+                ),
+            )
+            pending: List[Dict[str, Any]] = []
+            for batch in reader:
+                pending.extend(batch.to_pylist())
+                while len(pending) >= chunk_size:
+                    yield pending[:chunk_size]
+                    pending = pending[chunk_size:]
+            if pending:
+                yield pending
+            return
+
+    if engine in ("auto", "pandas"):
+        try:
+            import pandas as pd
+        except ImportError:
+            if engine == "pandas":
+                raise
+        else:
+            for frame in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size, encoding="utf-8-sig"):
+                yield frame.to_dict("records")
+            return
+
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
         reader = csv.DictReader(f)
-        rows = list(reader)
+        while True:
+            chunk = list(itertools.islice(reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
 
-    # tableau récap
-    table = Table(title="Recettes détectées", show_lines=True)
-    table.add_column("#", justify="right")
-    table.add_column("ID")
-    table.add_column("Titre")
-    table.add_column("Saison")
-    table.add_column("Pers.")
-
-    for idx, row in enumerate(rows, start=1):
-        rid = row.get("id") or f"salade-{idx}"
-        title = row.get("title") or "Salade"
-        season = row.get("season") or "?"
-        people = row.get("people") or "?"
-
-        ingredients = (row.get("ingredients") or "").split(";")
-        instructions = row.get("instructions") or ""
-
-        # texte indexé pour le RAG
-        text = (
-            f"{title}\n\n"
-            f"Saison : {season}\n"
-            f"Portions : {people}\n\n"
-            "Ingrédients :\n"
-            + "\n".join(f"- {i.strip()}" for i in ingredients if i.strip())
-            + "\n\nPréparation :\n"
-            + instructions
-        )
 
+# --- lignes → documents ---
+
+
+class RecipeRow(TypedDict):
+    id: str
+    title: str
+    season: str
+    people: str
+    total_time: str
+    diet: List[str]
+    ingredients: List[str]
+    instructions: str
+
+
+def map_row(row: Mapping[str, Any], columns: Mapping[str, str], schema: CsvSchema, line: int) -> RecipeRow:
+    defaults = schema.get("defaults", {})
+
+    def cell(field: str) -> str:
+        value = row.get(columns[field]) if field in columns else None
+        text = "" if value is None else str(value).strip()
+        return text or defaults.get(field, "")
+
+    sep = schema.get("list_sep", ";")
+    return {
+        "id": cell("id") or f"{schema.get('id_prefix', 'recette')}-{line}",
+        "title": cell("title"),
+        "season": cell("season"),
+        "people": cell("people"),
+        "total_time": cell("total_time"),
+        "diet": [d.strip() for d in cell("diet").split(sep) if d.strip()],
+        "ingredients": [i.strip() for i in cell("ingredients").split(sep) if i.strip()],
+        "instructions": cell("instructions"),
+    }
+
+
+def recipe_text(recipe: RecipeRow) -> str:
+    """Texte indexé pour le RAG (sections vides omises)."""
+    text = f"{recipe['title']}\n\nSaison : {recipe['season']}\nPortions : {recipe['people']}"
+    if recipe["total_time"]:
+        text += f"\nTemps total : {recipe['total_time']}"
+    if recipe["ingredients"]:
+        text += "\n\nIngrédients :\n" + "\n".join(f"- {i}" for i in recipe["ingredients"])
+    if recipe["instructions"]:
+        text += "\n\nPréparation :\n" + recipe["instructions"]
+    return text
+
+
+def chunk_documents(
+    recipes: Sequence[RecipeRow], schema: CsvSchema, filename: str = ""
+) -> Tuple[List[Document], List[Document], List[IngredientEntry]]:
+    """(documents 'recipes', documents 'recipe_fields', entrées de l'index ingrédients)."""
+    docs: List[Document] = []
+    field_docs: List[Document] = []
+    entries: List[IngredientEntry] = []
+    for recipe in recipes:
+        text = recipe_text(recipe)
         meta = {
-            "id": rid,
-            "title": title,
-            "season": season,
-            "people": people,
+            "id": recipe["id"],
+            "title": recipe["title"],
+            "season": recipe["season"],
+            "people": recipe["people"],
             "source": "recipes",  # cohérent avec recipes_retriever
-            "type": "salade",
+            "type": schema.get("type", "recette"),
+            "filename": filename,  # fichier source (suppressions incrémentales)
         }
+        # id stable : relancer l'ingestion met à jour au lieu de dupliquer
+        docs.append(Document(id=recipe["id"], page_content=text, metadata=meta))
+        # multi-vecteur : titre / ingrédients / préparation embarqués séparément
+        field_docs.extend(
+            field_documents(
+                recipe["id"],
+                {
+                    "title": f"{recipe['title']} ({recipe['season']})",
+                    "ingredients": ", ".join(recipe["ingredients"]),
+                    "instructions": recipe["instructions"],
+                },
+                meta,
+                parent_content=text,
+            )
+        )
+        entries.append({"id": recipe["id"], "title": recipe["title"], "ingredients": recipe["ingredients"], "metadata": meta})
+    return docs, field_docs, entries
+
+
+# --- ingestion ---
+
+
+def write_documents(store: Any, docs: List[Document]) -> None:
+    """Écrit `docs` par lots de WRITE_BATCH (aussi utilisé par ingest_html)."""
+    start = time.perf_counter()
+    for i in range(0, len(docs), WRITE_BATCH):
+        store.add_documents(docs[i:i + WRITE_BATCH])
+    # temps d'écriture embeddings compris (ingest.py en retire l'attente du worker)
+    instrumentation.increment("ingest.recipes.write_s", time.perf_counter() - start)
+
+
+def _prune(filename: str, keep: Optional[set] = None) -> int:
+    """Supprime les documents de `filename` dont la recette n'est pas dans `keep` (tout si None)."""
+    removed = 0
+    for store in (RECIPES_VS, RECIPE_FIELDS_VS):
+        existing = ids_where(store, {"filename": filename})
+        # recipe_fields : ids <parent_id>::<champ>
+        stale = [i for i in existing if keep is None or i.split("::")[0] not in keep]
+        delete_documents(store, stale)
+        removed += len(stale)
+    return removed
+
 
-        docs.append(Document(page_content=text, metadata=meta))
-        table.add_row(str(idx), rid, title, season, str(people))
+def remove_csv_source(path: Path) -> int:
+    """Fichier supprimé : ses recettes, vecteurs de champs, son catalogue et ses entrées d'index disparaissent."""
+    removed = _prune(path.name)
+    forget_source("recipes", path.name)
+    replace_source(INGREDIENT_INDEX_PATH, path.name)
+    (CATALOGUE_DIR / f"{path.stem}.parquet").unlink(missing_ok=True)
+    bump_version("recipes", "recipe_fields")
+    return removed
 
-    rprint(table)
+
+def ingest_csv(
+    path: Path = CSV_PATH,
+    schema_name: Optional[str] = None,
+    chunk_size: int = CHUNK_SIZE,
+    engine: str = "auto",
+    show_table: Optional[bool] = None,
+    prune: bool = False,
+) -> int:
+    """Ingère `path` bloc par bloc ; retourne le nombre de recettes écrites."""
+    schema_name = schema_name or SCHEMA_BY_FILE.get(path.name, "generic")
+    schema = CSV_SCHEMAS[schema_name]
+    rprint(Panel.fit(f"[bold cyan]Ingestion {path.name} (schéma {schema_name}) → Chroma 'recipes'[/bold cyan]"))
+
+    if not path.exists():
+        rprint(f"[red]CSV introuvable : {path}[/red]")
+        return 0
+
+    columns = resolve_columns(_header(path), schema)
+    rprint(f"[cyan]Colonnes[/cyan] : " + ", ".join(f"{h} → {f}" for f, h in columns.items()))
+    if show_table is None:
+        show_table = sys.stdout.isatty()
+
+    table = Table(title="Recettes détectées", show_lines=True)
+    for col, justify in (("#", "right"), ("ID", "left"), ("Titre", "left"), ("Saison", "left"), ("Pers.", "left")):
+        table.add_column(col, justify=justify)  # type: ignore[arg-type]
+
+    # entrées de l'index des ingrédients (ids, titres, ingrédients) : quelques
+    # centaines d'octets par recette, fusionnées dans l'index partagé à la fin
+    index_entries: List[IngredientEntry] = []
+    total = n_fields = duplicates = 0
+    seen: set = set()
+    written: set = set()
+    start = time.perf_counter()
+    # catalogue structuré (temps, personnes, saison, régimes) pour les requêtes SQL (catalogue.py)
+    with CatalogueWriter(CATALOGUE_DIR / f"{path.stem}.parquet") as catalogue:
+        parse_start = time.perf_counter()
+        for chunk in iter_csv_chunks(path, chunk_size, engine):
+            recipes = [map_row(row, columns, schema, total + i) for i, row in enumerate(chunk, start=1)]
+            docs, field_docs, entries = chunk_documents(recipes, schema, path.name)
+            instrumentation.increment("ingest.recipes.parse_s", time.perf_counter() - parse_start)
+            seen.update(r["id"] for r in recipes)
+            # quasi-doublons d'une recette déjà ingérée (ce fichier ou un autre) : non écrits
+            docs, report = filter_near_duplicates("recipes", docs, RECIPES_VS)
+            kept = {d.id for d in docs}
+            if report and report["duplicates"]:
+                duplicates += report["duplicates"]
+                field_docs = [d for d in field_docs if d.metadata["parent_id"] in kept]
+                entries = [e for e in entries if e["id"] in kept]
+            written |= kept
+            write_documents(RECIPES_VS, docs)
+            write_documents(RECIPE_FIELDS_VS, field_docs)
+            # recettes seules : les vecteurs de champs ne sont pas des documents de plus
+            instrumentation.increment("ingest.recipes.docs", len(docs))
+            index_entries.extend(entries)
+            catalogue.write([
+                catalogue_row(r["id"], r["title"], r["season"], r["people"], r["total_time"],
+                              r["ingredients"], r["diet"], source=path.stem)
+                for r in recipes
+                if r["id"] in kept
+            ])
+
+            if show_table and total + len(recipes) <= TABLE_MAX_ROWS:
+                for i, r in enumerate(recipes, start=total + 1):
+                    table.add_row(str(i), r["id"], r["title"], r["season"], r["people"])
+            else:
+                show_table = False
+            total += len(recipes)
+            n_fields += len(field_docs)
+            if not show_table:
+                elapsed = time.perf_counter() - start
+                rprint(f"  {total} recettes, {n_fields} vecteurs de champs — {total / elapsed:.0f} recettes/s")
+            parse_start = time.perf_counter()
+
+    if show_table:
+        rprint(table)
+    rprint(f"[cyan]Catalogue[/cyan] : {catalogue.rows} recettes → {catalogue.path}")
+    if duplicates:
+        rprint(f"[cyan]Quasi-doublons[/cyan] : {duplicates} recettes sur {total} non écrites ({duplicates / total:.1%})")
+    if prune:
+        # les quasi-doublons écrits avant coup sont retirés aussi
+        rprint(f"[cyan]Suppressions[/cyan] : {_prune(path.name, written)} documents absents de {path.name}")
+        forget_source("recipes", path.name, seen)
+    bump_version("recipes", "recipe_fields")  # invalide le cache de recherche
+
+    # index inversé des ingrédients (requêtes "frigo") : les entrées de ce fichier
+    # remplacent les précédentes, celles des autres sources sont conservées
+    index = replace_source(INGREDIENT_INDEX_PATH, path.name, index_entries)
+    rprint(f"[cyan]Index ingrédients[/cyan] : {len(index)} recettes, {len(index.vocab)} ingrédients")
 
     rprint(
         Panel.fit(
-            f"[cyan]Insertion dans Chroma 'recipes'[/cyan] "
-            f"({len(docs)} recettes de salades)"
+            f"[bold green]Ingestion terminée ✅[/bold green] {total - duplicates} recettes, {n_fields} vecteurs de champs "
+            f"en {time.perf_counter() - start:.1f} s"
         )
     )
-    RECIPES_VS.add_documents(docs)
+    return total - duplicates
+
+
+def ingest_salade_recipes() -> None:
+    ingest_csv(CSV_PATH, "salades")
+
 
-    rprint(Panel.fit("[bold green]Ingestion des salades terminée ✅[/bold green]"))
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingestion d'un catalogue de recettes CSV")
+    parser.add_argument("--csv", type=Path, default=CSV_PATH)
+    parser.add_argument("--schema", choices=sorted(CSV_SCHEMAS), help="défaut : selon le nom du fichier, sinon generic")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--engine", choices=("auto", "pyarrow", "pandas", "csv"), default=os.getenv("CSV_ENGINE", "auto"))
+    parser.add_argument("--table", action=argparse.BooleanOptionalAction, default=None,
+                        help="tableau ligne par ligne (défaut : si terminal interactif)")
+    parser.add_argument("--prune", action="store_true", help="supprime les recettes absentes du fichier")
+    args = parser.parse_args()
+    ingest_csv(args.csv, args.schema, args.chunk_size, args.engine, args.table, args.prune)
 
 
 if __name__ == "__main__":
-    ingest_salade_recipes()
+    main()
@@ -0,0 +1,300 @@
+"""
+recipes/ingest_daemon.py
+
+Daemon d'ingestion : surveille PDF_DIR (*.pdf) et files/ (*.csv) avec
+watchdog et applique des upserts / suppressions incrémentaux à la
+collection concernée, au lieu de relancer les scripts d'ingestion à la main.
+
+- anti-rebond : un fichier n'est traité qu'après INGEST_DEBOUNCE_S sans
+  nouvel événement (copie en cours, sauvegardes successives d'un éditeur),
+- routage : *.pdf → cookbooks (une ingestion par livre), ustensils.csv →
+  ustensils, autres *.csv → recipes (schéma selon le nom du fichier) ;
+  ids stables → upsert, documents disparus du fichier supprimés,
+- fichier supprimé → ses documents aussi (métadonnée `filename`) ; les
+  fichiers dont un quasi-doublon redevient canonique (near_duplicates,
+  stale_sources) sont remis en file pour que la page / recette soit écrite,
+- un seul fichier ingéré à la fois (écritures Chroma sérialisées),
+- métriques : profondeur de file, latence événement → écriture (p50 / p95),
+  fichiers traités / en échec ; compteurs instrumentation
+  `ingest_daemon.<collection>.ok|failed` et instantané JSON
+  (data/ingest_daemon.json) réécrit après chaque fichier.
+
+    python -m recipes.ingest_daemon --initial-scan
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple, TypedDict
+
+from rich import print as rprint
+
+from . import instrumentation
+
+
+class PendingChange(TypedDict):
+    deleted: bool
+    first_seen: float       # premier événement non traité (latence de bout en bout)
+    last_seen: float        # dernier événement (anti-rebond)
+
+
+# collection → (upsert(path) -> nb de documents, suppression(path) -> nb de documents)
+Handlers = Dict[str, Tuple[Callable[[Path], Any], Callable[[Path], Any]]]
+
+
+def default_handlers(parser: Optional[str] = None) -> Handlers:
+    from .ingest_csv import ingest_csv, remove_csv_source
+    from .ingest_pdfs import ingest_pdf_file, remove_pdf_source
+    from .ingest_ustensils import ingest_ustensils, remove_ustensils_source
+
+    return {
+        "cookbooks": (lambda p: ingest_pdf_file(p, parser), remove_pdf_source),
+        "recipes": (lambda p: ingest_csv(p, show_table=False, prune=True), remove_csv_source),
+        "ustensils": (lambda p: ingest_ustensils(p, prune=True, show_table=False), remove_ustensils_source),
+    }
+
+
+def watched_dirs() -> Dict[str, Path]:
+    from .config import BASE_DIR
+    from .ingest_pdfs import PDF_DIR
+
+    return {"pdfs": PDF_DIR, "files": BASE_DIR / "files"}
+
+
+def route(path: Path, dirs: Dict[str, Path]) -> Optional[str]:
+    """Collection cible d'un fichier surveillé ; None si ignoré (.tmp, autres dossiers)."""
+    parent, suffix = path.parent.resolve(), path.suffix.lower()
+    if suffix == ".pdf" and parent == dirs["pdfs"].resolve():
+        return "cookbooks"
+    if suffix == ".csv" and parent == dirs["files"].resolve():
+        return "ustensils" if path.name == "ustensils.csv" else "recipes"
+    return None
+
+
+class IngestDaemon:
+    def __init__(
+        self,
+        handlers: Handlers,
+        dirs: Dict[str, Path],
+        debounce_s: float = 2.0,
+        metrics_path: Optional[Path] = None,
+    ) -> None:
+        self.handlers = handlers
+        self.dirs = dirs
+        self.debounce_s = debounce_s
+        self.metrics_path = metrics_path
+        self._lock = threading.Lock()
+        self._pending: Dict[Path, PendingChange] = {}
+        self._latencies: Deque[float] = deque(maxlen=500)
+        self._processed = 0
+        self._failed = 0
+        self._current: Optional[str] = None
+        self._last: Dict[str, Any] = {}
+        self._requeued: Set[Tuple[str, str]] = set()   # (collection, source) déjà remis en file
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- événements ---
+
+    def notify(self, path: Path, deleted: bool = False) -> None:
+        if route(path, self.dirs) is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            change = self._pending.get(path)
+            if change is None:
+                self._pending[path] = {"deleted": deleted, "first_seen": now, "last_seen": now}
+            else:
+                change.update(deleted=deleted, last_seen=now)
+
+    def scan(self) -> int:
+        """Met en file tous les fichiers déjà présents (réconciliation au démarrage)."""
+        n = 0
+        for pattern, directory in (("*.pdf", self.dirs["pdfs"]), ("*.csv", self.dirs["files"])):
+            for path in sorted(directory.glob(pattern)):
+                self.notify(path)
+                n += 1
+        return n
+
+    # --- traitement ---
+
+    def process_ready(self, now: Optional[float] = None) -> int:
+        """Traite les fichiers sans événement depuis `debounce_s` ; retourne leur nombre."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            ready = sorted(
+                (p for p, c in self._pending.items() if now - c["last_seen"] >= self.debounce_s),
+                key=lambda p: self._pending[p]["first_seen"],
+            )
+        for path in ready:
+            with self._lock:
+                change = self._pending.pop(path, None)
+            if change is not None:
+                self._process(path, change)
+        return len(ready)
+
+    def _process(self, path: Path, change: PendingChange) -> None:
+        collection = route(path, self.dirs) or ""
+        upsert, remove = self.handlers[collection]
+        deleted = change["deleted"] or not path.exists()
+        self._current = f"{collection}:{path.name}"
+        start = time.monotonic()
+        try:
+            docs = remove(path) if deleted else upsert(path)
+        except Exception as exc:  # fichier corrompu / en cours d'écriture : on continue à surveiller
+            self._failed += 1
+            instrumentation.increment(f"ingest_daemon.{collection}.failed")
+            rprint(f"[red]ingest_daemon : échec {path.name} → {collection} : {exc}[/red]")
+            self._last = {"file": path.name, "collection": collection, "error": str(exc)}
+        else:
+            done = time.monotonic()
+            latency = done - change["first_seen"]
+            self._processed += 1
+            self._latencies.append(latency)
+            instrumentation.increment(f"ingest_daemon.{collection}.ok")
+            self._last = {
+                "file": path.name, "collection": collection, "action": "delete" if deleted else "upsert",
+                "docs": docs, "ingest_s": round(done - start, 3), "latency_s": round(latency, 3),
+            }
+            rprint(
+                f"[green]ingest_daemon[/green] {'suppression' if deleted else 'upsert'} {path.name} → "
+                f"{collection} : {docs} docs en {done - start:.1f} s (latence {latency:.1f} s, "
+                f"file {self.queue_depth()})"
+            )
+        finally:
+            self._current = None
+        self._requeue_stale()
+        self._publish()
+
+    def _requeue_stale(self) -> None:
+        """Sources dont un alias est devenu canonique sans être écrit : remises en file (une fois)."""
+        from .near_duplicates import stale_sources
+
+        stale = set(stale_sources())
+        self._requeued &= stale  # ré-ingérées depuis : une nouvelle promotion les remettra en file
+        dirs = {"cookbooks": self.dirs["pdfs"], "recipes": self.dirs["files"]}
+        for collection, source in sorted(stale - self._requeued):
+            self._requeued.add((collection, source))
+            path = dirs[collection] / source if collection in dirs else None
+            if path is not None and route(path, self.dirs) == collection and path.exists():
+                with self._lock:
+                    pending = path in self._pending
+                if not pending:
+                    rprint(f"[cyan]ingest_daemon[/cyan] : {source} remis en file (quasi-doublon redevenu canonique)")
+                    self.notify(path)
+            else:
+                rprint(f"[yellow]ingest_daemon : {source} ({collection}) hors des dossiers surveillés, à ré-ingérer à la main[/yellow]")
+
+    # --- métriques ---
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def metrics(self) -> Dict[str, Any]:
+        latencies = list(self._latencies)
+        return {
+            "queue_depth": self.queue_depth(),
+            "in_progress": self._current,
+            "processed": self._processed,
+            "failed": self._failed,
+            "latency_p50_s": round(instrumentation.percentile(latencies, 0.5), 3) if latencies else None,
+            "latency_p95_s": round(instrumentation.percentile(latencies, 0.95), 3) if latencies else None,
+            "last": self._last,
+            "updated_at": time.time(),
+        }
+
+    def _publish(self) -> None:
+        if self.metrics_path is None:
+            return
+        self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.metrics_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.metrics(), ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(self.metrics_path)
+
+    # --- boucle ---
+
+    def _run(self) -> None:
+        tick = min(0.5, self.debounce_s / 2) or 0.05
+        while not self._stop.wait(tick):
+            self.process_ready()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="ingest-daemon", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def watch(daemon: IngestDaemon) -> Any:
+    """Observer watchdog (démarré) qui alimente `daemon`."""
+    from watchdog.events import FileSystemEvent, FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    class _Handler(FileSystemEventHandler):
+        def on_created(self, event: FileSystemEvent) -> None:
+            if not event.is_directory:
+                daemon.notify(Path(os.fsdecode(event.src_path)))
+
+        def on_modified(self, event: FileSystemEvent) -> None:
+            self.on_created(event)
+
+        def on_deleted(self, event: FileSystemEvent) -> None:
+            if not event.is_directory:
+                daemon.notify(Path(os.fsdecode(event.src_path)), deleted=True)
+
+        def on_moved(self, event: FileSystemEvent) -> None:
+            # sauvegarde atomique d'un éditeur : fichier temporaire renommé en cible
+            if not event.is_directory:
+                daemon.notify(Path(os.fsdecode(event.src_path)), deleted=True)
+                daemon.notify(Path(os.fsdecode(event.dest_path)))
+
+    observer = Observer()
+    for directory in daemon.dirs.values():
+        directory.mkdir(parents=True, exist_ok=True)
+        observer.schedule(_Handler(), str(directory), recursive=False)
+    observer.start()
+    return observer
+
+
+def main() -> None:
+    from .config import INGEST_DAEMON_METRICS
+    from .pdf_cache import PARSERS, default_parser
+
+    parser = argparse.ArgumentParser(description="Ingestion continue de pdfs/ et files/")
+    parser.add_argument("--debounce", type=float, default=float(os.getenv("INGEST_DEBOUNCE_S", "2")))
+    parser.add_argument("--parser", choices=PARSERS, default=default_parser())
+    parser.add_argument("--initial-scan", action="store_true", help="ingère d'abord les fichiers déjà présents")
+    args = parser.parse_args()
+
+    daemon = IngestDaemon(default_handlers(args.parser), watched_dirs(), args.debounce, INGEST_DAEMON_METRICS)
+    if args.initial_scan:
+        rprint(f"[cyan]ingest_daemon[/cyan] {daemon.scan()} fichiers existants en file")
+    observer = watch(daemon)
+    daemon.start()
+    rprint(
+        f"[cyan]ingest_daemon[/cyan] surveille {', '.join(str(d) for d in daemon.dirs.values())} "
+        f"(anti-rebond {args.debounce:.1f} s, métriques {INGEST_DAEMON_METRICS})"
+    )
+    try:
+        while observer.is_alive():
+            observer.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        observer.stop()
+        observer.join()
+        daemon.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+"""
+recipes/ingest_html.py
+
+Import en masse de pages de recettes HTML enregistrées (« recettes scrapées
+/ JSON-LD » de la collection 'recipes') : dossiers de *.html / *.htm ou
+archives (.warc, .warc.gz, .zip, .tar, .tar.gz).
+
+- extraction des objets schema.org `Recipe` des <script type="application/ld+json">
+  (listes, @graph, @type multiples), dans un pool de processus
+  (HTML_WORKERS, défaut : nombre de cœurs ; 0 → dans le process),
+- normalisation en enregistrements `ImportedRecipe` (forme CandidateRecipe +
+  saison, portions, temps en minutes, régimes) : étapes HowToStep /
+  HowToSection aplaties, temps ISO 8601 (PT1H30M) ou prep + cuisson,
+  régimes suitableForDiet / mots-clés, saison déduite des mots-clés,
+- flux borné : les pages partent aux workers par lots (HTML_PAGES_PER_TASK),
+  au plus 2 lots en vol par worker ; les recettes sont écrites par blocs
+  (recipes + recipe_fields, quasi-doublons écartés) et ajoutées au
+  catalogue Parquet `html-<source>.parquet` et à l'index des ingrédients,
+- ids stables (URL de la recette, sinon page + rang) : ré-importer = upsert,
+- débit en pages/s (parse seul et de bout en bout).
+
+Le pool utilise `spawn` : ce module n'importe config.py (modèle d'embeddings,
+stores) que côté écriture, les workers restent légers.
+
+    python -m recipes.ingest_html pages/ export.warc.gz --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypedDict
+
+from rich import print as rprint
+from rich.panel import Panel
+
+from . import instrumentation
+from .catalogue import normalize_diet, parse_constraints, parse_minutes
+from .schema import CandidateRecipe
+
+
+PAGES_PER_TASK = int(os.getenv("HTML_PAGES_PER_TASK", "16"))
+WRITE_CHUNK = int(os.getenv("HTML_WRITE_CHUNK", "500"))   # recettes par bloc embarqué / écrit
+HTML_SUFFIXES = (".html", ".htm", ".xhtml")
+
+
+class ImportedRecipe(CandidateRecipe, total=False):
+    season: str
+    people: str
+    total_minutes: Optional[int]
+    diet: List[str]
+    origin: str             # fichier / enregistrement d'archive d'où vient la page
+
+
+class Page(TypedDict):
+    origin: str             # chemin, ou <archive>#<n° d'enregistrement / membre>
+    url: Optional[str]
+    path: Optional[str]     # page sur disque : lue par le worker
+    data: Optional[bytes]   # page d'archive : contenu déjà lu
+
+
+class PageResult(TypedDict):
+    origin: str
+    recipes: List[ImportedRecipe]
+    error: Optional[str]
+
+
+# --- lecture des sources ---
+
+
+def _page(origin: str, url: Optional[str] = None, path: Optional[str] = None, data: Optional[bytes] = None) -> Page:
+    return {"origin": origin, "url": url, "path": path, "data": data}
+
+
+def _dechunk(body: bytes) -> bytes:
+    out, pos = bytearray(), 0
+    while True:
+        end = body.find(b"\r\n", pos)
+        if end < 0:
+            return bytes(out)
+        size = int(body[pos:end].split(b";")[0] or b"0", 16)
+        if size == 0:
+            return bytes(out)
+        out += body[end + 2:end + 2 + size]
+        pos = end + 2 + size + 2
+
+
+def _http_body(block: bytes) -> Tuple[Dict[str, str], bytes]:
+    """Réponse HTTP brute d'un enregistrement WARC → (en-têtes, corps décodé)."""
+    head, _, body = block.partition(b"\r\n\r\n")
+    headers = {}
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = _dechunk(body)
+    if headers.get("content-encoding", "").lower() == "gzip":
+        body = gzip.decompress(body)
+    return headers, body
+
+
+def iter_warc(path: Path) -> Iterator[Page]:
+    """Enregistrements `response` (HTML) et `resource` d'un WARC, compressé par enregistrement ou non."""
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(path, "rb") as f:  # type: ignore[operator]
+        n = 0
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if not line.strip():
+                continue
+            if not line.startswith(b"WARC/"):
+                raise ValueError(f"{path.name} : en-tête WARC attendu, lu {line[:40]!r}")
+            headers = {}
+            for line in iter(f.readline, b""):
+                if not line.strip():
+                    break
+                name, _, value = line.decode("utf-8", "replace").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            block = f.read(int(headers.get("content-length", "0")))
+            n += 1
+            kind, url = headers.get("warc-type"), headers.get("warc-target-uri")
+            if kind == "response" and block.startswith(b"HTTP/"):
+                http_headers, body = _http_body(block)
+                if "html" in http_headers.get("content-type", "text/html"):
+                    yield _page(f"{path.name}#{n}", url, data=body)
+            elif kind == "resource" and "html" in headers.get("content-type", ""):
+                yield _page(f"{path.name}#{n}", url, data=block)
+
+
+def iter_pages(inputs: Sequence[Path]) -> Iterator[Page]:
+    """Pages HTML des dossiers (récursif) et archives données en entrée."""
+    for source in inputs:
+        name = source.name.lower()
+        if source.is_dir():
+            for path in sorted(p for p in source.rglob("*") if p.suffix.lower() in HTML_SUFFIXES):
+                yield _page(str(path.relative_to(source.parent)), path=str(path))
+        elif name.endswith((".warc", ".warc.gz")):
+            yield from iter_warc(source)
+        elif name.endswith(".zip"):
+            with zipfile.ZipFile(source) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and Path(info.filename).suffix.lower() in HTML_SUFFIXES:
+                        yield _page(f"{source.name}#{info.filename}", data=archive.read(info))
+        elif name.endswith((".tar", ".tar.gz", ".tgz")):
+            with tarfile.open(source, "r:*") as archive:
+                for member in archive:
+                    if member.isfile() and Path(member.name).suffix.lower() in HTML_SUFFIXES:
+                        f = archive.extractfile(member)
+                        if f is not None:
+                            yield _page(f"{source.name}#{member.name}", data=f.read())
+        elif source.suffix.lower() in HTML_SUFFIXES:
+            yield _page(source.name, path=str(source))
+        else:
+            raise ValueError(f"source non reconnue : {source} (dossier, .html, .warc[.gz], .zip, .tar[.gz])")
+
+
+# --- extraction JSON-LD (workers) ---
+
+
+class _JsonLdParser(HTMLParser):
+    """Contenu des <script type="application/ld+json"> et URL canonique de la page."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[str] = []
+        self.canonical: Optional[str] = None
+        self._buf: Optional[List[str]] = None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        a = {k: (v or "") for k, v in attrs}
+        if tag == "script" and a.get("type", "").split(";")[0].strip().lower() == "application/ld+json":
+            self._buf = []
+        elif tag == "link" and a.get("rel", "").lower() == "canonical" and a.get("href"):
+            self.canonical = a["href"]
+
+    def handle_data(self, data: str) -> None:
+        if self._buf is not None:
+            self._buf.append(data)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "script" and self._buf is not None:
+            self.blocks.append("".join(self._buf))
+            self._buf = None
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        match = re.search(rb"charset=[\"']?([\w-]+)", data[:2048])
+        try:
+            return data.decode(match.group(1).decode() if match else "cp1252", "replace")
+        except LookupError:
+            return data.decode("cp1252", "replace")
+
+
+def _is_recipe(obj: Dict[str, Any]) -> bool:
+    kind = obj.get("@type")
+    return "Recipe" in kind if isinstance(kind, list) else kind == "Recipe"
+
+
+def _walk(node: Any) -> Iterator[Dict[str, Any]]:
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk(item)
+    elif isinstance(node, dict):
+        if _is_recipe(node):
+            yield node
+        for key in ("@graph", "mainEntity", "itemListElement"):
+            if key in node:
+                yield from _walk(node[key])
+        item = node.get("item")
+        if isinstance(item, dict):
+            yield from _walk(item)
+
+
+_TAGS = re.compile(r"<[^>]+>")
+
+
+def _clean(value: Any) -> str:
+    if isinstance(value, dict):
+        value = value.get("text") or value.get("name") or ""
+    return " ".join(_TAGS.sub(" ", html.unescape(str(value or ""))).split())
+
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _steps(value: Any) -> List[str]:
+    """recipeInstructions : texte, liste de textes, HowToStep, HowToSection imbriquées."""
+    if isinstance(value, str):
+        return [s for s in (_clean(line) for line in re.split(r"\n+|<br\s*/?>|</p>", value)) if s]
+    if isinstance(value, list):
+        return [s for item in value for s in _steps(item)]
+    if isinstance(value, dict):
+        if "itemListElement" in value:
+            return _steps(value["itemListElement"])
+        text = _clean(value)
+        return [text] if text else []
+    return []
+
+
+_SCHEMA_DIETS = {
+    "vegetariandiet": "végétarien", "vegandiet": "végétalien", "glutenfreediet": "sans gluten",
+}
+
+
+def _diets(obj: Dict[str, Any], keywords: List[str]) -> List[str]:
+    declared = obj.get("suitableForDiet") or []
+    declared = declared if isinstance(declared, list) else [declared]
+    tags = {_SCHEMA_DIETS.get(str(d).rstrip("/").rsplit("/", 1)[-1].lower()) for d in declared}
+    tags |= {normalize_diet(k) for k in keywords}
+    return sorted(t for t in tags if t)
+
+
+def _keywords(obj: Dict[str, Any]) -> List[str]:
+    words: List[str] = []
+    for key in ("keywords", "recipeCategory", "recipeCuisine"):
+        value = obj.get(key) or []
+        for item in value if isinstance(value, list) else str(value).split(","):
+            if _clean(item):
+                words.append(_clean(item))
+    return words
+
+
+def recipe_id(url: Optional[str], origin: str, rank: int) -> str:
+    key = url or f"{origin}#{rank}"
+    return "html-" + hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def normalize_recipe(obj: Dict[str, Any], page_url: Optional[str], origin: str, rank: int) -> Optional[ImportedRecipe]:
+    """Objet JSON-LD `Recipe` → ImportedRecipe ; None sans titre."""
+    title = _clean(_first(obj.get("name")))
+    if not title:
+        return None
+    url = obj.get("url") or _first(obj.get("mainEntityOfPage"))
+    url = (url.get("@id") if isinstance(url, dict) else url) or page_url
+    ingredients = [i for i in (_clean(x) for x in (obj.get("recipeIngredient") or obj.get("ingredients") or [])) if i]
+    minutes = parse_minutes(obj.get("totalTime"))
+    if minutes is None and (obj.get("prepTime") or obj.get("cookTime")):
+        minutes = (parse_minutes(obj.get("prepTime")) or 0) + (parse_minutes(obj.get("cookTime")) or 0)
+    keywords = _keywords(obj)
+    season = parse_constraints(" ".join(keywords)).get("season", "?") if keywords else "?"
+    season = "été" if season == "ete" else season  # affichage ; le catalogue compare sans accents
+    return {
+        "id": recipe_id(str(url) if url else None, origin, rank),
+        "title": title,
+        "summary": _clean(obj.get("description")),
+        "steps": _steps(obj.get("recipeInstructions")),
+        "ingredients": ingredients,
+        "source": "recipes",
+        "url": str(url) if url else None,
+        "season": season,
+        "people": _clean(_first(obj.get("recipeYield"))) or "?",
+        "total_minutes": minutes,
+        "diet": _diets(obj, keywords),
+        "origin": origin,
+    }
+
+
+def extract_recipes(text: str, page_url: Optional[str], origin: str) -> List[ImportedRecipe]:
+    parser = _JsonLdParser()
+    parser.feed(text)
+    parser.close()
+    recipes: List[ImportedRecipe] = []
+    for block in parser.blocks:
+        try:
+            data = json.loads(block.strip().rstrip(";"), strict=False)
+        except ValueError:
+            continue  # JSON-LD invalide : fréquent sur les pages enregistrées, on passe
+        for obj in _walk(data):
+            recipe = normalize_recipe(obj, page_url or parser.canonical, origin, len(recipes))
+            if recipe is not None:
+                recipes.append(recipe)
+    return recipes
+
+
+def parse_pages(pages: List[Page]) -> List[PageResult]:
+    """Tâche d'un worker : un lot de pages → recettes par page (erreurs capturées)."""
+    results: List[PageResult] = []
+    for page in pages:
+        try:
+            data = page["data"] if page["data"] is not None else Path(page["path"] or "").read_bytes()
+            recipes = extract_recipes(_decode(data), page["url"], page["origin"])
+            results.append({"origin": page["origin"], "recipes": recipes, "error": None})
+        except Exception as exc:  # page illisible : comptée, l'import continue
+            results.append({"origin": page["origin"], "recipes": [], "error": f"{type(exc).__name__}: {exc}"})
+    return results
+
+
+def _batched(items: Iterable[Page], size: int) -> Iterator[List[Page]]:
+    batch: List[Page] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_results(pages: Iterable[Page], workers: int, pages_per_task: int = PAGES_PER_TASK) -> Iterator[PageResult]:
+    """Résultats dans l'ordre des pages ; au plus 2 lots en vol par worker (mémoire bornée)."""
+    if workers <= 0:
+        for batch in _batched(pages, pages_per_task):
+            yield from parse_pages(batch)
+        return
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending: Deque[Future] = deque()
+        for batch in _batched(pages, pages_per_task):
+            pending.append(pool.submit(parse_pages, batch))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+# --- écriture ---
+
+
+def recipe_row(recipe: ImportedRecipe) -> Dict[str, Any]:
+    """ImportedRecipe → RecipeRow d'ingest_csv (texte indexé, champs, catalogue)."""
+    minutes = recipe.get("total_minutes")
+    return {
+        "id": recipe["id"],
+        "title": recipe["title"],
+        "season": recipe.get("season", "?"),
+        "people": recipe.get("people", "?"),
+        "total_time": f"{minutes} min" if minutes else "",
+        "diet": recipe.get("diet", []),
+        "ingredients": recipe.get("ingredients", []),
+        "instructions": "\n".join(f"{i}. {s}" for i, s in enumerate(recipe.get("steps", []), start=1)),
+    }
+
+
+def import_html(inputs: Sequence[Path], workers: Optional[int] = None, name: Optional[str] = None) -> Dict[str, Any]:
+    """Importe les pages de `inputs` dans 'recipes' ; retourne le rapport (pages, recettes, débits)."""
+    from .catalogue import CatalogueWriter, catalogue_row
+    from .config import CATALOGUE_DIR, INGREDIENT_INDEX_PATH, RECIPE_FIELDS_VS, RECIPES_VS
+    from .ingest_csv import CSV_SCHEMAS, chunk_documents, write_documents
+    from .ingredient_index import replace_source
+    from .near_duplicates import filter_near_duplicates
+    from .retrieval_cache import bump_version
+
+    workers = int(os.getenv("HTML_WORKERS", str(os.cpu_count() or 1))) if workers is None else workers
+    name = name or "-".join(p.name.split(".")[0] for p in inputs)
+    rprint(Panel.fit(f"[bold cyan]Import HTML / JSON-LD ({', '.join(map(str, inputs))}) → 'recipes'[/bold cyan] ({workers} workers)"))
+
+    report = {"pages": 0, "with_recipe": 0, "errors": 0, "recipes": 0, "duplicates": 0, "written": 0,
+              "write_s": 0.0, "elapsed_s": 0.0}
+    entries: List[Dict[str, Any]] = []
+    pending: List[ImportedRecipe] = []
+    seen: set = set()
+    start = time.perf_counter()
+
+    def flush(catalogue: CatalogueWriter) -> None:
+        rows = [recipe_row(r) for r in pending]
+        urls = {r["id"]: r.get("url") for r in pending}
+        pending.clear()
+        t = time.perf_counter()
+        docs, field_docs, chunk_entries = chunk_documents(rows, CSV_SCHEMAS["generic"], name)  # type: ignore[arg-type]
+        for doc in docs:
+            doc.metadata["url"] = urls.get(doc.id) or ""
+        docs, dedup = filter_near_duplicates("recipes", docs, RECIPES_VS)
+        kept = {d.id for d in docs}
+        write_documents(RECIPES_VS, docs)
+        write_documents(RECIPE_FIELDS_VS, [d for d in field_docs if d.metadata["parent_id"] in kept])
+        catalogue.write([
+            catalogue_row(r["id"], r["title"], r["season"], r["people"], r["total_time"], r["ingredients"], r["diet"], source=name)
+            for r in rows if r["id"] in kept
+        ])
+        entries.extend(e for e in chunk_entries if e["id"] in kept)
+        report["duplicates"] += dedup["duplicates"] if dedup else 0
+        report["written"] += len(docs)
+        report["write_s"] += time.perf_counter() - t
+        elapsed = time.perf_counter() - start
+        rprint(f"  {report['pages']} pages, {report['written']} recettes écrites — {report['pages'] / elapsed:.0f} pages/s")
+
+    with CatalogueWriter(CATALOGUE_DIR / f"html-{name}.parquet") as catalogue:
+        for result in iter_results(iter_pages(inputs), workers):
+            report["pages"] += 1
+            if result["error"]:
+                report["errors"] += 1
+                rprint(f"[yellow]Page illisible[/yellow] {result['origin']} : {result['error']}")
+            if result["recipes"]:
+                report["with_recipe"] += 1
+            for recipe in result["recipes"]:
+                if recipe["id"] in seen:  # même recette sur plusieurs pages (pagination, AMP)
+                    continue
+                seen.add(recipe["id"])
+                pending.append(recipe)
+            if len(pending) >= WRITE_CHUNK:
+                flush(catalogue)
+        if pending:
+            flush(catalogue)
+    report["recipes"] = len(seen)
+    report["elapsed_s"] = time.perf_counter() - start
+
+    if entries:
+        # index des ingrédients : les recettes importées remplacent leurs versions précédentes
+        replace_source(INGREDIENT_INDEX_PATH, name, entries)  # type: ignore[arg-type]
+    bump_version("recipes", "recipe_fields")
+
+    instrumentation.increment("ingest.html.pages", report["pages"])
+    parse_s = max(report["elapsed_s"] - report["write_s"], 1e-9)
+    report["pages_per_s"] = report["pages"] / max(report["elapsed_s"], 1e-9)
+    rprint(
+        Panel.fit(
+            f"[bold green]Import terminé ✅[/bold green] {report['pages']} pages "
+            f"({report['with_recipe']} avec recette, {report['errors']} illisibles), "
+            f"{report['recipes']} recettes, {report['duplicates']} quasi-doublons, {report['written']} écrites\n"
+            f"{report['elapsed_s']:.1f} s — [cyan]{report['pages_per_s']:.0f} pages/s[/cyan] de bout en bout, "
+            f"{report['pages'] / parse_s:.0f} pages/s hors écriture (embeddings + Chroma {report['write_s']:.1f} s)"
+        )
+    )
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import de pages de recettes HTML (JSON-LD schema.org Recipe)")
+    parser.add_argument("inputs", nargs="+", type=Path, help="dossiers, pages .html, archives .warc[.gz] / .zip / .tar[.gz]")
+    parser.add_argument("--workers", type=int, help="processus d'extraction (défaut HTML_WORKERS ou nb de cœurs, 0 = sans pool)")
+    parser.add_argument("--name", help="nom de la source (métadonnée filename, catalogue html-<nom>.parquet)")
+    args = parser.parse_args()
+    import_html(args.inputs, args.workers, args.name)
+
+
+if __name__ == "__main__":
+    main()
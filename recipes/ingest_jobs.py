@@ -0,0 +1,220 @@
+"""
+recipes/ingest_jobs.py
+
+Journal des jobs d'ingestion (SQLite, data/ingest_jobs.sqlite) : une
+ingestion interrompue (crash, Ctrl-C, Chroma indisponible) reprend au
+dernier lot écrit au lieu de tout recommencer.
+
+- job : (type, paramètres) ; relancer avec les mêmes paramètres reprend le
+  dernier job non terminé,
+- élément (fichier) : empreinte du contenu, lots écrits / total, statut
+  pending | done | quarantined ; un fichier modifié depuis repart de zéro,
+- écritures idempotentes côté collections (ids stables) : un lot rejoué
+  après un crash entre l'écriture et le commit du journal ne duplique rien,
+- quarantaine : un fichier illisible (PDF corrompu) est noté avec l'erreur
+  et sauté par les jobs suivants tant que son contenu ne change pas.
+
+    python -m recipes.ingest_jobs            # jobs récents + fichiers en quarantaine
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, TypedDict
+
+
+class JobItem(TypedDict):
+    item: str
+    fingerprint: str
+    status: str             # pending | done | quarantined
+    batches_done: int
+    batches_total: int
+    error: Optional[str]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL,
+    status TEXT NOT NULL, created REAL NOT NULL, updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL, item TEXT NOT NULL, fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL, batches_done INTEGER NOT NULL DEFAULT 0,
+    batches_total INTEGER NOT NULL DEFAULT 0, error TEXT, updated REAL NOT NULL,
+    PRIMARY KEY (job_id, item)
+);
+CREATE TABLE IF NOT EXISTS quarantine (
+    kind TEXT NOT NULL, item TEXT NOT NULL, fingerprint TEXT NOT NULL,
+    error TEXT, job_id TEXT, created REAL NOT NULL,
+    PRIMARY KEY (kind, item, fingerprint)
+);
+"""
+
+
+class IngestJournal:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # autocommit : chaque lot est durable dès son enregistrement
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # --- jobs ---
+
+    def open_job(self, kind: str, params: Mapping[str, Any], resume: bool = True) -> str:
+        """Dernier job non terminé de ce type et ces paramètres (si `resume`), sinon un nouveau."""
+        key = json.dumps(params, sort_keys=True, default=str)
+        db = self._db()
+        if resume:
+            row = db.execute(
+                "SELECT job_id FROM jobs WHERE kind = ? AND params = ? AND status = 'running' "
+                "ORDER BY created DESC LIMIT 1",
+                (kind, key),
+            ).fetchone()
+            if row:
+                return row[0]
+        job_id = f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        now = time.time()
+        db.execute(
+            "INSERT INTO jobs (job_id, kind, params, status, created, updated) VALUES (?, ?, ?, 'running', ?, ?)",
+            (job_id, kind, key, now, now),
+        )
+        return job_id
+
+    def finish_job(self, job_id: str, status: str = "done") -> None:
+        self._db().execute("UPDATE jobs SET status = ?, updated = ? WHERE job_id = ?", (status, time.time(), job_id))
+
+    # --- éléments ---
+
+    def item(self, job_id: str, item: str, fingerprint: str) -> JobItem:
+        """État de `item` dans le job ; remis à zéro si son contenu a changé."""
+        db = self._db()
+        row = db.execute(
+            "SELECT fingerprint, status, batches_done, batches_total, error FROM items WHERE job_id = ? AND item = ?",
+            (job_id, item),
+        ).fetchone()
+        if row is None or row[0] != fingerprint:
+            db.execute(
+                "INSERT OR REPLACE INTO items (job_id, item, fingerprint, status, batches_done, batches_total, error, updated) "
+                "VALUES (?, ?, ?, 'pending', 0, 0, NULL, ?)",
+                (job_id, item, fingerprint, time.time()),
+            )
+            return {"item": item, "fingerprint": fingerprint, "status": "pending",
+                    "batches_done": 0, "batches_total": 0, "error": None}
+        return {"item": item, "fingerprint": row[0], "status": row[1],
+                "batches_done": row[2], "batches_total": row[3], "error": row[4]}
+
+    def commit_batch(self, job_id: str, item: str, batches_done: int, batches_total: int) -> None:
+        """À appeler après l'écriture effective du lot `batches_done - 1`."""
+        self._db().execute(
+            "UPDATE items SET batches_done = ?, batches_total = ?, updated = ? WHERE job_id = ? AND item = ?",
+            (batches_done, batches_total, time.time(), job_id, item),
+        )
+
+    def finish_item(self, job_id: str, item: str) -> None:
+        self._db().execute(
+            "UPDATE items SET status = 'done', updated = ? WHERE job_id = ? AND item = ?",
+            (time.time(), job_id, item),
+        )
+
+    # --- quarantaine ---
+
+    def quarantine(self, job_id: str, kind: str, item: str, fingerprint: str, error: str) -> None:
+        db = self._db()
+        now = time.time()
+        db.execute(
+            "UPDATE items SET status = 'quarantined', error = ?, updated = ? WHERE job_id = ? AND item = ?",
+            (error, now, job_id, item),
+        )
+        db.execute(
+            "INSERT OR REPLACE INTO quarantine (kind, item, fingerprint, error, job_id, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, item, fingerprint, error, job_id, now),
+        )
+
+    def is_quarantined(self, kind: str, item: str, fingerprint: str) -> bool:
+        row = self._db().execute(
+            "SELECT 1 FROM quarantine WHERE kind = ? AND item = ? AND fingerprint = ?", (kind, item, fingerprint)
+        ).fetchone()
+        return row is not None
+
+    def release(self, kind: str, item: Optional[str] = None) -> int:
+        """Sort des fichiers de quarantaine (tous ceux de `kind` si `item` est None)."""
+        sql, params = "DELETE FROM quarantine WHERE kind = ?", [kind]
+        if item is not None:
+            sql, params = sql + " AND item = ?", [kind, item]
+        return self._db().execute(sql, params).rowcount
+
+    # --- rapports ---
+
+    def summary(self, job_id: str) -> Dict[str, int]:
+        rows = self._db().execute("SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status", (job_id,))
+        return {status: n for status, n in rows}
+
+    def recent_jobs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        rows = self._db().execute(
+            "SELECT job_id, kind, params, status, created, updated FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [
+            {"job_id": r[0], "kind": r[1], "params": r[2], "status": r[3], "created": r[4], "updated": r[5],
+             "items": self.summary(r[0])}
+            for r in rows
+        ]
+
+    def quarantined(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT kind, item, fingerprint, error, job_id, created FROM quarantine"
+        rows = self._db().execute(sql + (" WHERE kind = ?" if kind else ""), (kind,) if kind else ()).fetchall()
+        return [dict(zip(("kind", "item", "fingerprint", "error", "job_id", "created"), r)) for r in rows]
+
+
+def get_journal() -> IngestJournal:
+    from .config import INGEST_JOURNAL_DB
+
+    return IngestJournal(INGEST_JOURNAL_DB)
+
+
+def main() -> None:
+    from rich import print as rprint
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Jobs d'ingestion et fichiers en quarantaine")
+    parser.add_argument("--release", metavar="KIND", help="sort de quarantaine les fichiers de ce type (ex : cookbooks)")
+    args = parser.parse_args()
+
+    journal = get_journal()
+    if args.release:
+        rprint(f"{journal.release(args.release)} fichier(s) sortis de quarantaine")
+
+    table = Table(title="Jobs d'ingestion récents")
+    for col in ("Job", "Paramètres", "Statut", "Éléments", "Mis à jour"):
+        table.add_column(col)
+    for job in journal.recent_jobs():
+        items = ", ".join(f"{s} {n}" for s, n in sorted(job["items"].items())) or "–"
+        table.add_row(job["job_id"], job["params"], job["status"], items, time.strftime("%Y-%m-%d %H:%M", time.localtime(job["updated"])))
+    rprint(table)
+
+    quarantined = journal.quarantined()
+    if quarantined:
+        q = Table(title="Quarantaine")
+        for col in ("Type", "Fichier", "Erreur"):
+            q.add_column(col)
+        for entry in quarantined:
+            q.add_row(entry["kind"], entry["item"], (entry["error"] or "")[:120])
+        rprint(q)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,23 +2,31 @@
 
 from __future__ import annotations
 
+import argparse
+import os
+import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from rich import print as rprint
 from rich.panel import Panel
 from rich.table import Table
 
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyMuPDFLoader
 
 
+from . import instrumentation
 from .config import COOKBOOKS_VS, BASE_DIR  # adapté à ton chemin actuel
+from .ingest_jobs import get_journal
+from .near_duplicates import filter_near_duplicates, forget_source
+from .pdf_cache import PARSERS, cache_dir, cached_file_hash, default_parser, extract_pages
+from .vector_backends import delete_documents, ids_where
+from .retrieval_cache import bump_version
 
 
 PDF_DIR = BASE_DIR / "pdfs"
 MIN_TOKENS = 50  # on ignore les pages trop courtes (page de garde, pub, etc.)
+WRITE_BATCH = int(os.getenv("PDF_WRITE_BATCH", "64"))  # pages par add_documents = unité de reprise du journal (ingest_jobs.py)
 
 
 def infer_category_and_title(stem: str) -> Tuple[str, str]:
@@ -34,8 +42,105 @@ def _token_len(text: str) -> int:
     return len((text or "").split())
 
 
-def ingest_cookbook_pdfs() -> None:
-    rprint(Panel.fit("[bold cyan]Ingestion des PDFs de cuisine → Chroma 'cookbooks'[/bold cyan]"))
+def load_cookbook_pages(
+    path: Path,
+    parser: Optional[str] = None,
+    min_tokens: int = MIN_TOKENS,
+    refresh_cache: bool = False,
+) -> Tuple[List[Document], int]:
+    """(pages retenues d'un PDF, nombre total de pages) ; id stable `<stem>::p<page>`."""
+    category, title = infer_category_and_title(path.stem)
+    # 1 Document par page, depuis le cache si déjà extraites
+    pages = extract_pages(path, parser, refresh=refresh_cache)
+    nb_pages = len(pages)
+    docs: List[Document] = []
+
+    for page_idx, page in enumerate(pages, start=1):
+        text = page.page_content or ""
+        if _token_len(text) < min_tokens:
+            # On ignore les pages trop courtes
+            continue
+
+        page.metadata = page.metadata or {}
+        page.metadata.update(
+            {
+                "id": path.stem,            # ex: recettes_italien
+                "filename": path.name,      # ex: recettes_italien.pdf
+                "source": "cookbook_pdf",
+                "category": category,       # "noel" / "italien" / "autre"
+                "book_title": title,
+                "page": page_idx,
+                "page_label": page.metadata.get("page_label", str(page_idx)),
+                "chunk_index": page_idx,    # 1 chunk = 1 page
+                "total_pages": nb_pages,
+            }
+        )
+        # ré-ingestion du même livre = upsert des mêmes pages
+        page.id = f"{path.stem}::p{page_idx}"
+        docs.append(page)
+    return docs, nb_pages
+
+
+def _write(docs: List[Document]) -> None:
+    start = time.perf_counter()
+    COOKBOOKS_VS.add_documents(docs)
+    # temps d'écriture embeddings compris (ingest.py en retire l'attente du worker)
+    instrumentation.increment("ingest.cookbooks.write_s", time.perf_counter() - start)
+    instrumentation.increment("ingest.cookbooks.docs", len(docs))
+
+
+def _prune_pages(path: Path, written: List[Document], loaded: List[Document]) -> None:
+    """
+    Pages du fichier qui ne sont plus écrites (PDF modifié, autre min_tokens,
+    quasi-doublon d'une autre page) → supprimées ; l'index des quasi-doublons
+    oublie celles qui ne sont plus dans le fichier.
+    """
+    existing = ids_where(COOKBOOKS_VS, {"filename": path.name})
+    keep = {d.id for d in written}
+    delete_documents(COOKBOOKS_VS, [i for i in existing if i not in keep])
+    forget_source("cookbooks", path.name, {str(d.id) for d in loaded})
+
+
+def ingest_pdf_file(path: Path, parser: Optional[str] = None, min_tokens: int = MIN_TOKENS) -> int:
+    """Un PDF (ajouté / modifié) → upsert de ses pages, suppression de celles qui ont disparu."""
+    loaded, _ = load_cookbook_pages(path, parser, min_tokens)
+    docs, _ = filter_near_duplicates("cookbooks", loaded, COOKBOOKS_VS)
+    for i in range(0, len(docs), WRITE_BATCH):
+        _write(docs[i:i + WRITE_BATCH])
+    _prune_pages(path, docs, loaded)
+    bump_version("cookbooks")
+    return len(docs)
+
+
+def remove_pdf_source(path: Path) -> int:
+    """PDF supprimé : toutes ses pages quittent 'cookbooks'."""
+    existing = ids_where(COOKBOOKS_VS, {"filename": path.name})
+    delete_documents(COOKBOOKS_VS, existing)
+    forget_source("cookbooks", path.name)
+    bump_version("cookbooks")
+    return len(existing)
+
+
+def ingest_cookbook_pdfs(
+    parser: Optional[str] = None,
+    min_tokens: int = MIN_TOKENS,
+    refresh_cache: bool = False,
+    resume: bool = True,
+    retry_quarantined: bool = False,
+) -> None:
+    """
+    Pages des PDFs de PDF_DIR → 'cookbooks'. Le texte extrait est mis en
+    cache par contenu de fichier et parseur (pdf_cache.py) : relancer avec un
+    autre `min_tokens` ou un autre modèle d'embeddings ne re-parse rien.
+
+    Écriture par lots de WRITE_BATCH pages, chaque lot noté dans le journal
+    (ingest_jobs.py) : un run interrompu reprend au dernier lot écrit
+    (`resume`), les PDFs illisibles sont mis en quarantaine sans arrêter le run.
+    Les pages quasi identiques à une page déjà vue (near_duplicates.py) ne
+    sont pas écrites.
+    """
+    parser = parser or default_parser()
+    rprint(Panel.fit(f"[bold cyan]Ingestion des PDFs de cuisine → Chroma 'cookbooks'[/bold cyan] (parseur {parser})"))
 
     if not PDF_DIR.exists():
         rprint(f"[red]Dossier PDF inexistant : {PDF_DIR}[/red]")
@@ -56,67 +161,98 @@ def ingest_cookbook_pdfs() -> None:
         table.add_row(str(idx), path.name, str(size_kb))
     rprint(table)
 
-    all_docs: List[Document] = []
+    journal = get_journal()
+    job_id = journal.open_job("cookbooks", {"parser": parser, "min_tokens": min_tokens}, resume=resume)
+    rprint(f"[cyan]Job[/cyan] {job_id}")
+
     total_pages = 0
     total_kept = 0
+    written = 0
+    duplicates = 0
+    extract_s = 0.0
 
-    for path in pdf_files:
-        category, title = infer_category_and_title(path.stem)
-
-        rprint(Panel.fit(f"[bold green]Chargement[/bold green] {path.name}"))
-        loader = PyPDFLoader(str(path))
-
-        # 1) on charge les pages (1 Document par page)
-        pages = loader.load()
-        nb_pages = len(pages)
-        total_pages += nb_pages
+    try:
+        for path in pdf_files:
+            category, title = infer_category_and_title(path.stem)
+            fingerprint = cached_file_hash(path, cache_dir())
+            if journal.is_quarantined("cookbooks", path.name, fingerprint):
+                if not retry_quarantined:
+                    rprint(f"[yellow]Quarantaine[/yellow] {path.name} ignoré (--retry-quarantined pour réessayer)")
+                    continue
+                journal.release("cookbooks", path.name)
+            state = journal.item(job_id, path.name, fingerprint)
+            if state["status"] == "done":
+                rprint(f"[dim]Déjà ingéré dans ce job : {path.name}[/dim]")
+                continue
 
-        kept_for_file = 0
-        docs_for_file: List[Document] = []
+            rprint(Panel.fit(f"[bold green]Chargement[/bold green] {path.name}"))
 
-        for page_idx, page in enumerate(pages, start=1):
-            text = page.page_content or ""
-            if _token_len(text) < MIN_TOKENS:
-                # On ignore les pages trop courtes
+            # 1) on charge les pages (1 Document par page), depuis le cache si déjà extraites
+            start = time.perf_counter()
+            try:
+                docs_for_file, nb_pages = load_cookbook_pages(path, parser, min_tokens, refresh_cache)
+            except Exception as exc:  # PDF corrompu / chiffré : quarantaine, on continue
+                journal.quarantine(job_id, "cookbooks", path.name, fingerprint, f"{type(exc).__name__}: {exc}")
+                rprint(f"[red]Quarantaine[/red] {path.name} : {exc}")
                 continue
+            extract_s += time.perf_counter() - start
+            instrumentation.increment("ingest.cookbooks.parse_s", time.perf_counter() - start)
+            instrumentation.increment("ingest.cookbooks.pages", nb_pages)
+            kept_for_file = len(docs_for_file)
+            total_pages += nb_pages
+            total_kept += kept_for_file
 
-            page.metadata = page.metadata or {}
-            page.metadata.update(
-                {
-                    "id": path.stem,            # ex: recettes_italien
-                    "filename": path.name,      # ex: recettes_italien.pdf
-                    "source": "cookbook_pdf",
-                    "category": category,       # "noel" / "italien" / "autre"
-                    "book_title": title,
-                    "page": page_idx,
-                    "page_label": page.metadata.get("page_label", str(page_idx)),
-                    "chunk_index": page_idx,    # 1 chunk = 1 page
-                    "total_pages": nb_pages,
-                }
-            )
-            docs_for_file.append(page)
-            kept_for_file += 1
+            # 2) quasi-doublons (même recette dans un autre livre, page répétée) : seule la première copie est écrite
+            unique_docs, report = filter_near_duplicates("cookbooks", docs_for_file, COOKBOOKS_VS)
+            if report and report["duplicates"]:
+                duplicates += report["duplicates"]
+                rprint(f"  {report['duplicates']} quasi-doublons ignorés ({report['rate']:.0%} des pages retenues)")
 
-        total_kept += kept_for_file
-        all_docs.extend(docs_for_file)
+            # 3) écriture par lots, reprise au premier lot non journalisé
+            batches = [unique_docs[i:i + WRITE_BATCH] for i in range(0, len(unique_docs), WRITE_BATCH)]
+            if state["batches_done"]:
+                rprint(f"  reprise au lot {state['batches_done'] + 1}/{len(batches)}")
+            for b in range(state["batches_done"], len(batches)):
+                _write(batches[b])
+                journal.commit_batch(job_id, path.name, b + 1, len(batches))
+                written += len(batches[b])
+            _prune_pages(path, unique_docs, docs_for_file)
+            journal.finish_item(job_id, path.name)
 
-        rprint(
-            f"  → [cyan]{nb_pages} pages[/cyan], "
-            f"[green]{kept_for_file} pages retenues >= {MIN_TOKENS} tokens[/green] "
-            f"pour [bold]{title}[/bold] (catégorie: {category})"
-        )
+            rprint(
+                f"  → [cyan]{nb_pages} pages[/cyan], "
+                f"[green]{kept_for_file} pages retenues >= {min_tokens} tokens[/green] "
+                f"pour [bold]{title}[/bold] (catégorie: {category})"
+            )
+        journal.finish_job(job_id)
+    finally:
+        # même interrompu, les lots déjà écrits sont visibles : invalide le cache de recherche
+        bump_version("cookbooks")
 
+    summary = journal.summary(job_id)
     rprint(
         Panel.fit(
-            f"[cyan]Insertion dans Chroma[/cyan] "
-            f"({len(all_docs)} documents/pages, {total_pages} pages au total, "
-            f"{total_kept} pages gardées après filtre longueur ≥ {MIN_TOKENS})"
+            f"[cyan]Écrit dans Chroma[/cyan] : {written} documents/pages "
+            f"({total_pages} pages lues, {total_kept} gardées après filtre longueur ≥ {min_tokens}, "
+            f"{duplicates} quasi-doublons ({duplicates / max(total_kept, 1):.1%}), "
+            f"extraction {extract_s:.1f} s) — fichiers : "
+            + ", ".join(f"{status} {n}" for status, n in sorted(summary.items()))
         )
     )
-    COOKBOOKS_VS.add_documents(all_docs)
 
     rprint(Panel.fit("[bold green]Ingestion cookbooks terminée ✅[/bold green]"))
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingestion des PDFs de cuisine")
+    parser.add_argument("--parser", choices=PARSERS, default=default_parser())
+    parser.add_argument("--min-tokens", type=int, default=MIN_TOKENS)
+    parser.add_argument("--refresh-cache", action="store_true", help="re-parse même si le texte est en cache")
+    parser.add_argument("--new-job", action="store_true", help="ne pas reprendre le dernier job interrompu")
+    parser.add_argument("--retry-quarantined", action="store_true", help="réessaie les PDFs en quarantaine")
+    args = parser.parse_args()
+    ingest_cookbook_pdfs(args.parser, args.min_tokens, args.refresh_cache, not args.new_job, args.retry_quarantined)
+
+
 if __name__ == "__main__":
-    ingest_cookbook_pdfs()
+    main()
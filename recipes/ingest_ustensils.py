@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 import csv
+import sys
+import time
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from rich import print as rprint
 from rich.panel import Panel
@@ -12,22 +14,40 @@ from rich.table import Table
 
 from langchain_core.documents import Document
 
+from . import instrumentation
 from .config import USTENSILS_VS, BASE_DIR
+from .retrieval_cache import bump_version
+from .vector_backends import delete_documents, ids_where
 
 
 CSV_PATH = BASE_DIR / "files" / "ustensils.csv"
 
 
-def ingest_ustensils() -> None:
+def _prune(filename: str, keep: Optional[set] = None) -> int:
+    """Supprime les ustensiles de `filename` absents de `keep` (tous si None)."""
+    existing = ids_where(USTENSILS_VS, {"filename": filename})
+    stale = [i for i in existing if keep is None or i not in keep]
+    delete_documents(USTENSILS_VS, stale)
+    return len(stale)
+
+
+def remove_ustensils_source(path: Path) -> int:
+    removed = _prune(path.name)
+    bump_version("ustensils")
+    return removed
+
+
+def ingest_ustensils(path: Path = CSV_PATH, prune: bool = False, show_table: Optional[bool] = None) -> int:
     rprint(Panel.fit("[bold cyan]Ingestion du catalogue d'ustensiles → Chroma 'ustensils'[/bold cyan]"))
 
-    if not CSV_PATH.exists():
-        rprint(f"[red]CSV introuvable : {CSV_PATH}[/red]")
-        return
+    if not path.exists():
+        rprint(f"[red]CSV introuvable : {path}[/red]")
+        return 0
 
     docs: List[Document] = []
+    start = time.perf_counter()
 
-    with CSV_PATH.open("r", encoding="utf-8") as f:
+    with path.open("r", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         rows = list(reader)
 
@@ -60,12 +80,16 @@ def ingest_ustensils() -> None:
             "notes": notes,
             "url": url,
             "source": "ustensils",
+            "filename": path.name,  # fichier source (suppressions incrémentales)
         }
 
-        docs.append(Document(page_content=text, metadata=meta))
+        # id stable : relancer l'ingestion met à jour au lieu de dupliquer
+        docs.append(Document(id=uid, page_content=text, metadata=meta))
         table.add_row(str(idx), uid, name, kind)
 
-    rprint(table)
+    instrumentation.increment("ingest.ustensils.parse_s", time.perf_counter() - start)
+    if show_table if show_table is not None else sys.stdout.isatty():
+        rprint(table)
 
     rprint(
         Panel.fit(
@@ -73,9 +97,16 @@ def ingest_ustensils() -> None:
             f"({len(docs)} ustensiles)"
         )
     )
+    start = time.perf_counter()
     USTENSILS_VS.add_documents(docs)
+    instrumentation.increment("ingest.ustensils.write_s", time.perf_counter() - start)
+    instrumentation.increment("ingest.ustensils.docs", len(docs))
+    if prune:
+        rprint(f"[cyan]Suppressions[/cyan] : {_prune(path.name, {d.id for d in docs})} ustensiles absents de {path.name}")
+    bump_version("ustensils")  # invalide le cache de recherche
 
     rprint(Panel.fit("[bold green]Ingestion des ustensiles terminée ✅[/bold green]"))
+    return len(docs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+"""
+recipes/ingredient_index.py
+
+Index inversé des ingrédients pour les requêtes « avec ce qu'il y a dans
+mon frigo » : problème d'inclusion d'ensembles, pas de similarité de texte.
+
+- vocabulaire normalisé (`normalize_ingredient` : quantités, unités,
+  articles, accents, pluriels, synonymes retirés),
+- par recette : bitset (int Python, popcount = `int.bit_count`) ; par
+  ingrédient : liste des recettes qui l'utilisent (posting list),
+- `search` : recettes qui utilisent le plus d'ingrédients disponibles avec
+  au plus `max_missing` ingrédients à acheter, couverture et manquants.
+
+Construit à l'ingestion (ingest_csv.py, ingest_html.py) et persisté en JSON
+(config.INGREDIENT_INDEX_PATH) ; chaque source (metadata `filename`) y
+remplace ses propres entrées (`replace_source`), les autres sont conservées.
+Rechargé si le fichier change.
+
+    python -m recipes.ingredient_index "quinoa, tomates cerises, concombre, feta, œufs, herbes"
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from contextlib import contextmanager
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TypedDict
+
+try:  # verrou inter-process (daemon + ingestion manuelle) ; absent sous Windows
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+_UNITS = {
+    "g", "gr", "kg", "mg", "l", "cl", "ml", "dl", "c", "cs", "cc", "cuillere", "cuilleres",
+    "soupe", "cafe", "tasse", "tasses", "verre", "verres", "pincee", "pincees", "botte",
+    "bottes", "brin", "brins", "gousse", "gousses", "tranche", "tranches", "boite",
+    "boites", "sachet", "sachets", "poignee", "poignees", "filet", "feuille", "feuilles",
+    "morceau", "morceaux", "piece", "pieces", "pot", "pots", "bouquet", "zeste",
+}
+_FILLERS = {
+    "de", "d", "du", "des", "la", "le", "les", "l", "un", "une", "a", "au", "aux", "en",
+    "et", "ou", "frais", "fraiche", "fraiches", "bio", "environ", "quelques", "gros",
+    "grosse", "petit", "petite", "petits", "petites", "hache", "hachee", "haches",
+    "emince", "emincee", "coupe", "coupee", "coupes", "sel", "poivre",
+}
+# formes normalisées → forme canonique (elle-même normalisée)
+SYNONYMS: Dict[str, str] = {
+    "fine herbe": "herbe",
+    "herbe aromatique": "herbe",
+    "patate": "pomme de terre",
+    "tomate cocktail": "tomate cerise",
+}
+
+
+def _strip_accents(text: str) -> str:
+    text = (text or "").replace("œ", "oe").replace("Œ", "oe").replace("æ", "ae")
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def _singular(word: str) -> str:
+    if len(word) > 3 and word.endswith(("s", "x")) and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def _words(text: str) -> List[str]:
+    """Mots normalisés (accents, élisions « d'huile » → « huile », pluriels)."""
+    text = re.sub(r"\(.*?\)", " ", _strip_accents(text).replace("’", "'"))
+    return [_singular(re.sub(r"^[dlj]'", "", w)) for w in re.findall(r"[a-z]+(?:'[a-z]+)?", text)]
+
+
+def normalize_ingredient(raw: str) -> str:
+    """« 200 g de tomates cerises » → « tomate cerise » ; « 2 œufs » → « oeuf »."""
+    words = _words(raw)
+    while words and (words[0] in _UNITS or words[0] in _FILLERS):
+        words.pop(0)
+    while words and words[-1] in _FILLERS:
+        words.pop()
+    name = " ".join(words)
+    return SYNONYMS.get(name, name)
+
+
+class IngredientEntry(TypedDict, total=False):
+    id: str
+    title: str
+    ingredients: List[str]      # lignes brutes (affichage)
+    metadata: Dict[str, Any]
+
+
+class IngredientMatch(TypedDict):
+    id: str
+    title: str
+    used: List[str]
+    missing: List[str]
+    coverage: float             # part des ingrédients de la recette déjà disponibles
+    metadata: Dict[str, Any]
+
+
+class IngredientIndex:
+    def __init__(self, entries: Iterable[IngredientEntry] = ()) -> None:
+        self.vocab: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.entries: List[IngredientEntry] = []
+        self.bits: List[int] = []
+        self.sizes: List[int] = []
+        self.postings: Dict[int, List[int]] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _term_id(self, term: str) -> int:
+        if term not in self.vocab:
+            self.vocab[term] = len(self.terms)
+            self.terms.append(term)
+        return self.vocab[term]
+
+    def add(self, entry: IngredientEntry) -> None:
+        doc = len(self.entries)
+        mask = 0
+        for raw in entry.get("ingredients", []):
+            term = normalize_ingredient(raw)
+            if term:
+                mask |= 1 << self._term_id(term)
+        for t in _bit_positions(mask):
+            self.postings.setdefault(t, []).append(doc)
+        self.entries.append(entry)
+        self.bits.append(mask)
+        self.sizes.append(mask.bit_count())
+
+    # --- requêtes ---
+
+    def parse_query(self, text: str) -> List[str]:
+        """
+        Ingrédients du vocabulaire cités dans une requête libre (« j'ai du
+        quinoa, des tomates cerises et de la feta ») : n-grammes de 3 à 1 mots,
+        le plus long d'abord.
+        """
+        words = _words(text)
+        found: List[str] = []
+        i = 0
+        while i < len(words):
+            for n in (3, 2, 1):
+                if i + n > len(words):
+                    continue
+                term = " ".join(words[i:i + n])
+                term = SYNONYMS.get(term, term)
+                if term in self.vocab:
+                    found.append(term)
+                    i += n
+                    break
+            else:
+                i += 1
+        return list(dict.fromkeys(found))
+
+    def search(self, available: Sequence[str], max_missing: int = 2, k: int = 5) -> List[IngredientMatch]:
+        """
+        Recettes qui utilisent le plus d'ingrédients de `available` avec au
+        plus `max_missing` ingrédients manquants ; tri par nombre utilisé,
+        puis moins de manquants, puis couverture.
+        """
+        query_ids = {self.vocab[t] for t in (normalize_ingredient(a) for a in available) if t in self.vocab}
+        query_mask = 0
+        for t in query_ids:
+            query_mask |= 1 << t
+
+        candidates = {doc for t in query_ids for doc in self.postings.get(t, ())}
+        scored = []
+        for doc in candidates:
+            used = (self.bits[doc] & query_mask).bit_count()
+            missing = self.sizes[doc] - used
+            if missing <= max_missing:
+                scored.append((-used, missing, -used / self.sizes[doc], doc))
+        scored.sort()
+
+        out: List[IngredientMatch] = []
+        for neg_used, missing, neg_cov, doc in scored[:k]:
+            entry = self.entries[doc]
+            out.append({
+                "id": entry.get("id", str(doc)),
+                "title": entry.get("title", ""),
+                "used": [self.terms[t] for t in _bit_positions(self.bits[doc] & query_mask)],
+                "missing": [self.terms[t] for t in _bit_positions(self.bits[doc] & ~query_mask)],
+                "coverage": round(-neg_cov, 3),
+                "metadata": entry.get("metadata", {}),
+            })
+        return out
+
+    # --- persistance ---
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"entries": self.entries}, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IngredientIndex":
+        if not path.exists():
+            return cls()
+        return cls(json.loads(path.read_text(encoding="utf-8")).get("entries", []))
+
+
+_WRITE_LOCK = threading.Lock()
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _WRITE_LOCK, open(path.with_suffix(".lock"), "w") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def replace_source(path: Path, source: str, entries: Iterable[IngredientEntry] = ()) -> IngredientIndex:
+    """
+    Remplace dans l'index persisté les recettes de `source` (metadata
+    `filename`) par `entries` et le réécrit ; les autres sources sont
+    conservées. Sans `entries` : retire la source (fichier supprimé).
+    """
+    entries = list(entries)
+    ids = {e["id"] for e in entries}
+    with _file_lock(path):
+        previous = IngredientIndex.load(path)
+        kept = [
+            e for e in previous.entries
+            if e.get("metadata", {}).get("filename") != source and e.get("id") not in ids
+        ]
+        index = IngredientIndex(kept + entries)
+        index.save(path)
+    return index
+
+
+def _bit_positions(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# --- index partagé du process ---
+
+_INDEX: Optional[IngredientIndex] = None
+_INDEX_MTIME = 0.0
+_INDEX_CHECKED = 0.0
+_INDEX_LOCK = threading.Lock()
+INDEX_REFRESH_S = float(os.getenv("INGREDIENT_INDEX_REFRESH_S", "5"))
+
+
+def index_path() -> Path:
+    from .config import INGREDIENT_INDEX_PATH
+
+    return INGREDIENT_INDEX_PATH
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """Index chargé une fois, rechargé si le fichier a été réécrit par une ingestion."""
+    global _INDEX, _INDEX_MTIME, _INDEX_CHECKED
+    now = time.monotonic()
+    if _INDEX is not None and now - _INDEX_CHECKED < INDEX_REFRESH_S:
+        return _INDEX
+    with _INDEX_LOCK:
+        path = index_path()
+        mtime = path.stat().st_mtime if path.exists() else 0.0
+        if _INDEX is None or mtime != _INDEX_MTIME:
+            _INDEX, _INDEX_MTIME = IngredientIndex.load(path), mtime
+        _INDEX_CHECKED = now
+        return _INDEX
+
+
+def main() -> None:
+    from rich import print as rprint
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Recettes à partir des ingrédients disponibles")
+    parser.add_argument("ingredients", help="liste séparée par des virgules, ou phrase libre")
+    parser.add_argument("--max-missing", type=int, default=2)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    index = get_ingredient_index()
+    available = index.parse_query(args.ingredients)
+    start = time.perf_counter()
+    matches = index.search(available, max_missing=args.max_missing, k=args.k)
+    elapsed_us = (time.perf_counter() - start) * 1e6
+
+    table = Table(title=f"{len(index)} recettes, {len(index.vocab)} ingrédients — {elapsed_us:.0f} µs")
+    for col in ("Recette", "Utilisés", "Manquants", "Couverture"):
+        table.add_column(col)
+    for m in matches:
+        table.add_row(m["title"], ", ".join(m["used"]), ", ".join(m["missing"]) or "–", f"{m['coverage']:.0%}")
+    rprint(f"Ingrédients reconnus : {', '.join(available) or '–'}")
+    rprint(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+recipes/instrumentation.py
+
+Mesures légères collectées pendant l'exécution du graphe :
+- appels LLM par nœud (backend, modèle, latence, validité de la sortie),
+- compteurs génériques (hits de cache, etc.).
+
+Tout est en mémoire, thread-safe, et remis à zéro via `reset()`.
+Le batch runner (`batch.py`) s'en sert pour ses rapports.
+"""
+
+from __future__ import annotations
+
+import statistics
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, TypedDict
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+class LLMCallRecord(TypedDict, total=False):
+    node: str
+    backend: str           # "ollama", "heuristic", ...
+    model: str
+    latency_s: float
+    queue_wait_s: float    # attente dans la file de llm_scheduler (0 si désactivé)
+    output_chars: int
+    valid: Optional[bool]  # sortie dans l'ensemble attendu (routage / grading)
+    decision: Optional[str]
+    # compteurs renvoyés par Ollama (absents pour les heuristiques)
+    prompt_tokens: int     # tokens de prompt réellement évalués (hors cache KV)
+    prompt_eval_s: float
+    eval_tokens: int
+    eval_s: float
+    load_s: float
+
+
+_LOCK = threading.Lock()
+_CALLS: List[LLMCallRecord] = []
+_COUNTERS: Dict[str, float] = defaultdict(float)
+
+
+class OllamaStatsHandler(BaseCallbackHandler):
+    """Callback qui récupère les compteurs Ollama (prompt_eval_*, eval_*) d'une génération."""
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, Any] = {}
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for gen in generations:
+                info = gen.generation_info or {}
+                if "prompt_eval_count" not in info and "eval_count" not in info:
+                    continue
+                self.stats = {
+                    "prompt_tokens": int(info.get("prompt_eval_count") or 0),
+                    "prompt_eval_s": (info.get("prompt_eval_duration") or 0) / 1e9,
+                    "eval_tokens": int(info.get("eval_count") or 0),
+                    "eval_s": (info.get("eval_duration") or 0) / 1e9,
+                    "load_s": (info.get("load_duration") or 0) / 1e9,
+                }
+
+
+def record_llm_call(record: LLMCallRecord) -> None:
+    with _LOCK:
+        _CALLS.append(record)
+
+
+def annotate_last_call(node: str, **fields: Any) -> None:
+    """Complète le dernier appel du nœud (ex: décision parsée, validité)."""
+    with _LOCK:
+        for record in reversed(_CALLS):
+            if record.get("node") == node:
+                record.update(fields)  # type: ignore[typeddict-item]
+                return
+
+
+def increment(name: str, value: float = 1.0) -> None:
+    with _LOCK:
+        _COUNTERS[name] += value
+
+
+def llm_calls() -> List[LLMCallRecord]:
+    with _LOCK:
+        return [dict(r) for r in _CALLS]  # type: ignore[misc]
+
+
+def counters() -> Dict[str, float]:
+    with _LOCK:
+        return dict(_COUNTERS)
+
+
+def reset() -> None:
+    with _LOCK:
+        _CALLS.clear()
+        _COUNTERS.clear()
+
+
+def cache_hit_rates(
+    counters_: Optional[Dict[str, float]] = None, prefix: str = "retrieval_cache"
+) -> Dict[str, Dict[str, float]]:
+    """Hits / misses / taux de hit par collection à partir des compteurs `<prefix>.<collection>.hit|miss`."""
+    counters_ = counters() if counters_ is None else counters_
+    out: Dict[str, Dict[str, float]] = {}
+    for name, value in counters_.items():
+        if not name.startswith(prefix + "."):
+            continue
+        collection, _, kind = name[len(prefix) + 1:].rpartition(".")
+        stats = out.setdefault(collection, {"hit": 0.0, "miss": 0.0})
+        stats[kind] = stats.get(kind, 0.0) + value
+    for stats in out.values():
+        total = stats["hit"] + stats["miss"]
+        stats["hit_rate"] = stats["hit"] / total if total else 0.0
+    return out
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize_llm_calls(
+    calls: Optional[List[LLMCallRecord]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Agrège les appels par nœud : nb, latences p50/p95/moyenne, taux de sorties
+    valides, tokens de prompt évalués et temps de prompt-eval moyens.
+    """
+    calls = llm_calls() if calls is None else calls
+    by_node: Dict[str, List[LLMCallRecord]] = defaultdict(list)
+    for c in calls:
+        by_node[c.get("node", "?")].append(c)
+
+    summary: Dict[str, Dict[str, Any]] = {}
+    for node, items in by_node.items():
+        latencies = [c.get("latency_s", 0.0) for c in items]
+        judged = [c["valid"] for c in items if c.get("valid") is not None]
+        evaluated = [c for c in items if "prompt_tokens" in c]
+        summary[node] = {
+            "backend": items[-1].get("backend", ""),
+            "model": items[-1].get("model", ""),
+            "calls": len(items),
+            "p50_s": percentile(latencies, 0.5),
+            "p95_s": percentile(latencies, 0.95),
+            "mean_s": statistics.fmean(latencies) if latencies else 0.0,
+            "queue_wait_mean_s": statistics.fmean(c.get("queue_wait_s", 0.0) for c in items),
+            "valid_rate": (sum(judged) / len(judged)) if judged else None,
+            "prompt_tokens": (
+                statistics.fmean(c["prompt_tokens"] for c in evaluated) if evaluated else None
+            ),
+            "prompt_eval_ms": (
+                statistics.fmean(c["prompt_eval_s"] for c in evaluated) * 1000 if evaluated else None
+            ),
+        }
+    return summary
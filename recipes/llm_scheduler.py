@@ -0,0 +1,179 @@
+"""
+recipes/llm_scheduler.py
+
+Ordonnanceur des appels LLM partagé par toutes les sessions du processus
+(Streamlit, batch runner, workers) :
+
+- file d'attente bornée (backpressure) : au-delà de LLM_QUEUE_MAX requêtes en
+  attente, `submit` bloque jusqu'à LLM_QUEUE_TIMEOUT puis lève SchedulerOverloaded,
+- LLM_SCHEDULER_SLOTS workers = slots parallèles d'Ollama (OLLAMA_NUM_PARALLEL) :
+  les requêtes concurrentes remplissent les slots au lieu d'être sérialisées
+  au hasard par le serveur,
+- priorité : nœuds courts / interactifs (tier "small" : routage, grading…)
+  avant les générations longues, FIFO à priorité égale,
+- métriques : temps d'attente en file, débit, profondeur max, rejets.
+
+Activé par LLM_SCHEDULER=1 (voir nodes._llm_chat). Tourne dans un thread
+dédié avec sa propre boucle asyncio, appelable depuis du code synchrone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import Runnable
+
+from . import instrumentation
+from .config import NODE_MODEL_TIERS
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+
+class SchedulerOverloaded(RuntimeError):
+    """File d'attente pleine au-delà du délai autorisé (backpressure)."""
+
+
+def node_priority(node: Optional[str]) -> int:
+    """Nœuds du tier "small" (réponses courtes) passent devant les générations longues."""
+    return PRIORITY_INTERACTIVE if NODE_MODEL_TIERS.get(node or "") == "small" else PRIORITY_BULK
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        slots: int = 4,
+        max_queue: int = 64,
+        queue_timeout_s: float = 30.0,
+    ) -> None:
+        self.slots = slots
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._completed = 0
+        self._rejected = 0
+        self._max_depth = 0
+        self._waits: deque = deque(maxlen=10_000)
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="llm-scheduler", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        return cls(
+            slots=int(os.getenv("LLM_SCHEDULER_SLOTS") or os.getenv("OLLAMA_NUM_PARALLEL") or 4),
+            max_queue=int(os.getenv("LLM_QUEUE_MAX", "64")),
+            queue_timeout_s=float(os.getenv("LLM_QUEUE_TIMEOUT", "30")),
+        )
+
+    # --- boucle dédiée ---
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=self.max_queue)
+        for _ in range(self.slots):
+            self._loop.create_task(self._worker())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, enqueued, llm, messages, config, future = await self._queue.get()
+            wait = time.perf_counter() - enqueued
+            try:
+                result = await llm.ainvoke(messages, config=config)
+            except Exception as exc:  # remonté à l'appelant
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result((result, wait))
+            finally:
+                self._queue.task_done()
+                with self._lock:
+                    self._completed += 1
+                    self._waits.append(wait)
+
+    async def _enqueue(
+        self, priority: int, llm: Runnable, messages: List[Any], config: Optional[Dict[str, Any]]
+    ) -> Tuple[Any, float]:
+        future: asyncio.Future = self._loop.create_future()
+        item = (priority, next(self._seq), time.perf_counter(), llm, messages, config, future)
+        try:
+            await asyncio.wait_for(self._queue.put(item), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._rejected += 1
+            instrumentation.increment("scheduler.rejected")
+            raise SchedulerOverloaded(
+                f"File LLM pleine ({self.max_queue} requêtes) depuis {self.queue_timeout_s}s"
+            )
+        with self._lock:
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return await future
+
+    # --- API ---
+
+    def submit(
+        self,
+        llm: Runnable,
+        messages: List[Any],
+        node: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Any, float]:
+        """
+        Exécute `llm.invoke(messages)` via la file (appel bloquant).
+        Retourne (réponse, temps d'attente en file en secondes).
+        """
+        coro = self._enqueue(node_priority(node), llm, messages, config)
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            elapsed = time.perf_counter() - self._started
+            return {
+                "slots": self.slots,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "max_queue_depth": self._max_depth,
+                "queue_depth": self._queue.qsize(),
+                "throughput_rps": self._completed / elapsed if elapsed > 0 else 0.0,
+                "wait_p50_s": waits[len(waits) // 2] if waits else 0.0,
+                "wait_p95_s": waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._started = time.perf_counter()
+            self._completed = self._rejected = self._max_depth = 0
+            self._waits.clear()
+
+
+_SCHEDULER: Optional[LLMScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def scheduler_enabled() -> bool:
+    return os.getenv("LLM_SCHEDULER", "0") == "1"
+
+
+def get_scheduler() -> LLMScheduler:
+    """Ordonnanceur unique du processus (créé au premier appel)."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = LLMScheduler.from_env()
+        return _SCHEDULER
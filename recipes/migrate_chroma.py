@@ -0,0 +1,163 @@
+"""
+recipes/migrate_chroma.py
+
+Migre les anciens stores Chroma (un persist_directory par collection :
+data/chroma/recipes, data/chroma/cookbooks, data/chroma/ustensils) vers le
+store partagé (config.get_chroma_client, data/chroma/store par défaut).
+
+- recopie ids, documents, métadonnées ET embeddings (pas de ré-embedding),
+- crée les collections avec l'index HNSW de config.HNSW_CONFIGS,
+- renomme la collection historique "pdfs" en "recipes",
+- idempotent (upsert) ; --delete-legacy supprime les anciens dossiers
+  une fois les comptes vérifiés.
+
+--reindex reconstruit les collections du store partagé quand un paramètre
+HNSW fixé à la création (space, max_neighbors, ef_construction) a changé.
+
+    python -m recipes.migrate_chroma --dry-run
+    python -m recipes.migrate_chroma
+    python -m recipes.migrate_chroma --delete-legacy
+    python -m recipes.migrate_chroma --reindex
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+from typing import Any, Dict, List
+
+import chromadb
+from chromadb.config import Settings
+from rich import print as rprint
+from rich.panel import Panel
+from rich.table import Table
+
+from .config import CHROMA_DIR, COLLECTIONS, LEGACY_STORES, get_chroma_client, get_hnsw_config
+from .retrieval_cache import bump_version
+
+
+def _copy(src: Any, dst: Any, batch_size: int) -> None:
+    """Recopie ids / embeddings / documents / métadonnées par lots."""
+    batch_size = min(batch_size, get_chroma_client().get_max_batch_size())
+    for offset in range(0, src.count(), batch_size):
+        page = src.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        dst.upsert(
+            ids=page["ids"],
+            embeddings=page["embeddings"],
+            documents=page["documents"],
+            metadatas=page["metadatas"],
+        )
+
+
+def migrate_collection(key: str, batch_size: int = 5000, dry_run: bool = False) -> Dict[str, Any]:
+    """Copie une collection historique vers le store partagé. Retourne les comptes."""
+    folder, legacy_name = LEGACY_STORES[key]
+    legacy_path = CHROMA_DIR / folder
+    report: Dict[str, Any] = {
+        "key": key, "source": f"{folder}/{legacy_name}", "target": COLLECTIONS[key],
+        "source_count": 0, "target_count": 0, "status": "absent",
+    }
+    if not (legacy_path / "chroma.sqlite3").exists():
+        return report
+
+    legacy = chromadb.PersistentClient(path=str(legacy_path), settings=Settings(anonymized_telemetry=False))
+    names = {c.name for c in legacy.list_collections()}
+    if legacy_name not in names:
+        report["status"] = "collection absente"
+        return report
+
+    src = legacy.get_collection(legacy_name)
+    report["source_count"] = src.count()
+    if dry_run:
+        report["status"] = "dry-run"
+        return report
+
+    dst = get_chroma_client().get_or_create_collection(
+        COLLECTIONS[key], configuration={"hnsw": get_hnsw_config(key)}  # type: ignore[typeddict-item]
+    )
+    _copy(src, dst, batch_size)
+
+    report["target_count"] = dst.count()
+    report["status"] = "ok" if report["target_count"] >= report["source_count"] else "incomplet"
+    return report
+
+
+def reindex_collection(key: str, batch_size: int = 5000) -> Dict[str, Any]:
+    """Reconstruit une collection du store partagé avec sa config HNSW courante."""
+    client = get_chroma_client()
+    name = COLLECTIONS[key]
+    report: Dict[str, Any] = {
+        "key": key, "source": name, "target": name,
+        "source_count": 0, "target_count": 0, "status": "absent",
+    }
+    if name not in {c.name for c in client.list_collections()}:
+        return report
+
+    src = client.get_collection(name)
+    report["source_count"] = src.count()
+    tmp = client.create_collection(
+        f"{name}__reindex", configuration={"hnsw": get_hnsw_config(key)}  # type: ignore[typeddict-item]
+    )
+    _copy(src, tmp, batch_size)
+    if tmp.count() < report["source_count"]:
+        client.delete_collection(tmp.name)
+        report["status"] = "incomplet"
+        return report
+
+    client.delete_collection(name)
+    tmp.modify(name=name)
+    report["target_count"] = tmp.count()
+    report["status"] = "réindexé"
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migration des stores Chroma vers le client partagé")
+    # gros lots : l'index HNSW n'est persisté qu'au-delà de hnsw:sync_threshold,
+    # un reliquat resterait dans le WAL et serait rejoué à chaque démarrage
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="compte sans rien écrire")
+    parser.add_argument(
+        "--delete-legacy", action="store_true",
+        help="supprime les anciens dossiers migrés avec succès",
+    )
+    parser.add_argument(
+        "--reindex", action="store_true",
+        help="reconstruit les collections du store partagé avec HNSW_CONFIGS",
+    )
+    args = parser.parse_args()
+
+    if args.reindex:
+        rprint(Panel.fit("[bold cyan]Reconstruction des index HNSW[/bold cyan]"))
+        reports: List[Dict[str, Any]] = [reindex_collection(key, args.batch_size) for key in COLLECTIONS]
+    else:
+        rprint(Panel.fit("[bold cyan]Migration Chroma → store partagé[/bold cyan]"))
+        reports = [migrate_collection(key, args.batch_size, args.dry_run) for key in LEGACY_STORES]
+
+    if not args.dry_run:
+        # nouveau contenu / nouvel index : résultats de recherche en cache périmés
+        bump_version(*[r["key"] for r in reports if r["status"] in ("ok", "réindexé")])
+
+    table = Table(title="Collections", show_lines=True)
+    for col in ("Source", "Cible", "Docs source", "Docs cible", "Statut"):
+        table.add_column(col)
+    for r in reports:
+        table.add_row(r["source"], r["target"], str(r["source_count"]), str(r["target_count"]), r["status"])
+    rprint(table)
+
+    if args.delete_legacy and not (args.dry_run or args.reindex):
+        for r in reports:
+            if r["status"] == "ok":
+                folder, _ = LEGACY_STORES[r["key"]]
+                shutil.rmtree(CHROMA_DIR / folder)
+                rprint(f"[yellow]Supprimé[/yellow] {CHROMA_DIR / folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+recipes/multivector.py
+
+Représentation multi-vecteur des recettes : un vecteur par champ (titre,
+ingrédients, préparation) dans la collection `recipe_fields`, chacun relié
+à la recette par `parent_id`. Une requête "frigo" (« quinoa, feta,
+concombre ») n'est plus diluée par la prose des instructions.
+
+À la requête :
+- type de requête (`recipe_query_type`) : ingredients | technique | dish,
+- un seul appel au vector store (k × FIELD_FETCH × nb de champs), résultats
+  répartis par champ → rang de chaque recette dans chaque champ,
+- fusion pondérée des rangs (RRF) selon FIELD_WEIGHTS[type],
+- regroupement par recette : un seul document par parent_id, contenu
+  complet de la recette (métadonnée `parent_content`).
+
+Backend-agnostique (VectorBackend : similarity_search seulement). Si la
+collection est vide (recettes pas encore ré-ingérées), on retombe sur la
+collection `recipes` mono-vecteur.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Dict, List, Mapping, Optional
+
+from langchain_core.documents import Document
+
+from .diversity import diverse_search
+from .heuristics import normalize
+from .vector_backends import VectorBackend
+
+
+RECIPE_FIELDS = ("title", "ingredients", "instructions")
+
+# Poids des champs par type de requête (fusion des rangs).
+FIELD_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "ingredients": {"title": 0.5, "ingredients": 2.0, "instructions": 0.25},
+    "technique": {"title": 0.5, "ingredients": 0.5, "instructions": 2.0},
+    "dish": {"title": 2.0, "ingredients": 1.0, "instructions": 0.5},
+}
+
+# Candidats lus par champ = k × FIELD_FETCH ; RRF_K amortit l'écart entre rangs.
+FIELD_FETCH = int(os.getenv("MULTIVECTOR_FETCH", "4"))
+RRF_K = 10
+
+_FRIDGE_WORDS = ("frigo", "placard", "reste", "restes", "j'ai", "il me reste", "avec ce que", "a utiliser")
+_TECHNIQUE_WORDS = (
+    "comment", "etape", "etapes", "technique", "cuire", "cuisson", "preparer",
+    "preparation", "mariner", "blanchir", "saisir", "four", "combien de temps",
+)
+
+
+def multivector_enabled() -> bool:
+    return os.getenv("MULTIVECTOR_RECIPES", "1") == "1"
+
+
+def recipe_query_type(query: str) -> str:
+    """
+    ingredients : liste d'ingrédients / « ce que j'ai dans le frigo »,
+    technique   : question de préparation / cuisson,
+    dish        : nom de plat ou envie (défaut).
+    """
+    q = normalize(query)
+    if any(w in q for w in _FRIDGE_WORDS):
+        return "ingredients"
+    if any(w in q for w in _TECHNIQUE_WORDS):
+        return "technique"
+    items = [i for i in re.split(r"[,;\n]| et ", q) if i.strip()]
+    if len(items) >= 3 and all(len(i.split()) <= 3 for i in items):
+        return "ingredients"
+    return "dish"
+
+
+def field_documents(
+    parent_id: str,
+    fields: Mapping[str, str],
+    metadata: Mapping[str, Any],
+    parent_content: str,
+) -> List[Document]:
+    """
+    Documents de la collection `recipe_fields` pour une recette : un par champ
+    non vide, id stable `<parent_id>::<champ>` (ré-ingestion = upsert).
+    """
+    docs: List[Document] = []
+    for field in RECIPE_FIELDS:
+        text = (fields.get(field) or "").strip()
+        if not text:
+            continue
+        docs.append(
+            Document(
+                id=f"{parent_id}::{field}",
+                page_content=text,
+                metadata={**metadata, "parent_id": parent_id, "field": field, "parent_content": parent_content},
+            )
+        )
+    return docs
+
+
+def collapse(docs: List[Document], weights: Mapping[str, float], k: int) -> List[Document]:
+    """
+    Fusion pondérée des rangs par champ puis regroupement par recette :
+    score(recette) = Σ_champ poids[champ] / (RRF_K + rang dans le champ).
+    """
+    ranks: Dict[str, int] = {}
+    scores: Dict[str, float] = {}
+    matched: Dict[str, List[str]] = {}
+    parents: Dict[str, Document] = {}
+    for d in docs:
+        field = d.metadata.get("field", "")
+        parent_id = d.metadata.get("parent_id") or d.id or d.page_content[:50]
+        rank = ranks.get(field, 0)
+        ranks[field] = rank + 1
+        scores[parent_id] = scores.get(parent_id, 0.0) + weights.get(field, 0.0) / (RRF_K + rank)
+        matched.setdefault(parent_id, []).append(field)
+        parents.setdefault(parent_id, d)
+
+    out: List[Document] = []
+    for parent_id in sorted(scores, key=scores.__getitem__, reverse=True)[:k]:
+        first = parents[parent_id]
+        meta = {key: v for key, v in first.metadata.items() if key not in ("field", "parent_content")}
+        meta.update(id=meta.get("id", parent_id), matched_fields=",".join(matched[parent_id]),
+                    multivector_score=round(scores[parent_id], 4))
+        out.append(
+            Document(id=parent_id, page_content=first.metadata.get("parent_content") or first.page_content, metadata=meta)
+        )
+    return out
+
+
+def search_recipes(
+    query: str,
+    k: int = 5,
+    fields_vs: Optional[VectorBackend] = None,
+    recipes_vs: Optional[VectorBackend] = None,
+    query_type: Optional[str] = None,
+) -> List[Document]:
+    """Top-k recettes uniques (multi-vecteur), sinon recherche mono-vecteur sur `recipes`."""
+    if fields_vs is None or recipes_vs is None:
+        from .config import RECIPE_FIELDS_VS, RECIPES_VS
+
+        # `is None` : NumpyExactIndex définit __len__, une collection vide serait falsy
+        fields_vs = RECIPE_FIELDS_VS if fields_vs is None else fields_vs
+        recipes_vs = RECIPES_VS if recipes_vs is None else recipes_vs
+
+    if multivector_enabled():
+        hits = fields_vs.similarity_search(query, k=k * FIELD_FETCH * len(RECIPE_FIELDS))
+        if hits:
+            return collapse(hits, FIELD_WEIGHTS[query_type or recipe_query_type(query)], k)
+    # mono-vecteur : les recettes ré-ingérées en double sont regroupées (diversity.py)
+    return diverse_search(recipes_vs, query, k=k)
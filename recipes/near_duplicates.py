@@ -0,0 +1,432 @@
+"""
+recipes/near_duplicates.py
+
+Quasi-doublons à l'ingestion (MinHash + LSH) : la même recette revient dans
+plusieurs livres PDF ou sources avec une mise en page un peu différente.
+Ces copies gonflent les collections et prennent la place de recettes
+différentes dans le top-k (diversity.py ne regroupe qu'à la requête, et
+seulement les doublons exacts).
+
+- signature : NEAR_DUP_PERM (128) minima de permutations des trigrammes de
+  mots du texte normalisé (casse, accents, ponctuation, comme content_hash),
+- LSH : NEAR_DUP_BANDS (32) bandes de 4 valeurs ; deux documents qui
+  partagent une bande sont candidats (rappel ≈ 1 dès 0.6 de similarité),
+  doublons si la similarité de Jaccard estimée ≥ NEAR_DUP_THRESHOLD (0.7).
+  Sur une recette de 40 mots : 2 mots changés ou une césure ≈ 0.7, un
+  en-tête de page ajouté ≈ 0.9, 4 ingrédients remplacés ≈ 0.5,
+- index persistant et incrémental (data/near_dup.sqlite) : seuls les
+  documents canoniques sont indexés par bande, une ingestion ne lit que les
+  buckets de ses propres documents,
+- le premier document vu d'un groupe reste canonique ; les suivants ne sont
+  pas écrits, leurs ids vont dans la métadonnée `aliases` du canonique
+  (mise à jour dans la collection s'il y était déjà),
+- source oubliée (fichier supprimé, document disparu) : pour chaque
+  canonique oublié, un de ses alias restants devient canonique et sa
+  source est notée « à ré-ingérer » (table stale_sources) ; ingest_daemon
+  remet ces fichiers en file, toute ingestion de la source efface la note,
+- rapport par ingestion : documents vus, doublons, taux ; compteur
+  instrumentation `near_dup.<collection>.duplicates`.
+
+NEAR_DUP=0 désactive la détection.
+
+    python -m recipes.near_duplicates            # taux de doublons par collection, plus gros groupes
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, TypedDict
+
+import numpy as np
+from langchain_core.documents import Document
+
+from . import instrumentation
+from .diversity import normalized_words
+
+
+NUM_PERM = int(os.getenv("NEAR_DUP_PERM", "128"))
+BANDS = int(os.getenv("NEAR_DUP_BANDS", "32"))
+SHINGLE = 3  # mots par n-gramme
+_SEED = 1
+# nombre premier 2**32 - 5 : a·h + b (a, b, h < 2**32) tient dans un uint64
+_PRIME = 4294967291
+
+
+def enabled() -> bool:
+    return os.getenv("NEAR_DUP", "1") == "1"
+
+
+def threshold() -> float:
+    return float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))
+
+
+class DedupReport(TypedDict):
+    collection: str
+    seen: int
+    duplicates: int
+    rate: float
+    seconds: float
+
+
+class ForgetReport(TypedDict):
+    forgotten: int
+    promoted: Dict[str, str]    # alias devenu canonique → sa source (à ré-ingérer, il n'est pas dans le store)
+
+
+# --- signatures ---
+
+_PERMS: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+
+def _perms() -> Tuple[np.ndarray, np.ndarray]:
+    global _PERMS
+    if _PERMS is None:
+        # RandomState : flux stable entre versions de numpy (signatures persistées)
+        rng = np.random.RandomState(_SEED)
+        a = rng.randint(1, _PRIME, size=NUM_PERM, dtype=np.uint64)
+        b = rng.randint(0, _PRIME, size=NUM_PERM, dtype=np.uint64)
+        _PERMS = (a, b)
+    return _PERMS
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    """Empreintes 32 bits (crc32) des n-grammes de mots, sans répétition."""
+    words = normalized_words(text)
+    grams = [" ".join(words[i:i + SHINGLE]) for i in range(max(len(words) - SHINGLE + 1, 1 if words else 0))]
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams)))
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """Signature MinHash (NUM_PERM × uint32) ; None pour un texte sans mots."""
+    hashes = shingle_hashes(text)
+    if not len(hashes):
+        return None
+    a, b = _perms()
+    return ((a[:, None] * hashes[None, :] + b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_keys(sig: np.ndarray) -> List[int]:
+    rows = NUM_PERM // BANDS
+    return [
+        int.from_bytes(
+            hashlib.blake2b(bytes([band]) + sig[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+            "big",
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Similarité de Jaccard estimée : part des minima égaux."""
+    return float(np.mean(a == b))
+
+
+# --- index ---
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS params (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS docs (
+    collection TEXT NOT NULL, doc_id TEXT NOT NULL, source TEXT NOT NULL,
+    canonical TEXT, similarity REAL, sig BLOB NOT NULL,
+    PRIMARY KEY (collection, doc_id)
+);
+CREATE INDEX IF NOT EXISTS docs_canonical ON docs (collection, canonical);
+CREATE INDEX IF NOT EXISTS docs_source ON docs (collection, source);
+CREATE TABLE IF NOT EXISTS bands (
+    collection TEXT NOT NULL, bucket INTEGER NOT NULL, doc_id TEXT NOT NULL,
+    PRIMARY KEY (collection, bucket, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bands_doc ON bands (collection, doc_id);
+CREATE TABLE IF NOT EXISTS stale_sources (
+    collection TEXT NOT NULL, source TEXT NOT NULL,
+    PRIMARY KEY (collection, source)
+);
+"""
+
+
+def _placeholders(n: int) -> str:
+    return ",".join("?" * n)
+
+
+class NearDuplicateIndex:
+    def __init__(self, path: Path, min_similarity: Optional[float] = None) -> None:
+        self.path = path
+        self.min_similarity = threshold() if min_similarity is None else min_similarity
+        self._local = threading.local()
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            params = {"perm": str(NUM_PERM), "bands": str(BANDS), "shingle": str(SHINGLE), "seed": str(_SEED)}
+            stored = dict(conn.execute("SELECT key, value FROM params"))
+            if stored != params:
+                # signatures incomparables : on repart d'un index vide
+                with conn:
+                    conn.execute("DELETE FROM docs")
+                    conn.execute("DELETE FROM bands")
+                    conn.execute("DELETE FROM stale_sources")
+                    conn.execute("DELETE FROM params")
+                    conn.executemany("INSERT INTO params (key, value) VALUES (?, ?)", params.items())
+            self._local.conn = conn
+        return conn
+
+    def _drop(self, db: sqlite3.Connection, collection: str, ids: Sequence[str]) -> None:
+        for i in range(0, len(ids), 500):
+            part = list(ids[i:i + 500])
+            db.execute(f"DELETE FROM bands WHERE collection = ? AND doc_id IN ({_placeholders(len(part))})", [collection, *part])
+            db.execute(f"DELETE FROM docs WHERE collection = ? AND doc_id IN ({_placeholders(len(part))})", [collection, *part])
+
+    def _assign(self, collection: str, doc_id: str, source: str, sig: np.ndarray) -> Optional[Tuple[str, float]]:
+        """Enregistre `doc_id` ; (canonique, similarité) si c'est un quasi-doublon, sinon None."""
+        db = self._db()
+        self._drop(db, collection, [doc_id])
+        keys = band_keys(sig)
+        # pas de DISTINCT / ORDER BY : le planificateur préférerait l'index bands_doc
+        candidates = list({
+            r[0]
+            for r in db.execute(
+                f"SELECT doc_id FROM bands WHERE collection = ? AND bucket IN ({_placeholders(len(keys))})",
+                [collection, *keys],
+            )
+        })
+        best: Optional[Tuple[str, float]] = None
+        if candidates:
+            rows = db.execute(
+                f"SELECT doc_id, sig FROM docs WHERE collection = ? AND doc_id IN ({_placeholders(len(candidates))})",
+                [collection, *candidates],
+            )
+            for cand, blob in rows:
+                sim = similarity(sig, np.frombuffer(blob, dtype=np.uint32))
+                if sim >= self.min_similarity and (best is None or sim > best[1]):
+                    best = (cand, sim)
+        if best is not None:
+            db.execute(
+                "INSERT INTO docs (collection, doc_id, source, canonical, similarity, sig) VALUES (?, ?, ?, ?, ?, ?)",
+                (collection, doc_id, source, best[0], best[1], sig.tobytes()),
+            )
+            # ancien canonique devenu doublon : ses alias suivent
+            db.execute(
+                "UPDATE docs SET canonical = ? WHERE collection = ? AND canonical = ?", (best[0], collection, doc_id)
+            )
+            return best
+        db.execute(
+            "INSERT INTO docs (collection, doc_id, source, canonical, similarity, sig) VALUES (?, ?, ?, NULL, NULL, ?)",
+            (collection, doc_id, source, sig.tobytes()),
+        )
+        db.executemany(
+            "INSERT INTO bands (collection, bucket, doc_id) VALUES (?, ?, ?)", [(collection, k, doc_id) for k in keys]
+        )
+        return None
+
+    def aliases(self, collection: str, doc_id: str) -> List[str]:
+        rows = self._db().execute("SELECT doc_id FROM docs WHERE collection = ? AND canonical = ?", (collection, doc_id))
+        return sorted(r[0] for r in rows)
+
+    def filter(
+        self, collection: str, docs: Sequence[Document], store: Any = None
+    ) -> Tuple[List[Document], DedupReport]:
+        """
+        Documents à écrire (canoniques + documents sans signature) et rapport.
+        Les canoniques portent `aliases` (ids séparés par des virgules) ; ceux
+        déjà présents dans `store` sont mis à jour sur place.
+        """
+        start = time.perf_counter()
+        kept: List[Document] = []
+        canonicals: Set[str] = set()
+        db = self._db()
+        with db:  # une transaction par appel
+            # source (ré-)ingérée : plus à remettre en file
+            sources = {str((d.metadata or {}).get("filename", "")) for d in docs}
+            db.executemany(
+                "DELETE FROM stale_sources WHERE collection = ? AND source = ?", [(collection, s) for s in sources]
+            )
+            for doc in docs:
+                sig = signature(doc.page_content) if doc.id else None
+                if sig is None:
+                    kept.append(doc)
+                    continue
+                hit = self._assign(collection, str(doc.id), str((doc.metadata or {}).get("filename", "")), sig)
+                if hit is None:
+                    kept.append(doc)
+                else:
+                    canonicals.add(hit[0])
+            kept_ids = {d.id for d in kept}
+            for doc in kept:
+                aliases = self.aliases(collection, str(doc.id)) if doc.id else []
+                if aliases:
+                    doc.metadata = {**(doc.metadata or {}), "aliases": ",".join(aliases)}
+            outside = {c: {"aliases": ",".join(self.aliases(collection, c))} for c in canonicals - kept_ids}
+        if outside and store is not None:
+            from .vector_backends import update_metadata
+
+            update_metadata(store, outside)
+
+        duplicates = len(docs) - len(kept)
+        if duplicates:
+            instrumentation.increment(f"near_dup.{collection}.duplicates", duplicates)
+        return kept, {
+            "collection": collection,
+            "seen": len(docs),
+            "duplicates": duplicates,
+            "rate": duplicates / len(docs) if docs else 0.0,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def forget_source(self, collection: str, source: str, keep: Optional[Set[str]] = None) -> ForgetReport:
+        """
+        Oublie les documents de `source` absents de `keep` (tous si None).
+        Leurs alias restants (autres fichiers, jamais écrits dans le store)
+        ne doivent pas disparaître avec eux : pour chaque canonique oublié, le
+        premier alias devient canonique, les autres le suivent s'ils lui
+        ressemblent assez (sinon deviennent canoniques aussi). Les sources
+        des alias promus sont notées dans stale_sources.
+        """
+        db = self._db()
+        promoted: Dict[str, str] = {}
+        with db:
+            ids = [
+                r[0]
+                for r in db.execute("SELECT doc_id FROM docs WHERE collection = ? AND source = ?", (collection, source))
+                if keep is None or r[0] not in keep
+            ]
+            forgotten = set(ids)
+            groups: Dict[str, List[Tuple[str, str, np.ndarray]]] = {}
+            for i in range(0, len(ids), 500):
+                part = ids[i:i + 500]
+                rows = db.execute(
+                    f"SELECT doc_id, source, canonical, sig FROM docs WHERE collection = ? "
+                    f"AND canonical IN ({_placeholders(len(part))})",
+                    [collection, *part],
+                )
+                for doc_id, alias_source, canonical, blob in rows:
+                    if doc_id not in forgotten:
+                        groups.setdefault(canonical, []).append((doc_id, alias_source, np.frombuffer(blob, dtype=np.uint32)))
+            self._drop(db, collection, ids)
+            for aliases in groups.values():
+                aliases.sort(key=lambda a: a[0])
+                heads: List[Tuple[str, np.ndarray]] = []
+                for doc_id, alias_source, sig in aliases:
+                    best = max(((h, similarity(sig, hsig)) for h, hsig in heads), key=lambda x: x[1], default=None)
+                    if best is not None and best[1] >= self.min_similarity:
+                        db.execute(
+                            "UPDATE docs SET canonical = ?, similarity = ? WHERE collection = ? AND doc_id = ?",
+                            (best[0], best[1], collection, doc_id),
+                        )
+                        continue
+                    db.execute(
+                        "UPDATE docs SET canonical = NULL, similarity = NULL WHERE collection = ? AND doc_id = ?",
+                        (collection, doc_id),
+                    )
+                    db.executemany(
+                        "INSERT OR IGNORE INTO bands (collection, bucket, doc_id) VALUES (?, ?, ?)",
+                        [(collection, k, doc_id) for k in band_keys(sig)],
+                    )
+                    heads.append((doc_id, sig))
+                    promoted[doc_id] = alias_source
+            db.executemany(
+                "INSERT OR IGNORE INTO stale_sources (collection, source) VALUES (?, ?)",
+                [(collection, s) for s in set(promoted.values())],
+            )
+        return {"forgotten": len(ids), "promoted": promoted}
+
+    def stale_sources(self, collection: Optional[str] = None) -> List[Tuple[str, str]]:
+        """(collection, source) dont un document est devenu canonique sans être dans le store."""
+        rows = self._db().execute(
+            "SELECT collection, source FROM stale_sources WHERE ? IS NULL OR collection = ?", (collection, collection)
+        )
+        return sorted(rows)
+
+    # --- rapports ---
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        rows = self._db().execute(
+            "SELECT collection, COUNT(*), COUNT(canonical) FROM docs GROUP BY collection ORDER BY collection"
+        )
+        return {c: {"docs": n, "duplicates": d, "rate": d / n if n else 0.0} for c, n, d in rows}
+
+    def clusters(self, collection: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Plus gros groupes : (canonique, nombre d'alias)."""
+        rows = self._db().execute(
+            "SELECT canonical, COUNT(*) AS n FROM docs WHERE collection = ? AND canonical IS NOT NULL "
+            "GROUP BY canonical ORDER BY n DESC, canonical LIMIT ?",
+            (collection, limit),
+        )
+        return [(c, n) for c, n in rows]
+
+
+_INDEX: Optional[NearDuplicateIndex] = None
+
+
+def get_index() -> NearDuplicateIndex:
+    global _INDEX
+    if _INDEX is None:
+        from .config import NEAR_DUP_DB
+
+        _INDEX = NearDuplicateIndex(NEAR_DUP_DB)
+    return _INDEX
+
+
+def filter_near_duplicates(
+    collection: str, docs: List[Document], store: Any = None
+) -> Tuple[List[Document], Optional[DedupReport]]:
+    """Point d'entrée des scripts d'ingestion ; (docs, None) si NEAR_DUP=0."""
+    if not enabled() or not docs:
+        return docs, None
+    return get_index().filter(collection, docs, store)
+
+
+def forget_source(collection: str, source: str, keep: Optional[Set[str]] = None) -> ForgetReport:
+    """Point d'entrée des suppressions ; signale les sources à ré-ingérer."""
+    if not enabled():
+        return {"forgotten": 0, "promoted": {}}
+    report = get_index().forget_source(collection, source, keep)
+    if report["promoted"]:
+        from rich import print as rprint
+
+        sources = ", ".join(sorted(set(report["promoted"].values())))
+        rprint(
+            f"[yellow]{len(report['promoted'])} quasi-doublons de {source} redeviennent canoniques : "
+            f"ré-ingérer {sources} (ingest_daemon les remet en file)[/yellow]"
+        )
+    return report
+
+
+def stale_sources(collection: Optional[str] = None) -> List[Tuple[str, str]]:
+    return get_index().stale_sources(collection) if enabled() else []
+
+
+def main() -> None:
+    from rich import print as rprint
+    from rich.table import Table
+
+    parser = argparse.ArgumentParser(description="Quasi-doublons détectés à l'ingestion")
+    parser.add_argument("--clusters", type=int, default=5, help="plus gros groupes affichés par collection")
+    args = parser.parse_args()
+
+    index = get_index()
+    table = Table(title=f"Quasi-doublons (Jaccard ≥ {index.min_similarity:.2f}, {NUM_PERM} permutations, {BANDS} bandes)")
+    for col in ("Collection", "Documents vus", "Doublons", "Taux", "Plus gros groupes"):
+        table.add_column(col)
+    for collection, s in index.stats().items():
+        groups = ", ".join(f"{c} (+{n})" for c, n in index.clusters(collection, args.clusters)) or "–"
+        table.add_row(collection, str(s["docs"]), str(s["duplicates"]), f"{s['rate']:.1%}", groups)
+    rprint(table)
+    stale = index.stale_sources()
+    if stale:
+        rprint("[yellow]À ré-ingérer[/yellow] : " + ", ".join(f"{s} ({c})" for c, s in stale))
+
+
+if __name__ == "__main__":
+    main()
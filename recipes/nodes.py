@@ -6,11 +6,13 @@ Implémentation des nœuds du graphe recipes.
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
 from langchain_core.messages import AIMessage, HumanMessage
 
-from .config import LLM
+from .config import LLM, get_model_profile, get_node_llm
 from .schema import (
     RecipeState,
     RagStrategy,
@@ -19,10 +21,25 @@ from .schema import (
     CandidateRecipe,
     UstensilInfo,
     ShoppingItem,
+    ANALYZE,
+    CLASSIFY_RAG,
+    GRADE_RETRIEVAL,
+    REWRITE_QUERY,
+    CLARIFY_USER,
+    AGENT,
+    STEPS,
+    RAG_STRATEGIES,
+    RETRIEVAL_QUALITIES,
 )
-from . import tools
+from . import heuristics, instrumentation, tools
+from .llm_scheduler import get_scheduler, scheduler_enabled
+from .prompt_builder import build_messages
 from rich import print as rprint
-from .config import RECIPES_VS, COOKBOOKS_VS
+from .config import COOKBOOKS_VS
+from .catalogue import as_retrieved_doc, normalize_diet, parse_constraints, structured_search
+from .multivector import recipe_query_type, search_recipes
+from .diversity import diverse_search, retrieval_mode
+from .retrieval_cache import cached_search
 from .schema import RecipeState, RetrievedDoc
 
 
@@ -33,12 +50,83 @@ def _log_node(name: str) -> None:
     rprint(f"[bold magenta]→ NODE[/bold magenta] [cyan]{name}[/cyan]")
 
 
-def _llm_chat(messages: List[Any]) -> str:
-    """Appel simple au LLM avec des messages LangChain."""
-    resp = LLM.invoke(messages)
-    if isinstance(resp, str):
-        return resp
-    return resp.content  # ChatMessage
+def _llm_backend(llm: Any) -> str:
+    """Backend réellement derrière `llm` (éventuellement lié par `.bind(format=...)`)."""
+    from .fakes import FakeLLM
+
+    return "fake" if isinstance(getattr(llm, "bound", llm), FakeLLM) else "ollama"
+
+
+def _llm_chat(messages: List[Any], node: Optional[str] = None) -> str:
+    """
+    Appel simple au LLM avec des messages LangChain.
+
+    Si `node` est fourni, on utilise le profil de génération du nœud
+    (max tokens, stop, température, sortie contrainte) défini dans config.py.
+    """
+    llm = get_node_llm(node) if node else LLM
+    stats = instrumentation.OllamaStatsHandler()
+    config = {"callbacks": [stats]}
+    queue_wait = 0.0
+    start = time.perf_counter()
+    if scheduler_enabled():
+        # file partagée : priorité aux nœuds courts, slots Ollama, backpressure
+        resp, queue_wait = get_scheduler().submit(llm, messages, node=node, config=config)
+    else:
+        resp = llm.invoke(messages, config=config)
+    text = resp if isinstance(resp, str) else resp.content  # ChatMessage
+    instrumentation.record_llm_call(
+        {
+            "node": node or "default",
+            "backend": _llm_backend(llm),
+            "model": getattr(llm, "model", ""),
+            "latency_s": time.perf_counter() - start,
+            "queue_wait_s": queue_wait,
+            "output_chars": len(text),
+            **stats.stats,  # prompt_tokens / prompt_eval_s … (cache KV)
+        }
+    )
+    return text
+
+
+def _uses_heuristic(node: str) -> bool:
+    """True si le registre de modèles sert `node` par une heuristique."""
+    return get_model_profile(node).get("backend") == "heuristic"
+
+
+def _run_heuristic(node: str, fn: Callable[..., str], *args: Any) -> str:
+    """Exécute l'heuristique d'un nœud en l'instrumentant comme un appel LLM."""
+    start = time.perf_counter()
+    result = fn(*args)
+    instrumentation.record_llm_call(
+        {
+            "node": node,
+            "backend": "heuristic",
+            "model": fn.__name__,
+            "latency_s": time.perf_counter() - start,
+            "output_chars": len(result),
+            "valid": True,
+            "decision": result,
+        }
+    )
+    return result
+
+
+def _parse_choice(text: str, valid: Sequence[str]) -> Optional[str]:
+    """
+    Extrait un token de `valid` depuis la sortie LLM : JSON contraint
+    ({"answer": "GOOD"}), chaîne JSON ("GOOD") ou texte brut (GOOD).
+    Retourne None si rien d'exploitable.
+    """
+    raw = (text or "").strip()
+    try:
+        parsed = json.loads(raw)
+    except ValueError:
+        parsed = raw
+    if isinstance(parsed, dict):
+        parsed = parsed.get("answer", "")
+    candidate = str(parsed).strip().strip('"').strip().upper()
+    return candidate if candidate in valid else None
 
 
 # --- ANALYZE_REQUEST ---
@@ -51,17 +139,8 @@ def analyze_request_node(state: RecipeState) -> RecipeState:
     """
     _log_node("ANALYZE_REQUEST")
     query = state.get("query") or ""
-    messages = [
-        HumanMessage(
-            content=(
-                "Tu es un assistant culinaire. Analyse la demande suivante et "
-                "retourne un JSON avec les clés: normalized_request, people, "
-                "max_time_minutes, diet, allergies (liste), equipment_available (liste).\n\n"
-                f"Demande: {query}"
-            )
-        )
-    ]
-    text = _llm_chat(messages)
+    messages = build_messages(ANALYZE, query=query)
+    text = _llm_chat(messages, node=ANALYZE)
 
     # Pour rester simple, on laisse le parsing JSON à plus tard;
     # ici on stocke le texte brut.
@@ -82,31 +161,16 @@ def classify_rag_node(state: RecipeState) -> RecipeState:
     """
     _log_node("CLASSIFY_RAG")
     query = state.get("query") or ""
-    messages = [
-        HumanMessage(
-            content=(
-                "Tu es un routeur RAG spécialisé en cuisine.\n"
-                "Ton rôle est de choisir UNE source principale d'information.\n\n"
-                "Règles de décision :\n"
-                "- Si la question peut être répondue avec des recettes génériques "
-                "sans dépendre de ma base locale → NO_RAG.\n"
-                "- Si la question concerne des recettes que l'on trouve dans mon "
-                "catalogue interne (salades, plats maison, etc.) → LOCAL_RECIPES.\n"
-                "- Si la question mentionne un livre, un PDF, un livret de recettes "
-                "ou une recette précise que j'ai en PDF → COOKBOOKS.\n"
-                "- Si la question demande des tendances récentes, des avis en ligne, "
-                "des informations actuelles ou des ingrédients très rares → WEB.\n\n"
-                "Réponds STRICTEMENT par l'un de ces tokens, en MAJUSCULES, "
-                "sans explication, sans ponctuation supplémentaire :\n"
-                "NO_RAG, LOCAL_RECIPES, COOKBOOKS, WEB.\n\n"
-                f"Question utilisateur : {query}"
-            )
+    messages = build_messages(CLASSIFY_RAG, query=query)
+    if _uses_heuristic(CLASSIFY_RAG):
+        strategy_text = _run_heuristic(CLASSIFY_RAG, heuristics.classify_rag, query)
+    else:
+        strategy_text = _parse_choice(_llm_chat(messages, node=CLASSIFY_RAG), RAG_STRATEGIES)
+        instrumentation.annotate_last_call(
+            CLASSIFY_RAG, valid=strategy_text is not None, decision=strategy_text
         )
-    ]
-    strategy_text = _llm_chat(messages).strip().upper()
-    valid: List[RagStrategy] = ["NO_RAG", "LOCAL_RECIPES", "COOKBOOKS", "WEB"]  # type: ignore
     # Fallback raisonnable si le LLM sort autre chose
-    if strategy_text not in valid:
+    if strategy_text is None:
         rprint("[red]Strategy non valide, fallback sur LOCAL_RECIPES[/red]")
         strategy: RagStrategy = "LOCAL_RECIPES"  # type: ignore
     else:
@@ -121,8 +185,11 @@ def retrieve_recipes_node(state: RecipeState) -> RecipeState:
     _log_node("RETRIEVE_RECIPES")
     query = state.get("query") or ""
 
-    # RAG sur le vecteur store LOCAL_RECIPES
-    docs_raw: list[Document] = RECIPES_VS.similarity_search(query, k=5)
+    # RAG sur le vecteur store LOCAL_RECIPES : champs pondérés selon le type de
+    # requête, regroupés par recette (multivector.py)
+    docs_raw: list[Document] = cached_search(
+        "recipes", query, 5, lambda: search_recipes(query, k=5), mode=retrieval_mode()
+    )
     docs: list[RetrievedDoc] = [
         {
             "id": d.metadata.get("id", d.page_content[:50]),
@@ -133,6 +200,28 @@ def retrieve_recipes_node(state: RecipeState) -> RecipeState:
         for d in docs_raw
     ]
 
+    # requête "frigo" : l'index des ingrédients (couverture / manquants) passe
+    # devant la recherche vectorielle
+    if recipe_query_type(query) == "ingredients":
+        by_index = tools.ingredients_retriever.invoke({"ingredients": [query]})
+        seen = {d["id"] for d in by_index}
+        docs = (by_index + [d for d in docs if d.get("id") not in seen])[:5]
+
+    # contraintes structurées (temps, personnes, saison, régime) : filtres SQL
+    # sur le catalogue Parquet, classés par similarité, devant les hits vectoriels
+    constraints = parse_constraints(query)
+    if state.get("max_time_minutes"):
+        constraints["max_minutes"] = int(state["max_time_minutes"])
+    if state.get("people"):
+        constraints["people"] = int(state["people"])
+    diet = normalize_diet(state.get("diet") or "")
+    if diet and diet not in constraints.get("diet", []):
+        constraints["diet"] = [*constraints.get("diet", []), diet]
+    if constraints:
+        by_sql = [as_retrieved_doc(h) for h in structured_search(constraints, query, k=5)]
+        seen = {d["id"] for d in by_sql}
+        docs = (by_sql + [d for d in docs if d.get("id") not in seen])[:5]
+
     rprint(f"[bold magenta]RETRIEVE_RECIPES[/bold magenta] -> {len(docs)} docs")
     for d in docs[:3]:
         meta = d.get("metadata") or {}
@@ -149,7 +238,10 @@ def retrieve_cookbooks_node(state: RecipeState) -> RecipeState:
     _log_node("RETRIEVE_COOKBOOKS")
     query = state.get("query") or ""
 
-    docs_raw: list[Document] = COOKBOOKS_VS.similarity_search(query, k=5)
+    # pages répétées / ré-ingérées regroupées, MMR (diversity.py)
+    docs_raw: list[Document] = cached_search(
+        "cookbooks", query, 5, lambda: diverse_search(COOKBOOKS_VS, query, k=5), mode=retrieval_mode()
+    )
     docs: list[RetrievedDoc] = [
         {
             "id": d.metadata.get("id", d.page_content[:50]),
@@ -207,22 +299,17 @@ def grade_retrieval_node(state: RecipeState) -> RecipeState:
     docs = state.get("retrieved_docs", [])
     text_docs = "\n\n".join(d.get("content", "") for d in docs)[:4000]
 
-    messages = [
-        HumanMessage(
-            content=(
-                "Tu es un évaluateur de RAG pour la cuisine.\n"
-                "Les documents suivants sont-ils suffisants, insuffisants ou ambigus "
-                "pour répondre à la question ?\n"
-                "Réponds uniquement par: GOOD, BAD ou AMBIGUOUS.\n\n"
-                f"Question: {query}\n\nDocs:\n{text_docs}"
-            )
+    messages = build_messages(GRADE_RETRIEVAL, query=query, docs=text_docs)
+    if _uses_heuristic(GRADE_RETRIEVAL):
+        quality_text = _run_heuristic(GRADE_RETRIEVAL, heuristics.grade_retrieval, query, docs)
+    else:
+        quality_text = _parse_choice(
+            _llm_chat(messages, node=GRADE_RETRIEVAL), RETRIEVAL_QUALITIES
         )
-    ]
-    quality_text = _llm_chat(messages).strip().upper()
-    valid: List[RetrievalQuality] = ["GOOD", "BAD", "AMBIGUOUS"]  # type: ignore
-    quality: RetrievalQuality = (
-        quality_text if quality_text in valid else "GOOD"  # type: ignore
-    )
+        instrumentation.annotate_last_call(
+            GRADE_RETRIEVAL, valid=quality_text is not None, decision=quality_text
+        )
+    quality: RetrievalQuality = quality_text or "GOOD"  # type: ignore
     return {
         "retrieval_quality": quality,
         "clarification_needed": quality == "AMBIGUOUS",
@@ -232,16 +319,10 @@ def grade_retrieval_node(state: RecipeState) -> RecipeState:
 def rewrite_query_node(state: RecipeState) -> RecipeState:
     """Réécrit la requête pour un meilleur retrieval."""
     query = state.get("query") or ""
-    messages = [
-        HumanMessage(
-            content=(
-                "Réécris la question suivante pour qu'elle soit plus précise pour un "
-                "moteur de recherche de recettes. Garde le français.\n\n"
-                f"Question: {query}"
-            )
-        )
-    ]
-    new_query = _llm_chat(messages).strip()
+    messages = build_messages(REWRITE_QUERY, query=query)
+    if _uses_heuristic(REWRITE_QUERY):
+        return {"query": _run_heuristic(REWRITE_QUERY, heuristics.rewrite_query, query)}
+    new_query = _llm_chat(messages, node=REWRITE_QUERY).strip()
     return {"query": new_query}
 
 
@@ -251,16 +332,8 @@ def clarify_user_node(state: RecipeState) -> RecipeState:
     (à afficher côté UI).
     """
     query = state.get("query") or ""
-    messages = [
-        HumanMessage(
-            content=(
-                "La question de cuisine suivante est ambiguë. Formule UNE seule question "
-                "courte pour clarifier les contraintes (régime, matériel, temps, etc.).\n\n"
-                f"Question: {query}"
-            )
-        )
-    ]
-    question = _llm_chat(messages).strip()
+    messages = build_messages(CLARIFY_USER, query=query)
+    question = _llm_chat(messages, node=CLARIFY_USER).strip()
     return {
         "clarification_question": question,
         "clarification_needed": True,
@@ -281,18 +354,8 @@ def agent_node(state: RecipeState) -> RecipeState:
     docs = state.get("retrieved_docs", [])
     context = "\n\n".join(d.get("content", "") for d in docs)[:6000]
 
-    messages = [
-        HumanMessage(
-            content=(
-                "Tu es un chef assistant. À partir de la question de l'utilisateur "
-                "et du contexte (recettes / techniques), propose 3 recettes candidates.\n"
-                "Réponds sous forme de liste numérotée avec pour chaque recette : "
-                "titre, résumé, liste d'ingrédients, temps total.\n\n"
-                f"Question: {query}\n\nContexte:\n{context}"
-            )
-        )
-    ]
-    text = _llm_chat(messages)
+    messages = build_messages(AGENT, query=query, context=context)
+    text = _llm_chat(messages, node=AGENT)
 
     # On stocke brut dans candidate_recipes_text pour commencer.
     candidate: CandidateRecipe = {
@@ -417,17 +480,8 @@ def generate_steps_node(state: RecipeState) -> RecipeState:
     plan = state.get("batch_plan", [])
     context = "\n\n".join(c.get("summary", "") for c in plan)
 
-    messages = [
-        HumanMessage(
-            content=(
-                "À partir du plan de recettes suivant, génère des étapes détaillées "
-                "pour cuisiner efficacement (batch cooking si pertinent).\n"
-                "Structure ta réponse en étapes numérotées, avec temps estimé.\n\n"
-                f"Demande utilisateur: {query}\n\nPlan:\n{context}"
-            )
-        )
-    ]
-    text = _llm_chat(messages)
+    messages = build_messages(STEPS, query=query, plan=context)
+    text = _llm_chat(messages, node=STEPS)
     state["cooking_steps"] = text.split("\n")
     state["timelines"] = "Planning indicatif généré dans les étapes."
     state["tips"] = "Ajuste les temps de cuisson selon la puissance de ton four / plaques."
@@ -0,0 +1,146 @@
+"""
+recipes/onnx_embeddings.py
+
+Embeddings sentence-transformers (all-MiniLM-L6-v2 par défaut) exécutés avec
+onnxruntime, sans torch :
+
+- tokenizer `tokenizers` (tokenizer.json du modèle), troncature à max_length,
+- batching dynamique : textes triés par longueur, padding au plus long du
+  lot seulement (pas à max_length),
+- mean pooling sur le masque d'attention + normalisation L2 (comme le
+  pipeline sentence-transformers du modèle),
+- threads onnxruntime réglables (ONNX_THREADS).
+
+Le modèle exporté en ONNX est publié sur le Hub (onnx/model.onnx) ; `export`
+le copie dans un dossier local pour tourner hors-ligne :
+
+    python -m recipes.onnx_embeddings export --out data/models/all-MiniLM-L6-v2
+    EMBEDDINGS_BACKEND=onnx ONNX_MODEL_DIR=data/models/all-MiniLM-L6-v2 python main.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_MODEL_FILE = "onnx/model.onnx"
+
+
+def _resolve_files(model_dir: Optional[str], model_id: str, model_file: str) -> Tuple[Path, Path]:
+    """Chemins (model.onnx, tokenizer.json) : dossier local, sinon cache du Hub."""
+    if model_dir:
+        root = Path(model_dir)
+        for candidate in (root / model_file, root / Path(model_file).name):
+            if candidate.exists():
+                return candidate, root / "tokenizer.json"
+        raise FileNotFoundError(f"Modèle ONNX introuvable dans {root} ({model_file})")
+
+    from huggingface_hub import hf_hub_download
+
+    return (
+        Path(hf_hub_download(model_id, model_file)),
+        Path(hf_hub_download(model_id, "tokenizer.json")),
+    )
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(
+        self,
+        model_dir: Optional[str] = None,
+        model_id: str = DEFAULT_MODEL_ID,
+        model_file: str = DEFAULT_MODEL_FILE,
+        batch_size: int = 32,
+        max_length: int = 256,
+        threads: Optional[int] = None,
+        normalize: bool = True,
+    ) -> None:
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path, tokenizer_path = _resolve_files(model_dir, model_id, model_file)
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_token = "[PAD]" if self.tokenizer.token_to_id("[PAD]") is not None else "<pad>"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+        self.batch_size = batch_size
+        self.normalize = normalize
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask, "token_type_ids": np.zeros_like(ids)}
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self._inputs})[0]
+
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # tri par longueur : chaque lot n'est paddé qu'au plus long de ses textes
+        order = np.argsort([len(t) for t in texts])[::-1]
+        out: Optional[np.ndarray] = None
+        for start in range(0, len(texts), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            vectors = self._run([texts[i] for i in idx])
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[idx] = vectors
+        return out  # type: ignore[return-value]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+def export(out: Path, model_id: str = DEFAULT_MODEL_ID, model_file: str = DEFAULT_MODEL_FILE) -> Any:
+    """Copie model.onnx + tokenizer.json du Hub dans `out` (usage hors-ligne)."""
+    from huggingface_hub import hf_hub_download
+
+    out.mkdir(parents=True, exist_ok=True)
+    for name in (model_file, "tokenizer.json"):
+        hf_hub_download(model_id, name, local_dir=str(out))
+    return out
+
+
+def main() -> None:
+    from rich import print as rprint
+
+    parser = argparse.ArgumentParser(description="Embeddings ONNX (sans torch)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_export = sub.add_parser("export", help="télécharge le modèle ONNX + tokenizer dans un dossier")
+    p_export.add_argument("--out", type=Path, required=True)
+    p_export.add_argument("--model", default=os.getenv("EMBEDDINGS_MODEL", DEFAULT_MODEL_ID))
+    p_export.add_argument("--file", default=DEFAULT_MODEL_FILE, help="ex: onnx/model_qint8_avx512.onnx")
+    args = parser.parse_args()
+
+    if args.cmd == "export":
+        export(args.out, args.model, args.file)
+        rprint(f"[green]Modèle ONNX exporté dans {args.out}[/green]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+recipes/pdf_cache.py
+
+Cache du texte extrait des PDFs : ingest_pdfs ne re-parse un livre que si
+son contenu ou le parseur a changé. Changer MIN_TOKENS, le découpage ou le
+modèle d'embeddings ne coûte plus l'extraction.
+
+- clé : empreinte du contenu du fichier (blake2b) + parseur + version du
+  parseur (bibliothèque + PARSER_REVISION),
+- valeur : data/pdf_cache/<empreinte>-<parseur>-<version>.jsonl.gz, une
+  ligne d'en-tête puis une ligne par page (texte + métadonnées du loader),
+- empreintes mémorisées par (chemin, taille, mtime) : un PDF inchangé
+  n'est même pas relu,
+- parseurs : pypdf (PyPDFLoader, défaut) | pymupdf (PyMuPDFLoader, nettement
+  plus rapide, dépendance optionnelle `pymupdf`), choisis par run
+  (PDF_PARSER ou --parser).
+
+PDF_CACHE=0 désactive le cache. Compteurs `pdf_cache.hit|miss` dans instrumentation.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from . import instrumentation
+
+
+PARSERS = ("pypdf", "pymupdf")
+# À incrémenter quand le post-traitement des pages change (invalide le cache).
+PARSER_REVISION = 1
+
+
+def default_parser() -> str:
+    return os.getenv("PDF_PARSER", "pypdf")
+
+
+def cache_enabled() -> bool:
+    return os.getenv("PDF_CACHE", "1") == "1"
+
+
+def cache_dir() -> Path:
+    from .config import PDF_CACHE_DIR
+
+    return PDF_CACHE_DIR
+
+
+def parser_version(parser: str) -> str:
+    if parser not in PARSERS:
+        raise ValueError(f"parseur PDF inconnu : {parser} ({' | '.join(PARSERS)})")
+    try:
+        lib = metadata.version(parser)
+    except metadata.PackageNotFoundError:
+        lib = "absent"
+    return f"{lib}.r{PARSER_REVISION}"
+
+
+def parse_pdf(path: Path, parser: str) -> List[Document]:
+    """Une page = un Document, métadonnées du loader LangChain."""
+    if parser == "pymupdf":
+        from langchain_community.document_loaders import PyMuPDFLoader
+
+        return PyMuPDFLoader(str(path)).load()
+    from langchain_community.document_loaders import PyPDFLoader
+
+    return PyPDFLoader(str(path)).load()
+
+
+# --- empreintes ---
+
+_STATS_LOCK = threading.Lock()
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cached_file_hash(path: Path, directory: Path) -> str:
+    """Empreinte du contenu, recalculée seulement si taille ou mtime ont changé."""
+    stat = path.stat()
+    index_path = directory / "hashes.json"
+    key = str(path.resolve())
+    with _STATS_LOCK:
+        try:
+            index: Dict[str, Any] = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            index = {}
+        size, mtime_ns, digest = index.get(key) or (None, None, None)
+        if (size, mtime_ns) == (stat.st_size, stat.st_mtime_ns) and digest:
+            return digest
+        digest = file_hash(path)
+        index[key] = [stat.st_size, stat.st_mtime_ns, digest]
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(index), encoding="utf-8")
+        tmp.replace(index_path)
+        return digest
+
+
+# --- lecture / écriture ---
+
+
+def _entry_path(directory: Path, digest: str, parser: str) -> Path:
+    return directory / f"{digest}-{parser}-{parser_version(parser)}.jsonl.gz"
+
+
+def _read(entry: Path) -> List[Document]:
+    with gzip.open(entry, "rt", encoding="utf-8") as f:
+        next(f)  # en-tête
+        return [Document(page_content=p["text"], metadata=p["metadata"]) for p in map(json.loads, f)]
+
+
+def _write(entry: Path, pages: List[Document], header: Dict[str, Any]) -> None:
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp = entry.with_suffix(".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for page in pages:
+            f.write(json.dumps({"text": page.page_content, "metadata": page.metadata}, ensure_ascii=False, default=str) + "\n")
+    tmp.replace(entry)
+
+
+def extract_pages(
+    path: Path,
+    parser: Optional[str] = None,
+    refresh: bool = False,
+    directory: Optional[Path] = None,
+) -> List[Document]:
+    """Pages de `path`, depuis le cache si ce contenu a déjà été extrait par ce parseur."""
+    parser = parser or default_parser()
+    parser_version(parser)  # valide le nom avant de lire le fichier
+    if not cache_enabled():
+        return parse_pdf(path, parser)
+
+    directory = directory or cache_dir()
+    digest = cached_file_hash(path, directory)
+    entry = _entry_path(directory, digest, parser)
+    if entry.exists() and not refresh:
+        instrumentation.increment("pdf_cache.hit")
+        return _read(entry)
+
+    instrumentation.increment("pdf_cache.miss")
+    start = time.perf_counter()
+    pages = parse_pdf(path, parser)
+    _write(entry, pages, {
+        "file": path.name,
+        "hash": digest,
+        "parser": parser,
+        "version": parser_version(parser),
+        "pages": len(pages),
+        "parse_s": round(time.perf_counter() - start, 3),
+    })
+    return pages
+
+
+def cache_stats(directory: Optional[Path] = None) -> Dict[str, Any]:
+    directory = directory or cache_dir()
+    entries = list(directory.glob("*.jsonl.gz"))
+    return {"entries": len(entries), "bytes": sum(e.stat().st_size for e in entries)}
+
+
+def clear_cache(directory: Optional[Path] = None) -> int:
+    directory = directory or cache_dir()
+    entries = list(directory.glob("*.jsonl.gz"))
+    for entry in entries:
+        entry.unlink()
+    (directory / "hashes.json").unlink(missing_ok=True)
+    return len(entries)
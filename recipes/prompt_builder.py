@@ -0,0 +1,63 @@
+"""
+recipes/prompt_builder.py
+
+Assemblage des messages LLM à partir de prompts.py.
+
+Ordre fixe pour maximiser la réutilisation du cache KV d'Ollama
+(préfixe identique d'un appel à l'autre) :
+
+    SystemMessage(SYSTEM_PREFIX + instructions du nœud)   ← statique
+    HumanMessage(contenu variable : question, documents)  ← toujours en dernier
+
+`layout="variable_first"` inverse l'ordre (variable puis instructions) :
+sert uniquement de témoin dans bench_prompts.py.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from . import prompts
+from .schema import (
+    ANALYZE,
+    CLASSIFY_RAG,
+    GRADE_RETRIEVAL,
+    REWRITE_QUERY,
+    CLARIFY_USER,
+    AGENT,
+    PLAN_BATCH,
+    STEPS,
+)
+
+
+# nœud → (instructions statiques, template variable)
+NODE_PROMPTS: Dict[str, Tuple[str, str]] = {
+    ANALYZE: (prompts.ANALYZE_REQUEST_SYSTEM, prompts.ANALYZE_REQUEST_USER),
+    CLASSIFY_RAG: (prompts.CLASSIFY_RAG_SYSTEM, prompts.CLASSIFY_RAG_USER),
+    GRADE_RETRIEVAL: (prompts.GRADE_RETRIEVAL_SYSTEM, prompts.GRADE_RETRIEVAL_USER),
+    REWRITE_QUERY: (prompts.REWRITE_QUERY_SYSTEM, prompts.REWRITE_QUERY_USER),
+    CLARIFY_USER: (prompts.CLARIFY_USER_SYSTEM, prompts.CLARIFY_USER_USER),
+    AGENT: (prompts.AGENT_RECIPES_SYSTEM, prompts.AGENT_RECIPES_USER),
+    PLAN_BATCH: (prompts.BATCH_COOKING_SYSTEM, prompts.BATCH_COOKING_USER),
+    STEPS: (prompts.GENERATE_STEPS_SYSTEM, prompts.GENERATE_STEPS_USER),
+}
+
+
+def system_prefix(node: str) -> str:
+    """Partie statique (identique à chaque appel) du prompt de `node`."""
+    system, _ = NODE_PROMPTS[node]
+    return prompts.SYSTEM_PREFIX + "\n" + system
+
+
+def build_messages(node: str, layout: str = "prefix", **values: Any) -> List[BaseMessage]:
+    """
+    Messages LangChain pour `node` : préfixe système stable puis contenu
+    variable formaté avec `values` (query, docs, context, plan…).
+    """
+    _, user = NODE_PROMPTS[node]
+    variable = user.format(**values)
+    if layout == "variable_first":
+        return [HumanMessage(content=variable + "\n" + system_prefix(node))]
+    return [SystemMessage(content=system_prefix(node)), HumanMessage(content=variable)]
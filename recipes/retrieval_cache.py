@@ -0,0 +1,220 @@
+"""
+recipes/retrieval_cache.py
+
+Cache des résultats de recherche (retrieve_* et tools.*_retriever) :
+requêtes répétées et boucles de réécriture qui retombent sur le même texte
+ne refont ni l'embedding ni la recherche.
+
+- clé : (collection, version, requête normalisée, k, filtre, mode),
+- version par collection : compteur incrémenté par chaque script
+  d'ingestion (`bump_version`), partagé entre process via SQLite
+  (data/retrieval_cache.sqlite) ; une nouvelle version rend les anciennes
+  entrées inaccessibles,
+- mémoire bornée : LRU de RETRIEVAL_CACHE_SIZE entrées,
+- persistance disque optionnelle (RETRIEVAL_CACHE_PERSIST=1) dans la même
+  base, purgée à chaque changement de version,
+- compteurs `retrieval_cache.<collection>.hit|miss` dans instrumentation.
+
+RETRIEVAL_CACHE=0 désactive le cache.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from . import instrumentation
+
+
+_Entry = List[Tuple[Optional[str], str, Dict[str, Any]]]
+
+
+def normalize_query(query: str) -> str:
+    """Casse, espaces et formes Unicode unifiés (pas les accents : sens conservé)."""
+    return " ".join(unicodedata.normalize("NFKC", query or "").casefold().split())
+
+
+class RetrievalCache:
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = 1024,
+        persist: bool = False,
+        version_ttl_s: float = 1.0,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.persist = persist
+        self.version_ttl_s = version_ttl_s
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls, path: Path) -> "RetrievalCache":
+        return cls(
+            path,
+            max_entries=int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024")),
+            persist=os.getenv("RETRIEVAL_CACHE_PERSIST", "0") == "1",
+            version_ttl_s=float(os.getenv("RETRIEVAL_CACHE_VERSION_TTL_S", "1")),
+        )
+
+    # --- SQLite (versions + entrées persistées) ---
+
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS versions (collection TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, collection TEXT NOT NULL, "
+                "version INTEGER NOT NULL, docs TEXT NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def version(self, collection: str) -> int:
+        """Version courante ; relue au plus toutes les `version_ttl_s` secondes."""
+        cached = self._versions.get(collection)
+        now = time.monotonic()
+        if cached and now - cached[1] < self.version_ttl_s:
+            return cached[0]
+        row = self._db().execute("SELECT version FROM versions WHERE collection = ?", (collection,)).fetchone()
+        version = row[0] if row else 0
+        self._versions[collection] = (version, now)
+        return version
+
+    def bump_version(self, collection: str) -> int:
+        """À appeler après chaque écriture dans `collection` (scripts d'ingestion)."""
+        db = self._db()
+        db.execute(
+            "INSERT INTO versions (collection, version) VALUES (?, 1) "
+            "ON CONFLICT(collection) DO UPDATE SET version = version + 1",
+            (collection,),
+        )
+        version = db.execute("SELECT version FROM versions WHERE collection = ?", (collection,)).fetchone()[0]
+        db.execute("DELETE FROM entries WHERE collection = ? AND version < ?", (collection, version))
+        with self._lock:
+            self._versions[collection] = (version, time.monotonic())
+            for key in [k for k in self._entries if k.startswith(f"{collection}\x1f")]:
+                del self._entries[key]
+        return version
+
+    # --- lecture / écriture ---
+
+    def _key(self, collection: str, query: str, k: int, filter: Optional[Mapping[str, Any]], mode: str) -> str:
+        parts = (
+            collection, str(self.version(collection)), normalize_query(query), str(k),
+            json.dumps(filter or {}, sort_keys=True, default=str), mode,
+        )
+        return "\x1f".join(parts)
+
+    def get_or_search(
+        self,
+        collection: str,
+        query: str,
+        k: int,
+        search: Callable[[], List[Document]],
+        filter: Optional[Mapping[str, Any]] = None,
+        mode: str = "",
+    ) -> List[Document]:
+        key = self._key(collection, query, k, filter, mode)
+        entry = self._lookup(key)
+        if entry is not None:
+            instrumentation.increment(f"retrieval_cache.{collection}.hit")
+            return [Document(id=i, page_content=c, metadata=dict(m)) for i, c, m in entry]
+
+        instrumentation.increment(f"retrieval_cache.{collection}.miss")
+        docs = search()
+        entry = [(d.id, d.page_content, dict(d.metadata)) for d in docs]
+        self._store(key, collection, entry)
+        return docs
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if not self.persist:
+            return None
+        row = self._db().execute("SELECT docs FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = [tuple(e) for e in json.loads(row[0])]  # type: ignore[misc]
+        self._remember(key, entry)
+        return entry
+
+    def _store(self, key: str, collection: str, entry: _Entry) -> None:
+        self._remember(key, entry)
+        if self.persist:
+            self._db().execute(
+                "INSERT OR REPLACE INTO entries (key, collection, version, docs) VALUES (?, ?, ?, ?)",
+                (key, collection, self.version(collection), json.dumps(entry, ensure_ascii=False, default=str)),
+            )
+
+    def _remember(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+        self._db().execute("DELETE FROM entries")
+
+
+# --- cache partagé du process ---
+
+_CACHE: Optional[RetrievalCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    return os.getenv("RETRIEVAL_CACHE", "1") == "1"
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            from .config import RETRIEVAL_CACHE_DB
+
+            _CACHE = RetrievalCache.from_env(RETRIEVAL_CACHE_DB)
+        return _CACHE
+
+
+def cached_search(
+    collection: str,
+    query: str,
+    k: int,
+    search: Callable[[], List[Document]],
+    filter: Optional[Mapping[str, Any]] = None,
+    mode: str = "",
+) -> List[Document]:
+    """`search()` mis en cache sous (collection, version, requête, k, filtre, mode)."""
+    if not cache_enabled():
+        return search()
+    return get_retrieval_cache().get_or_search(collection, query, k, search, filter=filter, mode=mode)
+
+
+def bump_version(*collections: str) -> None:
+    """Invalide le cache des collections modifiées (tous les process, via SQLite)."""
+    cache = get_retrieval_cache()
+    for collection in collections:
+        cache.bump_version(collection)
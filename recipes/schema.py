@@ -6,7 +6,7 @@ Schéma de state pour le graphe LangGraph du compagnon de recettes.
 
 from __future__ import annotations
 
-from typing import Any, Dict, List, Literal, Optional, TypedDict
+from typing import Any, Dict, List, Literal, Optional, Tuple, TypedDict, get_args
 
 
 # --- constantes de nœuds (pour graph_builder.py) ---
@@ -46,6 +46,10 @@ RagStrategy = Literal[
 
 RetrievalQuality = Literal["GOOD", "BAD", "AMBIGUOUS"]
 
+# valeurs autorisées (sorties contraintes des nœuds de routage / grading)
+RAG_STRATEGIES: Tuple[str, ...] = get_args(RagStrategy)
+RETRIEVAL_QUALITIES: Tuple[str, ...] = get_args(RetrievalQuality)
+
 
 class RetrievedDoc(TypedDict, total=False):
     id: str
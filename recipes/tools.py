@@ -3,6 +3,8 @@ recipes/tools.py
 
 Définition des tools utilisés par l'Agentic RAG :
 - retrievers (recettes, cookbooks, ustensiles)
+- recettes par ingrédients disponibles (index inversé)
+- recettes par contraintes structurées (catalogue Parquet / DuckDB)
 - Tavily web search
 - nutrition simple
 """
@@ -14,17 +16,25 @@ from typing import Any, Dict, List
 from langchain_core.tools import tool
 from langchain_core.documents import Document
 
-from .config import RECIPES_VS, COOKBOOKS_VS, USTENSILS_VS, TAVILY_TOOL
+from .catalogue import as_retrieved_doc, parse_constraints, structured_search
+from .config import COOKBOOKS_VS, USTENSILS_VS, TAVILY_TOOL
+from .ingredient_index import get_ingredient_index
+from .multivector import search_recipes
+from .diversity import diverse_search, retrieval_mode
+from .retrieval_cache import cached_search
 from rich import print as rprint
 
 
-# --- retrievers basés sur Chroma ---
+# --- retrievers (backend vectoriel de config.py : Chroma, sqlite-vec, DuckDB, Qdrant) ---
 
 
 @tool("recipes_retriever", return_direct=False)
 def recipes_retriever(query: str, k: int = 5) -> List[Dict[str, Any]]:
     """Recherche des recettes (vector store local) pertinentes pour la requête."""
-    docs: List[Document] = RECIPES_VS.similarity_search(query, k=k)
+    # multi-vecteur (titre / ingrédients / préparation), une entrée par recette
+    docs: List[Document] = cached_search(
+        "recipes", query, k, lambda: search_recipes(query, k=k), mode=retrieval_mode()
+    )
     rprint(f"[recipes/tools] recipes_retriever: found {len(docs)} docs for query '{query}'")
     return [
         {
@@ -37,10 +47,50 @@ def recipes_retriever(query: str, k: int = 5) -> List[Dict[str, Any]]:
     ]
 
 
+@tool("ingredients_retriever", return_direct=False)
+def ingredients_retriever(ingredients: List[str], max_missing: int = 2, k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Recettes qui utilisent le plus d'ingrédients disponibles (frigo, placard),
+    avec au plus `max_missing` ingrédients à acheter. Index inversé construit
+    à l'ingestion, sans recherche vectorielle ni LLM.
+    """
+    index = get_ingredient_index()
+    available = [t for item in ingredients for t in index.parse_query(item)]
+    matches = index.search(available, max_missing=max_missing, k=k)
+    rprint(f"[recipes/tools] ingredients_retriever: {len(matches)} recettes pour {available}")
+    return [
+        {
+            "id": m["id"],
+            "source": "recipes",
+            "content": (
+                f"{m['title']}\n\nIngrédients disponibles : {', '.join(m['used'])}\n"
+                f"Manquants : {', '.join(m['missing']) or 'aucun'}"
+            ),
+            "metadata": {**m["metadata"], "coverage": m["coverage"], "missing": ", ".join(m["missing"])},
+        }
+        for m in matches
+    ]
+
+
+@tool("structured_recipes_search", return_direct=False)
+def structured_recipes_search(constraints: str, query: str = "", k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Recettes qui respectent des contraintes structurées (« ≤30 min, 4 pers.,
+    été, végétarien ») : filtres SQL sur le catalogue, puis classement par
+    similarité avec `query` si fournie.
+    """
+    parsed = parse_constraints(constraints)
+    hits = structured_search(parsed, query, k=k)
+    rprint(f"[recipes/tools] structured_recipes_search: {len(hits)} recettes pour {parsed}")
+    return [as_retrieved_doc(h) for h in hits]
+
+
 @tool("cookbooks_retriever", return_direct=False)
 def cookbooks_retriever(query: str, k: int = 5) -> List[Dict[str, Any]]:
     """Recherche dans les PDFs / livres de cuisine vectorisés."""
-    docs: List[Document] = COOKBOOKS_VS.similarity_search(query, k=k)
+    docs: List[Document] = cached_search(
+        "cookbooks", query, k, lambda: diverse_search(COOKBOOKS_VS, query, k=k), mode=retrieval_mode()
+    )
     return [
         {
             "id": d.metadata.get("id", d.page_content[:50]),
@@ -58,7 +108,9 @@ def ustensils_retriever(task: str, k: int = 5) -> List[Dict[str, Any]]:
     Suggère des ustensiles adaptés à une tâche (ex: 'purée pour 6 personnes').
     Utilise le vector store ustensiles (scrap + CSV).
     """
-    docs: List[Document] = USTENSILS_VS.similarity_search(task, k=k)
+    docs: List[Document] = cached_search(
+        "ustensils", task, k, lambda: diverse_search(USTENSILS_VS, task, k=k), mode=retrieval_mode()
+    )
     return [
         {
             "id": d.metadata.get("id", d.page_content[:50]),
@@ -0,0 +1,858 @@
+"""
+recipes/vector_backends.py
+
+Backends de recherche vectorielle interchangeables pour les collections
+recipes / cookbooks / ustensils.
+
+Interface commune (`VectorBackend`) = le sous-ensemble de VectorStore
+LangChain utilisé par tools.py, nodes.py, les scripts d'ingestion et les
+scripts recipes/test_*.py : `add_documents`, `similarity_search`,
+`similarity_search_by_vector`, `similarity_search_with_score` (distance
+de l'espace de la collection, plus petite = plus proche, comme Chroma),
+plus `delete(ids=...)` pour l'ingestion incrémentale (voir `ids_where` /
+`delete_documents` / `update_metadata` en fin de module).
+`Chroma` la respecte déjà ; les adaptateurs ci-dessous l'implémentent pour :
+
+- sqlite-vec : table virtuelle vec0 dans un fichier SQLite,
+- DuckDB     : colonne FLOAT[dim] + recherche exacte (index HNSW de
+               l'extension vss si DUCKDB_VSS=1),
+- Qdrant     : mode local embarqué (fichier) ou en mémoire (":memory:").
+
+`NumpyExactIndex` sert les petites collections Chroma depuis la mémoire
+(recherche exacte vectorisée), `QuantizedIndex` les grosses (vecteurs int8 /
+binaires + reclassement float32), Chroma restant la source de vérité.
+
+Sélection par VECTOR_BACKEND / VECTOR_BACKEND_<COLLECTION> (voir config.py).
+Dépendances importées à la demande : seul le backend choisi doit être installé.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple, runtime_checkable
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+BACKENDS = ("chroma", "sqlite-vec", "duckdb", "qdrant")
+
+
+@runtime_checkable
+class VectorBackend(Protocol):
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]: ...
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]: ...
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]: ...
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]: ...
+
+
+# (id, contenu, métadonnées JSON, distance)
+_Row = Tuple[str, str, Optional[str], float]
+
+
+@lru_cache(maxsize=None)
+def _db_lock(key: str) -> threading.Lock:
+    """
+    Verrou d'une base (connexion / client partagés par toutes les collections
+    du fichier, cf. `_sqlite_conn` & co) : un verrou par adaptateur laisserait
+    deux collections utiliser la même connexion en parallèle.
+    """
+    return threading.Lock()
+
+
+def _matches(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    return all(metadata.get(key) == value for key, value in where.items())
+
+
+class _EmbeddingBackend(ABC):
+    """Base des adaptateurs : embeddings, ids, conversion en Document."""
+
+    def __init__(self, name: str, embeddings: Embeddings, space: str = "l2", lock_key: Optional[str] = None) -> None:
+        if space not in ("l2", "cosine", "ip"):
+            raise ValueError(f"space inconnu : {space}")
+        self.name = name
+        self.embeddings = embeddings
+        self.space = space
+        self._lock = _db_lock(lock_key) if lock_key else threading.Lock()
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        ids = kwargs.get("ids") or [d.id or str(uuid.uuid4()) for d in documents]
+        vectors = self.embeddings.embed_documents([d.page_content for d in documents])
+        with self._lock:
+            self._add(ids, vectors, documents)
+        return list(ids)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k)
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self._scored(embedding, k)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self._scored(self.embeddings.embed_query(query), k)
+
+    def _scored(self, embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        with self._lock:
+            rows = self._search(list(embedding), k)
+        return [
+            (Document(id=doc_id, page_content=content, metadata=json.loads(meta or "{}")), float(distance))
+            for doc_id, content, meta, distance in rows
+        ]
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        if ids:
+            with self._lock:
+                self._delete(list(ids))
+
+    def ids_where(self, where: Dict[str, Any]) -> List[str]:
+        """Ids dont les métadonnées valent `where` (égalité sur chaque clé, comme `{"filename": ...}` chez Chroma)."""
+        if any(key.startswith("$") for key in where):
+            raise ValueError(f"{type(self).__name__} : filtre par égalité uniquement ({where})")
+        with self._lock:
+            return [doc_id for doc_id, meta in self._metadata(None).items() if _matches(meta, where)]
+
+    def update_metadata(self, updates: Dict[str, Dict[str, Any]]) -> None:
+        """Fusionne `updates` (id → clés) dans les métadonnées ; ids absents ignorés."""
+        with self._lock:
+            current = self._metadata(list(updates))
+            if current:
+                self._set_metadata({doc_id: {**meta, **updates[doc_id]} for doc_id, meta in current.items()})
+
+    # --- à implémenter ---
+
+    @abstractmethod
+    def _add(self, ids: Sequence[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        """Écrit (ou remplace) les documents `ids` et leurs vecteurs."""
+
+    @abstractmethod
+    def _search(self, vector: List[float], k: int) -> List[_Row]:
+        """`k` plus proches voisins de `vector`, triés par distance croissante."""
+
+    @abstractmethod
+    def _delete(self, ids: List[str]) -> None:
+        """Supprime documents et vecteurs de `ids` (ids inconnus ignorés)."""
+
+    @abstractmethod
+    def _metadata(self, ids: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+        """id → métadonnées des documents `ids` existants (tous si None)."""
+
+    @abstractmethod
+    def _set_metadata(self, metadatas: Dict[str, Dict[str, Any]]) -> None:
+        """Remplace les métadonnées des documents (existants) `metadatas`."""
+
+
+# --- sqlite-vec ---
+
+
+@lru_cache(maxsize=None)
+def _sqlite_conn(path: str) -> sqlite3.Connection:
+    import sqlite_vec  # type: ignore
+
+    conn = sqlite3.connect(path, check_same_thread=False)
+    if not hasattr(conn, "enable_load_extension"):
+        raise RuntimeError("Ce Python est compilé sans chargement d'extensions SQLite (sqlite-vec).")
+    conn.enable_load_extension(True)
+    sqlite_vec.load(conn)
+    conn.enable_load_extension(False)
+    return conn
+
+
+class SqliteVecBackend(_EmbeddingBackend):
+    """Table `<name>_docs` (contenu, métadonnées) + table virtuelle vec0 `<name>_vec`."""
+
+    _METRICS = {"l2": "l2", "cosine": "cosine"}
+
+    def __init__(self, name: str, embeddings: Embeddings, path: Path, space: str = "l2") -> None:
+        super().__init__(name, embeddings, space, lock_key=f"sqlite:{path}")
+        if space not in self._METRICS:
+            raise ValueError("sqlite-vec : space 'l2' ou 'cosine' uniquement")
+        self._conn = _sqlite_conn(str(path))
+        self._table = name.replace("-", "_")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table}_docs ("
+            "rowid INTEGER PRIMARY KEY, id TEXT UNIQUE, content TEXT, metadata TEXT)"
+        )
+
+    def _has_vec(self) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (f"{self._table}_vec",)
+        ).fetchone()
+        return row is not None
+
+    def _add(self, ids: Sequence[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        import sqlite_vec  # type: ignore
+
+        if not self._has_vec():
+            self._conn.execute(
+                f"CREATE VIRTUAL TABLE {self._table}_vec USING vec0("
+                f"embedding float[{len(vectors[0])}] distance_metric={self._METRICS[self.space]})"
+            )
+        with self._conn:
+            for doc_id, vector, doc in zip(ids, vectors, documents):
+                old = self._conn.execute(
+                    f"SELECT rowid FROM {self._table}_docs WHERE id = ?", (doc_id,)
+                ).fetchone()
+                if old:
+                    self._conn.execute(f"DELETE FROM {self._table}_vec WHERE rowid = ?", old)
+                    self._conn.execute(f"DELETE FROM {self._table}_docs WHERE rowid = ?", old)
+                cur = self._conn.execute(
+                    f"INSERT INTO {self._table}_docs (id, content, metadata) VALUES (?, ?, ?)",
+                    (doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)),
+                )
+                self._conn.execute(
+                    f"INSERT INTO {self._table}_vec (rowid, embedding) VALUES (?, ?)",
+                    (cur.lastrowid, sqlite_vec.serialize_float32(vector)),
+                )
+
+    def _search(self, vector: List[float], k: int) -> List[_Row]:
+        import sqlite_vec  # type: ignore
+
+        if not self._has_vec():
+            return []
+        return self._conn.execute(
+            f"SELECT d.id, d.content, d.metadata, v.distance FROM ("
+            f"  SELECT rowid, distance FROM {self._table}_vec WHERE embedding MATCH ? AND k = ?"
+            f") v JOIN {self._table}_docs d ON d.rowid = v.rowid ORDER BY v.distance",
+            (sqlite_vec.serialize_float32(vector), k),
+        ).fetchall()
+
+    _CHUNK = 500   # paramètres par requête (limite SQLite : 999 sur les vieilles versions)
+
+    def _chunks(self, ids: List[str]) -> Any:
+        for i in range(0, len(ids), self._CHUNK):
+            chunk = ids[i:i + self._CHUNK]
+            yield chunk, ",".join("?" * len(chunk))
+
+    def _delete(self, ids: List[str]) -> None:
+        with self._conn:
+            for chunk, marks in self._chunks(ids):
+                rowids = f"SELECT rowid FROM {self._table}_docs WHERE id IN ({marks})"
+                if self._has_vec():
+                    self._conn.execute(f"DELETE FROM {self._table}_vec WHERE rowid IN ({rowids})", chunk)
+                self._conn.execute(f"DELETE FROM {self._table}_docs WHERE id IN ({marks})", chunk)
+
+    def _metadata(self, ids: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+        sql = f"SELECT id, metadata FROM {self._table}_docs"
+        if ids is None:
+            rows = self._conn.execute(sql).fetchall()
+        else:
+            rows = [
+                row for chunk, marks in self._chunks(ids)
+                for row in self._conn.execute(f"{sql} WHERE id IN ({marks})", chunk).fetchall()
+            ]
+        return {doc_id: json.loads(meta or "{}") for doc_id, meta in rows}
+
+    def _set_metadata(self, metadatas: Dict[str, Dict[str, Any]]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                f"UPDATE {self._table}_docs SET metadata = ? WHERE id = ?",
+                [(json.dumps(meta, ensure_ascii=False), doc_id) for doc_id, meta in metadatas.items()],
+            )
+
+
+# --- DuckDB ---
+
+
+@lru_cache(maxsize=None)
+def _duckdb_conn(path: str) -> Any:
+    import duckdb  # type: ignore
+
+    conn = duckdb.connect(path)
+    if os.getenv("DUCKDB_VSS", "0") == "1":
+        conn.execute("INSTALL vss")
+        conn.execute("LOAD vss")
+        conn.execute("SET hnsw_enable_experimental_persistence = true")
+    return conn
+
+
+class DuckDBBackend(_EmbeddingBackend):
+    """Table `<name>` (id, content, metadata, embedding FLOAT[dim])."""
+
+    _DISTANCES = {"l2": "array_distance", "cosine": "array_cosine_distance", "ip": "array_negative_inner_product"}
+    _VSS_METRICS = {"l2": "l2sq", "cosine": "cosine", "ip": "ip"}
+
+    def __init__(self, name: str, embeddings: Embeddings, path: Path, space: str = "l2") -> None:
+        super().__init__(name, embeddings, space, lock_key=f"duckdb:{path}")
+        self._conn = _duckdb_conn(str(path))
+        self._table = name.replace("-", "_")
+        self._dim: Optional[int] = self._existing_dim()
+
+    def _existing_dim(self) -> Optional[int]:
+        row = self._conn.cursor().execute(
+            "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = 'embedding'",
+            [self._table],
+        ).fetchone()
+        return int(row[0].split("[")[1].rstrip("]")) if row else None
+
+    def _add(self, ids: Sequence[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        cur = self._conn.cursor()
+        if self._dim is None:
+            self._dim = len(vectors[0])
+            cur.execute(
+                f"CREATE TABLE {self._table} (id VARCHAR PRIMARY KEY, content VARCHAR, "
+                f"metadata VARCHAR, embedding FLOAT[{self._dim}])"
+            )
+            if os.getenv("DUCKDB_VSS", "0") == "1":
+                cur.execute(
+                    f"CREATE INDEX {self._table}_hnsw ON {self._table} USING HNSW (embedding) "
+                    f"WITH (metric = '{self._VSS_METRICS[self.space]}')"
+                )
+        # insertion par lot via un DataFrame (executemany ligne à ligne est ~10x plus lent)
+        import pandas as pd
+
+        batch = pd.DataFrame({
+            "id": list(ids),
+            "content": [d.page_content for d in documents],
+            "metadata": [json.dumps(d.metadata, ensure_ascii=False) for d in documents],
+            "embedding": list(vectors),
+        })
+        cur.register("_batch", batch)
+        cur.execute(
+            f"INSERT OR REPLACE INTO {self._table} "
+            f"SELECT id, content, metadata, embedding::FLOAT[{self._dim}] FROM _batch"
+        )
+        cur.unregister("_batch")
+
+    def _search(self, vector: List[float], k: int) -> List[_Row]:
+        if self._dim is None:
+            return []
+        return self._conn.cursor().execute(
+            f"SELECT id, content, metadata, {self._DISTANCES[self.space]}(embedding, ?::FLOAT[{self._dim}]) AS distance "
+            f"FROM {self._table} ORDER BY distance LIMIT ?",
+            [vector, k],
+        ).fetchall()
+
+    def _delete(self, ids: List[str]) -> None:
+        if self._dim is not None:
+            self._conn.cursor().execute(f"DELETE FROM {self._table} WHERE list_contains(?::VARCHAR[], id)", [ids])
+
+    def _metadata(self, ids: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+        if self._dim is None:
+            return {}
+        sql = f"SELECT id, metadata FROM {self._table}"
+        cur = self._conn.cursor()
+        rows = cur.execute(sql).fetchall() if ids is None else cur.execute(
+            f"{sql} WHERE list_contains(?::VARCHAR[], id)", [ids]
+        ).fetchall()
+        return {doc_id: json.loads(meta or "{}") for doc_id, meta in rows}
+
+    def _set_metadata(self, metadatas: Dict[str, Dict[str, Any]]) -> None:
+        self._conn.cursor().executemany(
+            f"UPDATE {self._table} SET metadata = ? WHERE id = ?",
+            [[json.dumps(meta, ensure_ascii=False), doc_id] for doc_id, meta in metadatas.items()],
+        )
+
+
+# --- Qdrant (local / mémoire) ---
+
+
+@lru_cache(maxsize=None)
+def _qdrant_client(location: str) -> Any:
+    from qdrant_client import QdrantClient  # type: ignore
+
+    client = QdrantClient(location=":memory:") if location == ":memory:" else QdrantClient(path=location)
+    # fermeture explicite : sinon __del__ échoue bruyamment à l'arrêt de l'interpréteur
+    atexit.register(client.close)
+    return client
+
+
+class QdrantBackend(_EmbeddingBackend):
+    """Collection Qdrant `<name>` ; contenu et métadonnées dans le payload."""
+
+    _PAGE = 1000   # scroll par pages
+
+    def __init__(self, name: str, embeddings: Embeddings, location: str, space: str = "l2") -> None:
+        super().__init__(name, embeddings, space, lock_key=f"qdrant:{location}")
+        self._client = _qdrant_client(location)
+
+    @staticmethod
+    def _point_id(doc_id: str) -> str:
+        # Qdrant n'accepte que des UUID / entiers comme id de point
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, doc_id))
+
+    def _add(self, ids: Sequence[str], vectors: List[List[float]], documents: List[Document]) -> None:
+        from qdrant_client import models  # type: ignore
+
+        if not self._client.collection_exists(self.name):
+            distance = {"l2": models.Distance.EUCLID, "cosine": models.Distance.COSINE, "ip": models.Distance.DOT}
+            self._client.create_collection(
+                self.name,
+                vectors_config=models.VectorParams(size=len(vectors[0]), distance=distance[self.space]),
+            )
+        self._client.upsert(
+            self.name,
+            points=[
+                models.PointStruct(
+                    id=self._point_id(doc_id),
+                    vector=vector,
+                    payload={"id": doc_id, "content": doc.page_content, "metadata": doc.metadata},
+                )
+                for doc_id, vector, doc in zip(ids, vectors, documents)
+            ],
+        )
+
+    def _search(self, vector: List[float], k: int) -> List[_Row]:
+        if not self._client.collection_exists(self.name):
+            return []
+        points = self._client.query_points(self.name, query=vector, limit=k, with_payload=True).points
+        # score Qdrant : distance en euclidien, similarité en cosinus / produit scalaire
+        to_distance = {"l2": lambda s: s, "cosine": lambda s: 1.0 - s, "ip": lambda s: -s}[self.space]
+        return [
+            (p.payload["id"], p.payload["content"], json.dumps(p.payload.get("metadata") or {}), to_distance(p.score))
+            for p in points
+        ]
+
+    def _delete(self, ids: List[str]) -> None:
+        from qdrant_client import models  # type: ignore
+
+        if self._client.collection_exists(self.name):
+            self._client.delete(self.name, points_selector=models.PointIdsList(points=[self._point_id(i) for i in ids]))
+
+    def _metadata(self, ids: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+        if not self._client.collection_exists(self.name):
+            return {}
+        if ids is not None:
+            points = self._client.retrieve(self.name, ids=[self._point_id(i) for i in ids], with_payload=True)
+        else:
+            points, offset = [], None
+            while True:
+                page, offset = self._client.scroll(
+                    self.name, limit=self._PAGE, offset=offset, with_payload=True, with_vectors=False
+                )
+                points.extend(page)
+                if offset is None:
+                    break
+        return {p.payload["id"]: p.payload.get("metadata") or {} for p in points}
+
+    def _set_metadata(self, metadatas: Dict[str, Dict[str, Any]]) -> None:
+        for doc_id, meta in metadatas.items():
+            # set_payload fusionne au premier niveau : "metadata" est remplacé en entier
+            self._client.set_payload(self.name, payload={"metadata": meta}, points=[self._point_id(doc_id)])
+
+
+# --- index exact NumPy (petites collections) ---
+
+
+class NumpyExactIndex:
+    """
+    Index exact en mémoire au-dessus d'une collection Chroma : matrice float32
+    contiguë (n × dim) + ids / documents / métadonnées, recherche par un seul
+    produit matrice-vecteur. Pour les petits catalogues (ustensiles,
+    salades), évite les couches client / SQLite / HNSW de Chroma.
+
+    Chroma reste la source de vérité :
+    - `add_documents` écrit dans Chroma, l'index est rechargé à la requête suivante,
+    - les écritures d'autres process (scripts d'ingestion) sont détectées par
+      la version de `version_key` dans retrieval_cache (`bump_version`, relue
+      au plus toutes les secondes), et à défaut via `count()`, vérifié au plus
+      toutes les `refresh_s` secondes,
+    - au-delà de `max_docs` documents (vérifié à chaque rechargement), plus
+      de snapshot : les recherches passent directement à Chroma.
+    """
+
+    _PAGE = 5000   # lecture Chroma par blocs
+
+    def __init__(
+        self,
+        source: Any,
+        space: str = "l2",
+        refresh_s: float = 30.0,
+        max_docs: Optional[int] = None,
+        version_key: Optional[str] = None,
+    ) -> None:
+        self.source = source
+        self.space = space
+        self.refresh_s = refresh_s
+        self.max_docs = max_docs
+        self.version_key = version_key
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._stale = False
+        self._load()
+
+    def __getattr__(self, name: str) -> Any:
+        # le reste de l'API VectorStore (as_retriever, _collection, ...) → Chroma
+        return getattr(self.source, name)
+
+    def _version(self) -> Optional[int]:
+        if self.version_key is None:
+            return None
+        from .retrieval_cache import get_retrieval_cache
+
+        return get_retrieval_cache().version(self.version_key)
+
+    def _load(self) -> None:
+        # version lue avant le contenu : un bump pendant la lecture relancera un chargement
+        self._loaded_version = self._version()
+        collection = self.source._collection
+        self._count = collection.count()
+        self._read(collection, self._count)
+        self._checked_at = time.monotonic()
+
+    def _read(self, collection: Any, count: int) -> None:
+        import numpy as np
+
+        self.exact = self.max_docs is None or count <= self.max_docs
+        ids: List[str] = []
+        docs: List[Optional[str]] = []
+        metas: List[Any] = []
+        rows: List[Any] = []
+        for offset in range(0, count if self.exact else 0, self._PAGE):
+            page = collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=self._PAGE, offset=offset
+            )
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            docs.extend(page["documents"] or [None] * len(page["ids"]))
+            metas.extend(page["metadatas"] or [None] * len(page["ids"]))
+            rows.append(np.asarray(page["embeddings"], dtype=np.float32))
+
+        matrix = np.ascontiguousarray(np.concatenate(rows)) if rows else np.zeros((0, 0), dtype=np.float32)
+        if self.space == "cosine" and len(matrix):
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        # snapshot immuable : les lecteurs n'ont pas besoin du verrou
+        self._snapshot = (
+            matrix,
+            (matrix ** 2).sum(axis=1) if self.space == "l2" else None,
+            ids,
+            docs,
+            metas,
+        )
+
+    def _maybe_refresh(self) -> None:
+        version = self._version()
+        expired = time.monotonic() - self._checked_at >= self.refresh_s
+        if not self._stale and not expired and version == self._loaded_version:
+            return
+        with self._lock:
+            expired = time.monotonic() - self._checked_at >= self.refresh_s
+            if self._stale or self._version() != self._loaded_version:
+                self._load()
+            elif expired and self.source._collection.count() != self._count:
+                self._load()
+            self._stale = False
+            self._checked_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def vectors_for(self, ids: Sequence[str]) -> Any:
+        """Vecteurs du snapshot pour `ids` (MMR, diversity.py) ; None si un id manque."""
+        import numpy as np
+
+        if not self.exact:
+            return None
+        matrix, _, snapshot_ids = self._snapshot[:3]
+        rows = getattr(self, "_rows", None)
+        if rows is None or rows[0] is not snapshot_ids:
+            rows = self._rows = (snapshot_ids, {doc_id: i for i, doc_id in enumerate(snapshot_ids)})
+        try:
+            return matrix[np.asarray([rows[1][doc_id] for doc_id in ids], dtype=np.int64)]
+        except KeyError:
+            return None
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        ids = self.source.add_documents(documents, **kwargs)
+        self._stale = True
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        self.source.delete(ids=ids, **kwargs)
+        self._stale = True
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.source.embeddings.embed_query(query), k=k)
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        import numpy as np
+
+        self._maybe_refresh()
+        if not self.exact:
+            return self.source.similarity_search_by_vector(embedding, k=k, **kwargs)
+        matrix, sq_norms, ids, docs, metas = self._snapshot
+        if not len(ids):
+            return []
+
+        q = np.asarray(embedding, dtype=np.float32)
+        if self.space == "cosine":
+            q = q / (np.linalg.norm(q) + 1e-12)
+        scores = matrix @ q
+        # distance à minimiser : l2 → |x|² - 2 x·q (|q|² constant), sinon -x·q
+        dist = sq_norms - 2 * scores if sq_norms is not None else -scores
+
+        k = min(k, len(ids))
+        top = np.argpartition(dist, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+        top = top[np.argsort(dist[top])]
+        return [
+            Document(id=ids[i], page_content=docs[i] or "", metadata=metas[i] or {})
+            for i in top
+        ]
+
+
+# --- index quantifié (grosses collections) ---
+
+
+@lru_cache(maxsize=None)
+def _byte_signs() -> Any:
+    """Pour chaque octet (0..255), ses 8 bits (ordre de np.packbits) en ±1."""
+    import numpy as np
+
+    bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+    return (bits.astype(np.float32) * 2 - 1)
+
+
+class QuantizedIndex(NumpyExactIndex):
+    """
+    Index en mémoire à vecteurs quantifiés au-dessus d'une collection Chroma :
+
+    - "int8"   : quantification scalaire par dimension (min / max calibrés
+                 sur le premier lot), 4x plus compact que float32,
+    - "binary" : 1 bit par dimension (signe après centrage), 32x plus compact,
+                 score asymétrique (requête float32 contre bits du document).
+
+    Les `rescore` × k meilleurs candidats approchés sont relus dans Chroma
+    (float32) et reclassés exactement ; rescore=0 → classement approché seul.
+    Documents et métadonnées ne sont pas gardés en mémoire (relus pour les
+    candidats). Même synchronisation que NumpyExactIndex, sans seuil de taille.
+    """
+
+    # candidats relus par défaut (× k) : le binaire est bien plus grossier
+    DEFAULT_RESCORE = {"int8": 4, "binary": 10}
+
+    def __init__(
+        self,
+        source: Any,
+        mode: str = "int8",
+        space: str = "l2",
+        rescore: Optional[int] = None,
+        refresh_s: float = 30.0,
+        version_key: Optional[str] = None,
+    ) -> None:
+        if mode not in ("int8", "binary"):
+            raise ValueError(f"quantification inconnue : {mode}")
+        self.mode = mode
+        self.rescore = self.DEFAULT_RESCORE[mode] if rescore is None else rescore
+        super().__init__(source, space, refresh_s, version_key=version_key)
+
+    def _encode(self, x: Any, params: Dict[str, Any]) -> Any:
+        import numpy as np
+
+        if self.mode == "binary":
+            return np.packbits(x - params["mean"] > 0, axis=1)
+        codes = np.rint((x - params["lo"]) / params["scale"]) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def _read(self, collection: Any, count: int) -> None:
+        import numpy as np
+
+        self.exact = True
+        ids: List[str] = []
+        codes: List[Any] = []
+        sq_norms: List[Any] = []
+        params: Dict[str, Any] = {}
+        for offset in range(0, count, self._PAGE):
+            page = collection.get(include=["embeddings"], limit=self._PAGE, offset=offset)
+            if not page["ids"]:
+                break
+            x = np.asarray(page["embeddings"], dtype=np.float32)
+            if self.space == "cosine":
+                x /= np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
+            if not params:  # calibration sur le premier lot
+                lo, hi = x.min(axis=0), x.max(axis=0)
+                params = {"mean": x.mean(axis=0), "lo": lo, "scale": np.maximum(hi - lo, 1e-6) / 255}
+            c = self._encode(x, params)
+            if self.mode == "int8":
+                approx = (c.astype(np.float32) + 128) * params["scale"] + params["lo"]
+                sq_norms.append((approx ** 2).sum(axis=1))
+            ids.extend(page["ids"])
+            codes.append(c)
+
+        empty = np.zeros((0, 0), dtype=np.uint8 if self.mode == "binary" else np.int8)
+        params["sq_norms"] = np.concatenate(sq_norms) if sq_norms else None
+        self._snapshot = (np.concatenate(codes) if codes else empty, params, ids)
+
+    def vectors_for(self, ids: Sequence[str]) -> Any:
+        return None  # snapshot quantifié : les float32 sont relus dans Chroma
+
+    def nbytes(self) -> int:
+        """Mémoire occupée par les codes (hors ids)."""
+        return int(self._snapshot[0].nbytes)
+
+    def _approx_dist(self, q: Any) -> Any:
+        import numpy as np
+
+        codes, params, _ = self._snapshot
+        if self.mode == "binary":
+            # distance asymétrique : la requête reste en float32, score = Σ ±(q - mean)
+            # selon les bits du document, via une table (octet → somme partielle)
+            # par position d'octet : bien plus précis que Hamming, même coût.
+            centered = q - params["mean"]
+            n_bytes = codes.shape[1]
+            padded = np.zeros(n_bytes * 8, dtype=np.float32)
+            padded[: len(centered)] = centered
+            signs = _byte_signs()                                   # (256, 8) en ±1
+            table = signs @ padded.reshape(n_bytes, 8).T            # (256, n_bytes)
+            cols = np.arange(n_bytes)
+            return -np.concatenate([
+                table[codes[i:i + self._PAGE], cols].sum(axis=1)
+                for i in range(0, len(codes), self._PAGE)
+            ])
+
+        # x ≈ (c + 128) * scale + lo  →  x·q = c·(scale*q) + 128·Σ(scale*q) + lo·q
+        sq = params["scale"] * q
+        const = 128 * sq.sum() + params["lo"] @ q
+        dots = np.concatenate([
+            codes[i:i + self._PAGE].astype(np.float32) @ sq for i in range(0, len(codes), self._PAGE)
+        ]) + const
+        if self.space == "l2":
+            return params["sq_norms"] - 2 * dots
+        return -dots
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        import numpy as np
+
+        self._maybe_refresh()
+        ids = self._snapshot[2]
+        if not ids:
+            return []
+
+        q = np.asarray(embedding, dtype=np.float32)
+        if self.space == "cosine":
+            q = q / (np.linalg.norm(q) + 1e-12)
+        dist = self._approx_dist(q)
+
+        n_cand = min(len(ids), k * self.rescore if self.rescore else k)
+        cand = np.argpartition(dist, n_cand - 1)[:n_cand] if n_cand < len(ids) else np.arange(len(ids))
+        cand = cand[np.argsort(dist[cand], kind="stable")]
+        cand_ids = [ids[i] for i in cand]
+
+        include = ["documents", "metadatas"] + (["embeddings"] if self.rescore else [])
+        page = self.source._collection.get(ids=cand_ids, include=include)
+        rows = {
+            doc_id: (page["documents"][j], page["metadatas"][j], page["embeddings"][j] if self.rescore else None)
+            for j, doc_id in enumerate(page["ids"])
+        }
+        order = [doc_id for doc_id in cand_ids if doc_id in rows]
+
+        if self.rescore and order:
+            x = np.asarray([rows[doc_id][2] for doc_id in order], dtype=np.float32)
+            if self.space == "cosine":
+                x /= np.linalg.norm(x, axis=1, keepdims=True) + 1e-12
+            exact = ((x - q) ** 2).sum(axis=1) if self.space == "l2" else -(x @ q)
+            order = [order[i] for i in np.argsort(exact, kind="stable")]
+
+        return [
+            Document(id=doc_id, page_content=rows[doc_id][0] or "", metadata=rows[doc_id][1] or {})
+            for doc_id in order[:k]
+        ]
+
+
+# --- suppressions (ingestion incrémentale) ---
+#
+# Chroma (ou index NumPy / quantifié au-dessus) : via `_collection` ;
+# adaptateurs : leurs méthodes. Un autre store lève TypeError plutôt que de
+# laisser des documents périmés sans le dire.
+
+
+def _collection_of(store: Any) -> Any:
+    if isinstance(store, _EmbeddingBackend):
+        return None
+    collection = getattr(store, "_collection", None)
+    if collection is None:
+        raise TypeError(f"{type(store).__name__} : suppressions / filtres par métadonnées non supportés")
+    return collection
+
+
+def ids_where(store: Any, where: Dict[str, Any]) -> List[str]:
+    """Ids des documents dont les métadonnées correspondent à `where` (ex. `{"filename": ...}`)."""
+    collection = _collection_of(store)
+    if collection is None:
+        return store.ids_where(where)
+    return list(collection.get(where=where, include=[])["ids"])
+
+
+def delete_documents(store: Any, ids: Sequence[str], batch_size: int = 1000) -> None:
+    """Supprime `ids` (par lots : limite de taille de lot Chroma)."""
+    _collection_of(store)
+    ids = list(ids)
+    for i in range(0, len(ids), batch_size):
+        store.delete(ids=ids[i:i + batch_size])
+
+
+def update_metadata(store: Any, updates: Dict[str, Dict[str, Any]]) -> None:
+    """Fusionne `updates` (id → clés) dans les métadonnées des documents existants."""
+    collection = _collection_of(store)
+    if collection is None:
+        store.update_metadata(updates)
+        return
+    current = collection.get(ids=list(updates), include=["metadatas"])
+    if current["ids"]:
+        collection.update(
+            ids=current["ids"],
+            metadatas=[{**(m or {}), **updates[i]} for i, m in zip(current["ids"], current["metadatas"])],
+        )
+
+
+# --- fabrique ---
+
+
+def open_backend(
+    kind: str,
+    name: str,
+    embeddings: Embeddings,
+    data_dir: Path,
+    space: str = "l2",
+    chroma_client: Any = None,
+    chroma_configuration: Optional[Dict[str, Any]] = None,
+) -> VectorBackend:
+    """
+    Ouvre la collection `name` sur le backend `kind` (voir BACKENDS).
+    Fichiers dans `data_dir` : vectors.sqlite, vectors.duckdb, qdrant/.
+    """
+    if kind == "chroma":
+        import chromadb
+        from chromadb.config import Settings
+        from langchain_chroma import Chroma
+
+        client = chroma_client or chromadb.PersistentClient(
+            path=str(data_dir / "chroma"), settings=Settings(anonymized_telemetry=False)
+        )
+        return Chroma(
+            collection_name=name,
+            embedding_function=embeddings,
+            client=client,
+            collection_configuration=chroma_configuration or {"hnsw": {"space": space}},  # type: ignore[arg-type]
+        )
+    if kind == "sqlite-vec":
+        return SqliteVecBackend(name, embeddings, data_dir / "vectors.sqlite", space)
+    if kind == "duckdb":
+        return DuckDBBackend(name, embeddings, data_dir / "vectors.duckdb", space)
+    if kind == "qdrant":
+        location = os.getenv("QDRANT_LOCATION") or str(data_dir / "qdrant")
+        return QdrantBackend(name, embeddings, location, space)
+    raise ValueError(f"Backend vectoriel inconnu : {kind} (attendu : {', '.join(BACKENDS)})")
@@ -0,0 +1,38 @@
+"""
+tests/conftest.py
+
+Tests hors-ligne : doublures de fakes.py (embeddings, LLM), client Chroma en
+mémoire et données dans un répertoire temporaire. Les variables doivent être
+posées avant le premier import de recipes.config (objets créés au chargement).
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+os.environ["RECIPES_OFFLINE"] = "1"
+os.environ["CHROMA_CLIENT"] = "ephemeral"
+os.environ.setdefault("RECIPES_DATA_DIR", tempfile.mkdtemp(prefix="recipes-tests-"))
+
+
+def write_csv(path: Path, rows: list) -> Path:
+    """CSV au schéma générique : (id, titre, ingrédients séparés par ';')."""
+    lines = ["id,title,season,people,ingredients,instructions"]
+    lines += [f"{rid},{title},été,4,{';'.join(ingredients)},Mélanger." for rid, title, ingredients in rows]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Index des ingrédients et catalogue (ingest_csv, ingest_html via config) redirigés vers tmp_path."""
+    from recipes import config, ingest_csv
+
+    for module in (config, ingest_csv):
+        monkeypatch.setattr(module, "INGREDIENT_INDEX_PATH", tmp_path / "ingredient_index.json")
+        monkeypatch.setattr(module, "CATALOGUE_DIR", tmp_path / "catalogue")
+    return tmp_path
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import Any
+
+from recipes import fakes, instrumentation
+from recipes.bench_graph import QUERIES, route_rules
+from recipes.fakes import Responder
+from recipes.nodes import classify_rag_node
+
+
+def test_bench_queries_exercise_every_route(monkeypatch: Any) -> None:
+    monkeypatch.setattr(fakes, "default_responder", lambda: Responder(route_rules(QUERIES)))
+    routes = [classify_rag_node({"query": query})["rag_strategy"] for query, _ in QUERIES]  # type: ignore[typeddict-item]
+    assert routes == [strategy for _, strategy in QUERIES]
+    assert {"LOCAL_RECIPES", "COOKBOOKS", "WEB"} <= set(routes)
+
+
+def test_forced_route(monkeypatch: Any) -> None:
+    monkeypatch.setattr(fakes, "default_responder", lambda: Responder(route_rules(QUERIES, "WEB")))
+    assert {classify_rag_node({"query": query})["rag_strategy"] for query, _ in QUERIES} == {"WEB"}  # type: ignore[typeddict-item]
+
+
+def test_llm_calls_record_the_serving_backend(monkeypatch: Any) -> None:
+    monkeypatch.setattr(fakes, "default_responder", lambda: Responder(route_rules(QUERIES)))
+    query = QUERIES[0][0]
+    classify_rag_node({"query": query})  # type: ignore[typeddict-item]
+    assert instrumentation.llm_calls()[-1]["backend"] == "fake"      # RECIPES_OFFLINE=1 → FakeLLM
+
+    monkeypatch.setenv("LLM_MODEL_CLASSIFY_RAG", "heuristic")
+    classify_rag_node({"query": query})  # type: ignore[typeddict-item]
+    assert instrumentation.llm_calls()[-1]["backend"] == "heuristic"
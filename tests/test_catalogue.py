@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from recipes.catalogue import catalogue_row, diet_tags, normalize_diet, parse_constraints
+
+
+def test_diet_aliases_survive_word_normalisation() -> None:
+    # _words retire le « s » final : « sans » → « san »
+    assert normalize_diet("Sans Gluten") == "sans gluten"
+    assert normalize_diet("Végétariennes") == "végétarien"
+    assert normalize_diet("vegan") == "végétalien"
+    assert normalize_diet("gourmand") is None
+    assert parse_constraints("sans gluten") == {"diet": ["sans gluten"]}
+    assert parse_constraints("≤30 min, 4 pers., été, végétarien, sans gluten") == {
+        "max_minutes": 30, "people": 4, "season": "ete", "diet": ["végétarien", "sans gluten"],
+    }
+
+
+def test_diet_tags_inferred_from_ingredients_only() -> None:
+    assert diet_tags(["200 g de lardons", "3 œufs", "crème fraîche", "pâte brisée"]) == []
+    assert diet_tags(["tomates", "huile d'olive", "basilic"]) == ["sans gluten", "végétalien", "végétarien"]
+    assert diet_tags(["saumon", "riz"]) == ["pescétarien", "sans gluten"]
+    # sans ingrédients : seulement les régimes déclarés, rien n'est deviné du titre
+    assert diet_tags([]) == []
+    assert diet_tags([], ["Sans gluten"]) == ["sans gluten"]
+    row = catalogue_row("q1", "Quiche lorraine", "hiver", "6", "1 h", [], [], "a.csv")
+    assert row["diet"] == []
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import gc
+import operator
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Annotated, Any, Dict, List, TypedDict
+
+from langgraph.graph import END, StateGraph
+
+from recipes.checkpoints import PersistentSqliteSaver, connect, get_saver
+
+
+class _State(TypedDict, total=False):
+    messages: Annotated[List[str], operator.add]
+
+
+def _graph(saver: Any) -> Any:
+    builder = StateGraph(_State)
+    builder.add_node("a", lambda s: {"messages": ["a " + "tomate " * 200]})
+    builder.add_node("b", lambda s: {"messages": ["b"]})
+    builder.set_entry_point("a")
+    builder.add_edge("a", "b")
+    builder.add_edge("b", END)
+    return builder.compile(checkpointer=saver)
+
+
+async def _count(saver: PersistentSqliteSaver, thread_id: str) -> int:
+    async with saver.conn.execute("SELECT count(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)) as cur:
+        return (await cur.fetchone())[0]
+
+
+async def _converse(graph: Any, thread_id: str, turns: int) -> None:
+    for turn in range(turns):
+        await graph.ainvoke({"messages": [f"question {turn}"]}, {"configurable": {"thread_id": thread_id}})
+
+
+def test_prune_keeps_latest_checkpoints_and_expires_idle_threads(tmp_path: Path) -> None:
+    async def scenario() -> Dict[str, Any]:
+        saver = PersistentSqliteSaver(await connect(tmp_path / "checkpoints.sqlite"), keep=2, prune_every=0)
+        await saver.setup()
+        graph = _graph(saver)
+        try:
+            for thread_id in ("tarte", "soupe"):
+                await _converse(graph, thread_id, turns=4)
+            before = await _count(saver, "tarte")
+
+            report = await saver.prune(vacuum=False)
+            after = await _count(saver, "tarte")
+            state = await graph.aget_state({"configurable": {"thread_id": "tarte"}})
+
+            # « soupe » inactif depuis 60 jours : supprimé à la purge suivante
+            await saver.conn.execute("UPDATE thread_activity SET updated_at = 0 WHERE thread_id = 'soupe'")
+            expired = await saver.prune(vacuum=True)
+            return {
+                "before": before, "after": after, "report": report, "expired": expired,
+                "messages": len(state.values["messages"]),
+                "soupe": await _count(saver, "soupe"), "tarte": await _count(saver, "tarte"),
+                "stats": await saver.stats(),
+            }
+        finally:
+            await saver.aclose()
+
+    r = asyncio.run(scenario())
+    assert r["before"] > 2 and r["after"] == 2
+    assert r["report"]["threads"] == 2 and r["report"]["checkpoints"] == 2 * (r["before"] - 2)
+    assert r["report"]["writes"] > 0 and not r["report"]["vacuumed"]
+    assert r["messages"] == 4 * 3                    # dernier état intact : 4 tours × (question, a, b)
+
+    assert r["expired"]["expired"] == 1 and r["expired"]["vacuumed"]
+    assert r["soupe"] == 0 and r["tarte"] == 2
+    assert r["stats"]["threads"] == 1 and r["stats"]["free_mb"] == 0
+
+
+def test_periodic_prune_bounds_thread_history(tmp_path: Path) -> None:
+    async def scenario() -> int:
+        saver = PersistentSqliteSaver(await connect(tmp_path / "checkpoints.sqlite"), keep=3, prune_every=4)
+        await saver.setup()
+        try:
+            await _converse(_graph(saver), "tarte", turns=10)
+            await saver.flush()
+            return await _count(saver, "tarte")
+        finally:
+            await saver.aclose()
+
+    # purge toutes les 4 écritures : au plus keep + 3 checkpoints entre deux purges
+    assert asyncio.run(scenario()) <= 3 + 3
+
+
+def test_shared_saver_flushes_at_loop_end_despite_gc(tmp_path: Path) -> None:
+    path = tmp_path / "checkpoints.sqlite"
+
+    async def turn() -> None:
+        graph = _graph(await get_saver(path))
+        await graph.ainvoke({"messages": ["question"]}, {"configurable": {"thread_id": "tarte"}})
+        gc.collect()   # la tâche de fermeture ne doit pas être collectée
+
+    asyncio.run(turn())
+    with closing(sqlite3.connect(path)) as conn:
+        assert conn.execute("SELECT count(*) FROM checkpoints WHERE thread_id = 'tarte'").fetchone()[0] > 0
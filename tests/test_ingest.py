@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict
+
+from conftest import write_csv
+from recipes import instrumentation
+from recipes.ingest import SourceReport, _run
+
+
+def test_report_counts_recipes_not_field_vectors(data_dir: Path) -> None:
+    from recipes.ingest_csv import ingest_csv
+
+    path = write_csv(data_dir / "desserts.csv", [
+        ("c1", "Clafoutis aux cerises", ["cerises", "oeufs", "lait", "sucre"]),
+        ("m1", "Mousse au chocolat", ["chocolat noir", "oeufs", "sel"]),
+        ("f1", "Far breton", ["pruneaux", "farine", "lait", "beurre"]),
+    ])
+    instrumentation.reset()
+    reports: Dict[str, SourceReport] = {}
+    _run("recipes", lambda: ingest_csv(path, show_table=False), reports)
+
+    assert reports["recipes"]["error"] is None
+    assert reports["recipes"]["docs"] == 3
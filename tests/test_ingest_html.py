@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import gzip
+import json
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from recipes.ingest_html import extract_recipes, import_html, iter_pages, iter_results, parse_pages
+from recipes.ingredient_index import IngredientIndex
+
+
+def _html(*objects: Any, canonical: str = "") -> str:
+    link = f'<link rel="canonical" href="{canonical}">' if canonical else ""
+    scripts = "".join(f'<script type="application/ld+json">{json.dumps(o, ensure_ascii=False)}</script>' for o in objects)
+    return f"<html><head>{link}{scripts}</head><body><p>Bon appétit</p></body></html>"
+
+
+RATATOUILLE = {
+    "@context": "https://schema.org",
+    "@graph": [
+        {"@type": "WebPage", "name": "Ratatouille niçoise"},
+        {
+            "@type": "Recipe",
+            "name": "Ratatouille niçoise",
+            "url": "https://cuisine.example/ratatouille",
+            "recipeIngredient": ["2 aubergines", "3 courgettes", "4 tomates", "1 poivron rouge"],
+            "recipeInstructions": [
+                {"@type": "HowToSection", "name": "Légumes", "itemListElement": [
+                    {"@type": "HowToStep", "text": "Couper les légumes en dés."},
+                    {"@type": "HowToStep", "text": "Faire revenir chaque légume à part."},
+                ]},
+                {"@type": "HowToStep", "text": "Mijoter ensemble &amp; servir."},
+            ],
+            "prepTime": "PT20M", "cookTime": "PT1H",
+            "recipeYield": ["6", "6 parts"],
+            "suitableForDiet": "https://schema.org/VegetarianDiet",
+            "keywords": "été, provençal",
+        },
+    ],
+}
+CRUMBLE = {
+    "@type": ["Recipe"], "name": "Crumble pommes cannelle",
+    "recipeIngredient": ["4 pommes", "100 g de farine", "80 g de beurre", "cannelle"],
+    "recipeInstructions": "Éplucher les pommes.\nSabler farine et beurre.\nCuire 35 minutes.",
+    "totalTime": "PT50M", "recipeCategory": "dessert",
+}
+BORTSCH = {
+    "@type": "Recipe", "name": "Bortsch à la betterave", "url": "https://cuisine.example/bortsch",
+    "recipeIngredient": ["3 betteraves", "1 chou", "aneth", "crème aigre"],
+    "recipeInstructions": [{"@type": "HowToStep", "text": "Râper les betteraves, cuire avec le chou."}],
+    "totalTime": "PT1H30M", "keywords": ["hiver", "sans gluten"],
+}
+MAFE = {
+    "@type": "Recipe", "name": "Mafé au poulet",
+    "recipeIngredient": ["poulet", "pâte d'arachide", "patate douce", "riz"],
+    "recipeInstructions": "Dorer le poulet, ajouter la pâte d'arachide et mijoter.",
+}
+
+
+def _warc_record(kind: str, url: str, block: bytes, content_type: str) -> bytes:
+    head = (
+        f"WARC/1.0\r\nWARC-Type: {kind}\r\nWARC-Target-URI: {url}\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(block)}\r\n\r\n"
+    )
+    return head.encode() + block + b"\r\n\r\n"
+
+
+def _chunked(body: bytes, size: int = 200) -> bytes:
+    parts = [body[i:i + size] for i in range(0, len(body), size)]
+    return b"".join(b"%x\r\n%s\r\n" % (len(p), p) for p in parts) + b"0\r\n\r\n"
+
+
+@pytest.fixture
+def sources(tmp_path: Path) -> List[Path]:
+    """Une page HTML, un .zip et un .warc (réponse chunked + gzip, ressource, image ignorée)."""
+    page = tmp_path / "ratatouille.html"
+    page.write_text(_html(RATATOUILLE), encoding="utf-8")
+
+    archive = tmp_path / "desserts.zip"
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("pages/crumble.html", _html(CRUMBLE, canonical="https://cuisine.example/crumble"))
+        z.writestr("pages/logo.png", b"\x89PNG")
+
+    body = _chunked(gzip.compress(_html(BORTSCH).encode("utf-8")))
+    response = (
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+        b"Transfer-Encoding: chunked\r\nContent-Encoding: gzip\r\n\r\n" + body
+    )
+    image = b"HTTP/1.1 200 OK\r\nContent-Type: image/png\r\n\r\n\x89PNG"
+    warc = tmp_path / "crawl.warc"
+    warc.write_bytes(
+        _warc_record("response", "https://cuisine.example/bortsch", response, "application/http; msgtype=response")
+        + _warc_record("response", "https://cuisine.example/logo.png", image, "application/http; msgtype=response")
+        + _warc_record("resource", "https://cuisine.example/mafe", _html(MAFE).encode("cp1252", "replace"), "text/html")
+    )
+    return [page, archive, warc]
+
+
+def _by_title(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {r["title"]: r for result in results for r in result["recipes"]}
+
+
+def test_pages_from_html_zip_and_warc(sources: List[Path]) -> None:
+    pages = list(iter_pages(sources))
+    assert [p["origin"] for p in pages] == ["ratatouille.html", "desserts.zip#pages/crumble.html", "crawl.warc#1", "crawl.warc#3"]
+    assert [p["url"] for p in pages[2:]] == ["https://cuisine.example/bortsch", "https://cuisine.example/mafe"]
+
+    recipes = _by_title(parse_pages(pages))       # type: ignore[arg-type]
+    assert set(recipes) == {"Ratatouille niçoise", "Crumble pommes cannelle", "Bortsch à la betterave", "Mafé au poulet"}
+
+    ratatouille = recipes["Ratatouille niçoise"]
+    assert ratatouille["steps"] == ["Couper les légumes en dés.", "Faire revenir chaque légume à part.", "Mijoter ensemble & servir."]
+    assert ratatouille["total_minutes"] == 80 and ratatouille["people"] == "6"
+    assert ratatouille["diet"] == ["végétarien"] and ratatouille["season"] == "été"
+    assert ratatouille["url"] == "https://cuisine.example/ratatouille"
+
+    crumble = recipes["Crumble pommes cannelle"]
+    assert crumble["steps"] == ["Éplucher les pommes.", "Sabler farine et beurre.", "Cuire 35 minutes."]
+    assert crumble["total_minutes"] == 50 and crumble["url"] == "https://cuisine.example/crumble"
+
+    bortsch = recipes["Bortsch à la betterave"]
+    assert bortsch["total_minutes"] == 90 and bortsch["diet"] == ["sans gluten"] and bortsch["season"] == "hiver"
+    assert recipes["Mafé au poulet"]["url"] == "https://cuisine.example/mafe"
+
+
+def test_recipe_ids_are_stable() -> None:
+    page = _html(CRUMBLE, canonical="https://cuisine.example/crumble")
+    assert extract_recipes(page, None, "a.zip#x.html")[0]["id"] == extract_recipes(page, None, "b.warc#7")[0]["id"]
+    # sans URL : id dérivé de l'origine et du rang
+    anonymous = _html(MAFE)
+    assert extract_recipes(anonymous, None, "a.html")[0]["id"] == extract_recipes(anonymous, None, "a.html")[0]["id"]
+    assert extract_recipes(anonymous, None, "a.html")[0]["id"] != extract_recipes(anonymous, None, "b.html")[0]["id"]
+
+
+def test_process_pool_matches_in_process(sources: List[Path]) -> None:
+    pages = list(iter_pages(sources))
+    in_process = _by_title(list(iter_results(pages, workers=0)))     # type: ignore[arg-type]
+    pooled = _by_title(list(iter_results(pages, workers=2, pages_per_task=1)))  # type: ignore[arg-type]
+    assert pooled == in_process
+
+
+def test_reimport_upserts(sources: List[Path], data_dir: Path) -> None:
+    from recipes.config import RECIPE_FIELDS_VS, RECIPES_VS
+    from recipes.vector_backends import ids_where
+
+    first = import_html(sources, workers=0, name="fixtures")
+    assert (first["pages"], first["recipes"], first["errors"], first["written"]) == (4, 4, 0, 4)
+    ids = sorted(ids_where(RECIPES_VS, {"filename": "fixtures"}))
+    fields = len(ids_where(RECIPE_FIELDS_VS, {"filename": "fixtures"}))
+    assert len(ids) == 4 and fields > 4
+
+    second = import_html(sources, workers=0, name="fixtures")
+    assert second["recipes"] == 4
+    assert sorted(ids_where(RECIPES_VS, {"filename": "fixtures"})) == ids
+    assert len(ids_where(RECIPE_FIELDS_VS, {"filename": "fixtures"})) == fields
+    assert len(IngredientIndex.load(data_dir / "ingredient_index.json").entries) == 4
+    assert (data_dir / "catalogue" / "html-fixtures.parquet").exists()
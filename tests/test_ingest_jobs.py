@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, List
+
+import pytest
+from langchain_core.documents import Document
+
+from recipes import ingest_pdfs
+from recipes.ingest_jobs import IngestJournal
+
+
+class _Crash(Exception):
+    pass
+
+
+@pytest.fixture
+def pdfs(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    """ingest_cookbook_pdfs sur deux faux PDFs : extraction, écriture et journal observables."""
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    (pdf_dir / "broken.pdf").write_bytes(b"pas un PDF")
+    (pdf_dir / "tartes.pdf").write_bytes(b"%PDF-1.4 tartes")
+    journal = IngestJournal(tmp_path / "ingest_jobs.sqlite")
+    run = SimpleNamespace(journal=journal, loaded=[], written=[], crash_at=None)
+
+    def load(path: Path, *_: Any) -> Any:
+        run.loaded.append(path.name)
+        if path.name == "broken.pdf":
+            raise ValueError("EOF marker not found")
+        return [Document(id=f"t{i}", page_content=f"page {i}") for i in range(5)], 5
+
+    def write(docs: List[Document]) -> None:
+        if run.crash_at is not None and len(run.written) == run.crash_at:
+            raise _Crash()
+        run.written.append([d.id for d in docs])
+
+    monkeypatch.setattr(ingest_pdfs, "PDF_DIR", pdf_dir)
+    monkeypatch.setattr(ingest_pdfs, "WRITE_BATCH", 2)
+    monkeypatch.setattr(ingest_pdfs, "get_journal", lambda: journal)
+    monkeypatch.setattr(ingest_pdfs, "load_cookbook_pages", load)
+    monkeypatch.setattr(ingest_pdfs, "filter_near_duplicates", lambda _c, docs, _s: (docs, None))
+    monkeypatch.setattr(ingest_pdfs, "_write", write)
+    monkeypatch.setattr(ingest_pdfs, "_prune_pages", lambda *_: None)
+    return run
+
+
+def test_interrupted_ingest_resumes_at_first_unwritten_batch(pdfs: SimpleNamespace) -> None:
+    pdfs.crash_at = 2
+    with pytest.raises(_Crash):
+        ingest_pdfs.ingest_cookbook_pdfs(parser="pypdf")
+    assert pdfs.written == [["t0", "t1"], ["t2", "t3"]]
+
+    pdfs.crash_at = None
+    ingest_pdfs.ingest_cookbook_pdfs(parser="pypdf")
+    assert pdfs.written[2:] == [["t4"]]      # seul le dernier lot est réécrit
+    job = pdfs.journal.recent_jobs(1)[0]
+    assert job["status"] == "done" and job["items"] == {"done": 1, "quarantined": 1}
+
+
+def test_unreadable_pdf_stays_quarantined_until_retried(pdfs: SimpleNamespace) -> None:
+    ingest_pdfs.ingest_cookbook_pdfs(parser="pypdf")
+    assert [q["item"] for q in pdfs.journal.quarantined("cookbooks")] == ["broken.pdf"]
+    assert "EOF marker" in pdfs.journal.quarantined("cookbooks")[0]["error"]
+
+    pdfs.loaded.clear()
+    ingest_pdfs.ingest_cookbook_pdfs(parser="pypdf", resume=False)
+    assert pdfs.loaded == ["tartes.pdf"]
+
+    pdfs.loaded.clear()
+    ingest_pdfs.ingest_cookbook_pdfs(parser="pypdf", resume=False, retry_quarantined=True)
+    assert pdfs.loaded == ["broken.pdf", "tartes.pdf"]
+
+
+def test_changed_file_restarts_from_zero(tmp_path: Path) -> None:
+    journal = IngestJournal(tmp_path / "ingest_jobs.sqlite")
+    job = journal.open_job("cookbooks", {"parser": "pypdf"})
+    journal.item(job, "tartes.pdf", "v1")
+    journal.commit_batch(job, "tartes.pdf", 2, 3)
+
+    assert journal.open_job("cookbooks", {"parser": "pypdf"}) == job
+    assert journal.item(job, "tartes.pdf", "v1")["batches_done"] == 2
+    assert journal.item(job, "tartes.pdf", "v2")["batches_done"] == 0
+    assert journal.open_job("cookbooks", {"parser": "docling"}) != job
+
+    journal.quarantine(job, "cookbooks", "tartes.pdf", "v2", "ValueError")
+    assert journal.is_quarantined("cookbooks", "tartes.pdf", "v2")
+    assert not journal.is_quarantined("cookbooks", "tartes.pdf", "v3")
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from conftest import write_csv
+from recipes.ingredient_index import IngredientIndex, replace_source
+
+
+def _entry(rid: str, source: str, *ingredients: str) -> dict:
+    return {"id": rid, "title": rid, "ingredients": list(ingredients), "metadata": {"filename": source}}
+
+
+def test_replace_source_keeps_other_sources(tmp_path: Path) -> None:
+    path = tmp_path / "index.json"
+    replace_source(path, "a.csv", [_entry("a1", "a.csv", "tomate"), _entry("a2", "a.csv", "feta")])
+    replace_source(path, "b.html", [_entry("b1", "b.html", "pomme de terre", "crème")])
+    # ré-ingestion de a.csv : a2 a disparu du fichier, b.html est intact
+    replace_source(path, "a.csv", [_entry("a1", "a.csv", "tomate", "basilic")])
+
+    index = IngredientIndex.load(path)
+    assert sorted(e["id"] for e in index.entries) == ["a1", "b1"]
+    assert index.search(index.parse_query("tomate, basilic"), max_missing=0)[0]["id"] == "a1"
+
+
+def test_replace_source_without_entries_removes_source(tmp_path: Path) -> None:
+    path = tmp_path / "index.json"
+    replace_source(path, "a.csv", [_entry("a1", "a.csv", "tomate")])
+    replace_source(path, "b.csv", [_entry("b1", "b.csv", "riz")])
+    replace_source(path, "a.csv")
+    assert [e["id"] for e in IngredientIndex.load(path).entries] == ["b1"]
+
+
+def test_ingest_two_csv_sources_share_the_index(data_dir: Path) -> None:
+    from recipes.ingest_csv import ingest_csv
+
+    gratin = write_csv(data_dir / "gratins.csv", [("g1", "Gratin dauphinois", ["pommes de terre", "crème", "ail"])])
+    salades = write_csv(data_dir / "salades.csv", [
+        ("s1", "Salade de quinoa", ["quinoa", "concombre", "feta"]),
+        ("s2", "Taboulé libanais", ["boulgour", "persil", "menthe", "citron"]),
+    ])
+    ingest_csv(gratin, show_table=False)
+    ingest_csv(salades, show_table=False)
+
+    index = IngredientIndex.load(data_dir / "ingredient_index.json")
+    assert {e["id"] for e in index.entries} == {"g1", "s1", "s2"}
+    assert index.search(index.parse_query("pommes de terre, crème, ail"), max_missing=0)[0]["title"] == "Gratin dauphinois"
+
+
+def test_removed_csv_leaves_the_index(data_dir: Path) -> None:
+    from recipes.ingest_csv import ingest_csv, remove_csv_source
+
+    gratin = write_csv(data_dir / "gratins.csv", [("g1", "Gratin dauphinois", ["pommes de terre", "crème", "ail"])])
+    soupes = write_csv(data_dir / "soupes.csv", [("p1", "Soupe de potiron", ["potiron", "oignon", "bouillon"])])
+    ingest_csv(gratin, show_table=False)
+    ingest_csv(soupes, show_table=False)
+
+    gratin.unlink()
+    remove_csv_source(gratin)
+
+    index = IngredientIndex.load(data_dir / "ingredient_index.json")
+    assert [e["id"] for e in index.entries] == ["p1"]
+    assert not (data_dir / "catalogue" / "gratins.parquet").exists()
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import chromadb
+import pytest
+from chromadb.config import Settings
+
+from recipes import config, migrate_chroma
+
+
+def test_legacy_store_pending_until_migrated(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    legacy = chromadb.PersistentClient(path=str(tmp_path / "recipes"), settings=Settings(anonymized_telemetry=False))
+    legacy.create_collection("pdfs").add(ids=["r1"], embeddings=[[0.1, 0.2, 0.3]], documents=["Tarte tatin"])
+    store = chromadb.PersistentClient(path=str(tmp_path / "store"), settings=Settings(anonymized_telemetry=False))
+    for module in (config, migrate_chroma):
+        monkeypatch.setattr(module, "CHROMA_DIR", tmp_path)
+    monkeypatch.setattr(migrate_chroma, "get_chroma_client", lambda: store)
+
+    assert config.legacy_stores_pending(store) == ["recipes"]
+    # collection créée vide par get_vectorstores au premier lancement : toujours à migrer
+    store.create_collection("recipes")
+    assert config.legacy_stores_pending(store) == ["recipes"]
+
+    assert migrate_chroma.migrate_collection("recipes")["status"] == "ok"
+    assert config.legacy_stores_pending(store) == []
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+import pytest
+from langchain_core.documents import Document
+
+from recipes import near_duplicates
+from recipes.ingest_daemon import IngestDaemon
+from recipes.near_duplicates import NearDuplicateIndex
+
+TARTE = (
+    "Tarte fine aux tomates et à la moutarde. Étaler la pâte feuilletée dans un moule, piquer le fond "
+    "à la fourchette, badigeonner de moutarde à l'ancienne, disposer les tomates coupées en rondelles, "
+    "parsemer de thym frais et d'un filet d'huile d'olive, saler, poivrer puis cuire trente minutes à "
+    "deux cents degrés jusqu'à ce que la pâte soit bien dorée. Servir tiède avec une salade verte."
+)
+SOUPE = (
+    "Velouté de potiron au lait de coco. Faire revenir un oignon émincé dans le beurre, ajouter le "
+    "potiron en cubes et les pommes de terre, couvrir de bouillon de légumes et laisser cuire vingt "
+    "minutes. Mixer avec le lait de coco, rectifier l'assaisonnement et servir avec des graines grillées."
+)
+
+
+def _doc(doc_id: str, source: str, text: str) -> Document:
+    return Document(id=doc_id, page_content=text, metadata={"filename": source})
+
+
+def _copy(text: str, old: str, new: str) -> str:
+    assert old in text
+    return text.replace(old, new, 1)
+
+
+@pytest.fixture
+def index(tmp_path: Path) -> NearDuplicateIndex:
+    return NearDuplicateIndex(tmp_path / "near_dup.sqlite", min_similarity=0.7)
+
+
+def test_filter_keeps_first_copy_and_records_aliases(index: NearDuplicateIndex) -> None:
+    kept, report = index.filter("cookbooks", [
+        _doc("a", "a.pdf", TARTE),
+        _doc("b", "b.pdf", _copy(TARTE, "trente", "35")),
+        _doc("s", "s.pdf", SOUPE),
+    ])
+    assert [d.id for d in kept] == ["a", "s"]
+    assert kept[0].metadata["aliases"] == "b"
+    assert report["duplicates"] == 1
+
+
+def test_reingesting_a_source_does_not_duplicate_itself(index: NearDuplicateIndex) -> None:
+    docs = [_doc("a", "a.pdf", TARTE), _doc("s", "s.pdf", SOUPE)]
+    index.filter("cookbooks", docs)
+    kept, report = index.filter("cookbooks", docs)
+    assert [d.id for d in kept] == ["a", "s"] and report["duplicates"] == 0
+
+
+def test_forget_source_promotes_an_alias(index: NearDuplicateIndex) -> None:
+    index.filter("cookbooks", [
+        _doc("a", "a.pdf", TARTE),
+        _doc("b", "b.pdf", _copy(TARTE, "trente", "35")),
+        _doc("c", "c.pdf", _copy(TARTE, "tiède", "chaude")),
+    ])
+
+    report = index.forget_source("cookbooks", "a.pdf")
+
+    # b redevient canonique (jamais écrit : sa source est à ré-ingérer), c le suit
+    assert report == {"forgotten": 1, "promoted": {"b": "b.pdf"}}
+    assert index.aliases("cookbooks", "b") == ["c"]
+    assert index.stale_sources() == [("cookbooks", "b.pdf")]
+
+    # ré-ingestion de b.pdf : b est écrit, c reste un doublon, la source n'est plus à traiter
+    kept, _ = index.filter("cookbooks", [_doc("b", "b.pdf", _copy(TARTE, "trente", "35"))])
+    assert [d.id for d in kept] == ["b"] and kept[0].metadata["aliases"] == "c"
+    assert index.stale_sources() == []
+    kept, _ = index.filter("cookbooks", [_doc("c", "c.pdf", _copy(TARTE, "tiède", "chaude"))])
+    assert kept == []
+
+
+def test_forget_source_with_keep_only_drops_vanished_documents(index: NearDuplicateIndex) -> None:
+    index.filter("recipes", [_doc("a", "a.csv", TARTE), _doc("s", "a.csv", SOUPE)])
+    report = index.forget_source("recipes", "a.csv", keep={"s"})
+    assert report == {"forgotten": 1, "promoted": {}}
+    assert index.stats()["recipes"]["docs"] == 1
+
+
+def test_daemon_requeues_sources_of_promoted_aliases(
+    index: NearDuplicateIndex, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(near_duplicates, "_INDEX", index)
+    pdfs, files = tmp_path / "pdfs", tmp_path / "files"
+    pdfs.mkdir(), files.mkdir()
+    (pdfs / "b.pdf").write_bytes(b"%PDF")
+    index.filter("cookbooks", [_doc("a", "a.pdf", TARTE), _doc("b", "b.pdf", _copy(TARTE, "trente", "35"))])
+
+    upserts: List[str] = []
+    handlers = {
+        "cookbooks": (
+            lambda p: upserts.append(p.name) or index.filter("cookbooks", [_doc("b", p.name, _copy(TARTE, "trente", "35"))]),
+            lambda p: near_duplicates.forget_source("cookbooks", p.name)["forgotten"],
+        ),
+    }
+    daemon = IngestDaemon(handlers, {"pdfs": pdfs, "files": files}, debounce_s=0)  # type: ignore[arg-type]
+
+    daemon.notify(pdfs / "a.pdf", deleted=True)
+    daemon.process_ready(now=1e12)
+    assert daemon.queue_depth() == 1
+    daemon.process_ready(now=1e12)
+    assert upserts == ["b.pdf"]
+    assert index.stale_sources() == [] and daemon.queue_depth() == 0
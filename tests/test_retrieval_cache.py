@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+from langchain_core.documents import Document
+
+from conftest import write_csv
+from recipes import instrumentation
+from recipes.retrieval_cache import RetrievalCache, cached_search
+
+
+class _Search:
+    """Recherche factice qui compte ses appels."""
+
+    def __init__(self, *contents: str) -> None:
+        self.contents = list(contents)
+        self.calls = 0
+
+    def __call__(self) -> List[Document]:
+        self.calls += 1
+        return [Document(id=str(i), page_content=c, metadata={"i": i}) for i, c in enumerate(self.contents)]
+
+
+def test_bump_invalidates_only_its_collection(tmp_path: Path) -> None:
+    cache = RetrievalCache(tmp_path / "cache.sqlite")
+    recipes, tools = _Search("tarte"), _Search("fouet")
+
+    cache.get_or_search("recipes", "Tarte aux pommes", 5, recipes)
+    hit = cache.get_or_search("recipes", "  tarte AUX pommes ", 5, recipes)  # requête normalisée
+    cache.get_or_search("ustensils", "fouet", 5, tools)
+    assert recipes.calls == 1 and [d.page_content for d in hit] == ["tarte"]
+    cache.get_or_search("recipes", "tarte aux pommes", 3, recipes)           # autre k : autre entrée
+    assert recipes.calls == 2
+
+    cache.bump_version("recipes")
+    cache.get_or_search("recipes", "tarte aux pommes", 5, recipes)
+    cache.get_or_search("ustensils", "fouet", 5, tools)
+    assert recipes.calls == 3 and tools.calls == 1
+
+
+def test_bump_from_another_process_is_seen(tmp_path: Path) -> None:
+    path = tmp_path / "cache.sqlite"
+    server = RetrievalCache(path, persist=True, version_ttl_s=0)
+    ingest = RetrievalCache(path)                # script d'ingestion : autre process, même base
+    search = _Search("tarte")
+
+    server.get_or_search("recipes", "tarte", 5, search)
+    assert RetrievalCache(path, persist=True).get_or_search("recipes", "tarte", 5, search)[0].metadata == {"i": 0}
+    assert search.calls == 1                     # entrée persistée relue par un nouveau process
+
+    ingest.bump_version("recipes")
+    server.get_or_search("recipes", "tarte", 5, search)
+    assert search.calls == 2
+    rows = server._db().execute("SELECT version FROM entries WHERE collection = 'recipes'").fetchall()
+    assert rows == [(1,)]                        # entrées de l'ancienne version purgées
+
+
+def test_ingestion_refreshes_cached_results(data_dir: Path) -> None:
+    from recipes.config import RECIPES_VS
+    from recipes.ingest_csv import ingest_csv
+
+    def search() -> List[Document]:
+        return RECIPES_VS.similarity_search("soupe au pistou", k=10)
+
+    def ids() -> set:
+        return {d.id for d in cached_search("recipes", "soupe au pistou", 10, search)}
+
+    write_csv(data_dir / "soupes.csv", [("sp1", "Soupe au pistou", ["haricots", "courgette", "basilic"])])
+    ingest_csv(data_dir / "soupes.csv", show_table=False)
+    assert "sp1" in ids()
+    hits = instrumentation.counters().get("retrieval_cache.recipes.hit", 0)
+    assert "vc1" not in ids()
+    assert instrumentation.counters()["retrieval_cache.recipes.hit"] == hits + 1
+
+    write_csv(data_dir / "veloutes.csv", [("vc1", "Velouté de châtaignes", ["châtaignes", "céleri", "crème"])])
+    ingest_csv(data_dir / "veloutes.csv", show_table=False)   # bump_version("recipes", ...)
+    assert "vc1" in ids()
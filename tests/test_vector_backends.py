@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import uuid
+from pathlib import Path
+from typing import Any
+
+import pytest
+from langchain_core.documents import Document
+
+from recipes.config import get_chroma_client
+from recipes.embeddings import get_embeddings
+from recipes.retrieval_cache import bump_version
+from recipes.vector_backends import (
+    NumpyExactIndex, _EmbeddingBackend, delete_documents, ids_where, open_backend, update_metadata,
+)
+
+TEXTS = ["tarte aux tomates", "velouté de potiron", "salade de lentilles", "gratin dauphinois", "taboulé"]
+
+
+def _chroma(n: int = len(TEXTS)) -> Any:
+    # client Chroma en mémoire (conftest) : data_dir n'est pas utilisé
+    store = open_backend(
+        "chroma", f"test-{uuid.uuid4().hex[:8]}", get_embeddings(), Path("."), chroma_client=get_chroma_client()
+    )
+    store.add_documents([Document(id=f"d{i}", page_content=t) for i, t in enumerate(TEXTS[:n])])
+    return store
+
+
+def test_snapshot_is_read_page_by_page(monkeypatch: Any) -> None:
+    monkeypatch.setattr(NumpyExactIndex, "_PAGE", 2)
+    index = NumpyExactIndex(_chroma())
+    assert sorted(index._snapshot[2]) == [f"d{i}" for i in range(len(TEXTS))]
+    assert index._snapshot[0].shape[0] == len(TEXTS)
+    assert index.similarity_search("taboulé", k=1)[0].id == "d4"
+
+
+def test_version_bump_reloads_without_count_change() -> None:
+    chroma = _chroma()
+    key = chroma._collection.name
+    index = NumpyExactIndex(chroma, refresh_s=3600, version_key=key)
+    embedding = get_embeddings().embed_query("taboulé")
+
+    # écriture d'un autre process : même nombre de documents, contenu modifié
+    chroma.update_document("d4", Document(page_content="taboulé libanais", metadata={"source": "b.csv"}))
+    assert index.similarity_search_by_vector(embedding, k=1)[0].page_content == "taboulé"
+    bump_version(key)
+    assert index.similarity_search_by_vector(embedding, k=1)[0].page_content == "taboulé libanais"
+
+
+def test_size_threshold_rechecked_on_reload() -> None:
+    chroma = _chroma(n=2)
+    index = NumpyExactIndex(chroma, max_docs=2)
+    assert index.exact and len(index) == 2
+
+    index.add_documents([Document(id="d9", page_content="gratin dauphinois")])
+    assert index.similarity_search("gratin dauphinois", k=1)[0].id == "d9"   # servi par Chroma
+    assert not index.exact and len(index) == 3 and not index._snapshot[2]
+    assert index.vectors_for(["d9"]) is None
+
+    index.delete(ids=["d9"])
+    assert index.similarity_search("tarte aux tomates", k=1)[0].id == "d0"
+    assert index.exact and len(index._snapshot[2]) == 2
+
+
+@pytest.mark.parametrize("kind", ["sqlite-vec", "duckdb", "qdrant"])
+def test_adapters_return_scores(kind: str, tmp_path: Path, monkeypatch: Any) -> None:
+    monkeypatch.setenv("QDRANT_LOCATION", ":memory:")
+    try:
+        store = open_backend(kind, f"test_{uuid.uuid4().hex[:8]}", get_embeddings(), tmp_path, space="cosine")
+    except (ImportError, RuntimeError) as exc:  # dépendance ou extension SQLite absente
+        pytest.skip(str(exc))
+    store.add_documents([Document(id=f"d{i}", page_content=t, metadata={"i": i}) for i, t in enumerate(TEXTS)])
+
+    scored = store.similarity_search_with_score("taboulé", k=3)
+    assert [doc.id for doc, _ in scored] == [doc.id for doc in store.similarity_search("taboulé", k=3)]
+    assert scored[0][0].id == "d4" and scored[0][0].metadata == {"i": 4}
+    distances = [distance for _, distance in scored]
+    assert distances == sorted(distances) and abs(distances[0]) < 1e-4
+
+
+def test_adapter_base_is_abstract() -> None:
+    class Incomplete(_EmbeddingBackend):
+        def _add(self, ids: Any, vectors: Any, documents: Any) -> None:
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete("x", get_embeddings())  # type: ignore[abstract]
+
+
+@pytest.mark.parametrize("kind", ["sqlite-vec", "duckdb", "qdrant"])
+def test_adapters_delete_by_filename(kind: str, tmp_path: Path, monkeypatch: Any) -> None:
+    monkeypatch.setenv("QDRANT_LOCATION", ":memory:")
+    try:
+        store = open_backend(kind, f"test_{uuid.uuid4().hex[:8]}", get_embeddings(), tmp_path)
+    except (ImportError, RuntimeError) as exc:
+        pytest.skip(str(exc))
+    assert ids_where(store, {"filename": "a.csv"}) == []
+    store.add_documents([
+        Document(id=f"d{i}", page_content=t, metadata={"filename": "a.csv" if i < 3 else "b.csv", "i": i})
+        for i, t in enumerate(TEXTS)
+    ])
+
+    stale = ids_where(store, {"filename": "a.csv"})
+    assert sorted(stale) == ["d0", "d1", "d2"]
+    assert ids_where(store, {"filename": "b.csv", "i": 4}) == ["d4"]
+    delete_documents(store, stale, batch_size=2)
+    assert ids_where(store, {"filename": "a.csv"}) == []
+    assert {d.id for d in store.similarity_search("tarte aux tomates", k=5)} == {"d3", "d4"}
+
+    update_metadata(store, {"d4": {"aliases": "d0"}, "d0": {"aliases": "x"}})
+    assert store.similarity_search("taboulé", k=1)[0].metadata == {"filename": "b.csv", "i": 4, "aliases": "d0"}
+    assert ids_where(store, {"aliases": "x"}) == []
+
+
+def test_adapters_on_one_database_share_a_lock(tmp_path: Path) -> None:
+    pytest.importorskip("duckdb")
+    tables = [open_backend("duckdb", name, get_embeddings(), tmp_path) for name in ("recipes", "cookbooks")]
+    assert tables[0]._lock is tables[1]._lock
+    (tmp_path / "autre").mkdir()
+    assert open_backend("duckdb", "recipes", get_embeddings(), tmp_path / "autre")._lock is not tables[0]._lock
+
+
+def test_unsupported_store_raises() -> None:
+    with pytest.raises(TypeError):
+        ids_where(object(), {"filename": "a.csv"})